@@ -0,0 +1,104 @@
+"""Check that tables stored in the table cache load back unchanged.
+
+Stores tables with the dtypes met in the tabula output (numbers, text with
+missing cells) and in the tables of the parsers (numbers and text left in
+the same column), in a common.cache.TableCache in a temporary folder, and
+loads them back through a new cache, without the copies kept in memory,
+checking they are equal cell for cell, with the same types. Also checks
+that tables which cannot be stored leave no file behind, and that the
+table of a fund of a report (default pdf/scor/scor1.pdf) stored in a
+common.cache.ResultCache, as the crelan, dpam and pictet parsers do, is
+read back equal by the same parser version and not by another one.
+
+Run from the root of the repository:
+    python benchmarks/cache_roundtrip.py [file]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"
+    )
+)
+from common.cache import ResultCache, TableCache
+
+TABLES = [
+    # as read by tabula
+    pd.DataFrame(
+        {
+            "Quantité": [1200.0, np.nan, 35.5],
+            "Libellé": ["ACCOR", np.nan, "AIR LIQUIDE"],
+            "Unnamed: 0": [np.nan, np.nan, np.nan],
+        }
+    ),
+    # as left by a parser
+    pd.DataFrame(
+        {
+            "Holding name": ["ACCOR", "AIR LIQUIDE", "Total"],
+            "Market value": [1.5, "1 234,5", None],
+            "Quantity": [np.int64(12), 7, "-"],
+            "Percentage": [0.1, np.nan, True],
+        },
+        index=[3, 4, 5],
+    ),
+]
+
+
+def same(expected, actual):
+    """Return True if the two tables hold the same cells of the same types."""
+    expected = expected.reset_index(drop=True)
+    if not expected.equals(actual) or list(expected) != list(actual):
+        return False
+    for column in expected:
+        for x, y in zip(expected[column], actual[column]):
+            if pd.isna(x) and pd.isna(y):
+                continue
+            if type(x) != type(y) and not (
+                isinstance(x, np.generic) and type(x.item()) == type(y)
+            ):
+                return False
+    return True
+
+
+def main():
+    """Store and load the tables and exit with status 1 on a difference."""
+    folder = tempfile.mkdtemp()
+    try:
+        TableCache(folder).put("tables", TABLES)
+        loaded = TableCache(folder).load("tables")
+        print("stored:", sorted(os.listdir(folder)))
+        ok = loaded is not None and len(loaded) == len(TABLES)
+        ok = ok and all(same(x, y) for x, y in zip(TABLES, loaded))
+        print("loaded back equal:", ok)
+        TableCache(folder).put(
+            "invalid", [TABLES[0], pd.DataFrame({"a": [b"bytes", "text"]})]
+        )
+        left = [x for x in os.listdir(folder) if x.startswith("invalid")]
+        print("files left by a table which cannot be stored:", left)
+        ok = ok and not left
+        read_file = os.path.join(folder, "report.pdf")
+        shutil.copyfile(
+            sys.argv[1] if sys.argv[1:] else "pdf/scor/scor1.pdf", read_file
+        )
+        fund = ("SCOR EURO HIGH YIELD", "FR0011026475")
+        ResultCache(folder, "version").set(read_file, fund, TABLES[1])
+        cached = ResultCache(folder, "version").get(read_file, fund)
+        fund_ok = cached is not None and same(TABLES[1], cached)
+        print("fund loaded back equal:", fund_ok)
+        other = ResultCache(folder, "other version").get(read_file, fund)
+        print("fund loaded by another parser version:", other is not None)
+        ok = ok and fund_ok and other is None
+    finally:
+        shutil.rmtree(folder)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Measure the download throughput of the parsers against a simulated site.
+
+Starts benchmarks/report_server.py on the PDFs of a folder (pdf/ by
+default) with the latency, bandwidth and fault rates given, and downloads
+every report as many times as asked, under distinct links, through the
+code path of the parsers: common.download.download_all(), as called by
+their main(), or common.pipeline.download_rows() with -pipeline. Reports
+go to a temporary folder and registry, removed afterwards. Prints files/s,
+MB/s and the retries made, with the faults the server injected.
+
+Run from the root of the repository:
+    python benchmarks/download_throughput.py [-copies n] [-latency s]
+        [-bandwidth MB/s] [-errors rate] [-failures rate] [-pipeline]
+        [folder]
+"""
+
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+import pandas as pd
+
+TMP = tempfile.mkdtemp()
+# before common.download reads it
+os.environ["REPORT_REGISTRY"] = os.path.join(TMP, "registry")
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"
+    )
+)
+from common.download import download_all, get_downloader
+from common.pipeline import download_rows
+from report_server import serve
+
+
+def main():
+    """Parse arguments, run the downloads and print the throughput."""
+    args = sys.argv[1:]
+    options = {"copies": 2, "latency": 0.05, "retry_after": 0}
+    for name, key, kind in (
+        ("-copies", "copies", int),
+        ("-latency", "latency", float),
+        ("-bandwidth", "bandwidth", float),
+        ("-errors", "errors", float),
+        ("-failures", "failures", float),
+    ):
+        if name in args:
+            options[key] = kind(args.pop(args.index(name) + 1))
+            args.remove(name)
+    if "bandwidth" in options:
+        options["bandwidth"] *= 1e6
+    pipeline = "-pipeline" in args
+    if pipeline:
+        args.remove("-pipeline")
+    folder = os.path.normpath(args[0] if args else "pdf")
+    copies = options.pop("copies")
+    files = sorted(
+        glob.glob(os.path.join(folder, "**", "*.pdf"), recursive=True)
+    )
+    server = serve(folder, **options)
+    base = "http://%s:%d/" % server.server_address
+    links = [
+        base + os.path.relpath(x, folder).replace(os.sep, "/") + "?copy=%d" % i
+        for i in range(copies)
+        for x in files
+    ]
+    size = copies * sum(os.path.getsize(x) for x in files)
+    out = os.path.join(TMP, "pdf")
+    os.makedirs(out)
+    cwd = os.getcwd()
+    os.chdir(out)
+    try:
+        start = time.perf_counter()
+        if pipeline:
+            df = pd.DataFrame({"pdf_url": links})
+            found = sum(
+                isinstance(row["files"], str) for _, row in download_rows(df)
+            )
+        else:
+            found = sum(
+                isinstance(x, str) for x in download_all(links).values()
+            )
+        seconds = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+        shutil.rmtree(TMP)
+    downloader = get_downloader()
+    print(
+        "\n%s path, %s" % ("pipeline" if pipeline else "download_all", options)
+    )
+    print(
+        "%d of %d files, %.1f MB in %.2f s: %.2f files/s, %.2f MB/s"
+        % (
+            found,
+            len(links),
+            size / 1e6,
+            seconds,
+            found / seconds,
+            downloader.received / 1e6 / seconds,
+        )
+    )
+    print(
+        "%d retries; server: %d requests, %d errors (503), %d dropped"
+        % (
+            downloader.retries,
+            server.requests,
+            server.error_count,
+            server.dropped,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
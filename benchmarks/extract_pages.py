@@ -0,0 +1,79 @@
+"""Time the page text extraction of reports with 1, 2, 4... processes.
+
+Reads every page of every PDF given (default pdf/comgest/*.pdf) with the
+pdfminer and PyPDF2 extractors of src/common/pages.py, sequentially and
+with a process pool of each worker count, checks that all runs return the
+same texts and prints the timings. The page text cache is not used.
+
+Run from the root of the repository:
+    python benchmarks/extract_pages.py [-w 1,2,4,8] [files...]
+"""
+
+import glob
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"
+    )
+)
+from common.pages import MinerTextStore, PageTextStore, chunks, extract_pages
+
+warnings.filterwarnings("ignore")
+
+
+def run(cls, read_file, pages, n):
+    """Return the texts of pages of read_file, extracted with n processes."""
+    if n == 1:
+        return dict(cls.read(read_file, set(pages)))
+    texts = {}
+    with ProcessPoolExecutor(max_workers=n) as pool:
+        jobs = [
+            pool.submit(extract_pages, cls, read_file, part)
+            for part in chunks(pages, n)
+        ]
+        for job in jobs:
+            texts.update(job.result())
+    return texts
+
+
+def main():
+    """Parse arguments and print a timing table."""
+    args = sys.argv[1:]
+    counts = [1, 2, 4, os.cpu_count() or 1]
+    if "-w" in args:
+        counts = [int(x) for x in args.pop(args.index("-w") + 1).split(",")]
+        args.remove("-w")
+    files = args or sorted(glob.glob("pdf/comgest/*.pdf"))
+    counts = sorted(set(counts))
+    print("files:", ", ".join(files))
+    for cls in (MinerTextStore, PageTextStore):
+        print("\n" + cls.extractor)
+        print("%-8s %8s %8s %8s" % ("workers", "pages", "seconds", "speedup"))
+        base, reference = None, {}
+        for n in counts:
+            total, pages_done = 0.0, 0
+            for read_file in files:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    pdf = PageTextStore(read_file).pdf
+                    pages = list(range(pdf.getNumPages()))
+                    start = time.perf_counter()
+                    texts = run(cls, read_file, pages, n)
+                    total += time.perf_counter() - start
+                pages_done += len(texts)
+                if read_file in reference:
+                    assert texts == reference[read_file], (read_file, n)
+                reference[read_file] = texts
+            base = base or total
+            print(
+                "%-8d %8d %8.2f %8.2f" % (n, pages_done, total, base / total)
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Check the adaptive per-host limit against local throttling servers.
+
+Starts two stand-in servers (benchmarks/report_server.py) serving a sample
+report with some latency, one answering 429 beyond a capacity of
+simultaneous requests and one without limit, downloads the same number of
+distinct links from each through common.download.Downloader, and prints
+the statistics of every host. The limit of the throttled host is expected
+to settle around its capacity, the other one to grow to the number of
+workers, and every download to succeed.
+
+Run from the root of the repository:
+    python benchmarks/host_limits.py [-n links] [-capacity n] [file]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"
+    )
+)
+from common.download import Downloader, url_key
+from report_server import serve
+
+LATENCY = 0.05
+
+
+def main():
+    """Parse arguments, download from both servers and print the stats."""
+    args = sys.argv[1:]
+    links, capacity = 40, 3
+    if "-n" in args:
+        links = int(args.pop(args.index("-n") + 1))
+        args.remove("-n")
+    if "-capacity" in args:
+        capacity = int(args.pop(args.index("-capacity") + 1))
+        args.remove("-capacity")
+    read_file = args[0] if args else "pdf/mandarin/mandarin9.pdf"
+    folder, name = os.path.split(read_file)
+    throttled = serve(folder, latency=LATENCY, capacity=capacity)
+    free = serve(folder, latency=LATENCY)
+    urls = [
+        "http://%s:%d/%s?copy=%d" % (server.server_address + (name, i))
+        for i in range(links)
+        for server in (throttled, free)
+    ]
+    downloader = Downloader(workers=16)
+    out = tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        done = downloader.map(
+            lambda url: downloader.fetch(url, os.path.join(out, url_key(url))),
+            urls,
+        )
+        seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(out)
+    print(
+        "\n%d of %d links in %.1f s; throttled server: %d requests, %d 429"
+        % (
+            len(done),
+            len(urls),
+            seconds,
+            throttled.requests,
+            throttled.throttled,
+        )
+    )
+    for server in (throttled, free):
+        host = downloader.hosts["%s:%d" % server.server_address]
+        print(
+            "capacity %-4s limit %d, peak %d"
+            % (server.capacity, int(host.limit), host.peak)
+        )
+    throttled.shutdown()
+    free.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Time looking up a few pages of a report in the pdfminer page text store.
+
+Parsers often ask for a handful of pages only, walking backwards from the
+end of the report (banque, aviva type 2, bnp type 3). For every PDF given
+(default pdf/comgest/comgest1.pdf) the script copies it to a temporary
+folder, so that the page text cache starts cold, reads the pages given
+(default the last 3, from the last one down) from get_miner_store(), and
+compares the time with extract_text() called page by page. The texts are
+checked against each page laid out alone, in a document of its own: the
+text of a page must not depend on the pages read before it.
+
+Run from the root of the repository:
+    python benchmarks/miner_lookup.py [-pages i,j,k] [files...]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+from pdfminer.high_level import extract_text
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"
+    )
+)
+from common.pages import MinerDocument, PageTextStore, get_miner_store
+
+warnings.filterwarnings("ignore")
+
+
+def main():
+    """Parse arguments and print the timings of every file."""
+    args = sys.argv[1:]
+    wanted = None
+    if "-pages" in args:
+        wanted = [
+            int(x) for x in args.pop(args.index("-pages") + 1).split(",")
+        ]
+        args.remove("-pages")
+    files = args or ["pdf/comgest/comgest1.pdf"]
+    print(
+        "%-28s %6s %-12s %8s %8s"
+        % ("file", "pages", "asked", "store", "extract")
+    )
+    for read_file in files:
+        tmp = tempfile.mkdtemp()
+        try:
+            copy = os.path.join(tmp, os.path.basename(read_file))
+            shutil.copyfile(read_file, copy)
+            count = PageTextStore(read_file).pdf.getNumPages()
+            pages = wanted or [count - 1, count - 2, count - 3]
+            start = time.perf_counter()
+            store = get_miner_store(copy)
+            texts = [store[i] for i in pages]
+            store_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            for i in pages:
+                extract_text(read_file, page_numbers=[i])
+            extract_seconds = time.perf_counter() - start
+            reference = []
+            for i in pages:
+                document = MinerDocument(read_file)
+                reference.append(document.layout(i)[0])
+                document.close()
+        finally:
+            shutil.rmtree(tmp)
+        assert texts == reference, read_file
+        print(
+            "%-28s %6d %-12s %7.2fs %7.2fs"
+            % (
+                read_file,
+                count,
+                ",".join(str(x) for x in pages),
+                store_seconds,
+                extract_seconds,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
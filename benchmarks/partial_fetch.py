@@ -0,0 +1,74 @@
+"""Measure what fetching only some pages of a report saves.
+
+Serves the sample reports with benchmarks/report_server.py, which answers
+Range requests, fetches the given pages of a report with
+common.partial.fetch_pages(), and prints the bytes and requests it took
+against the size of the report, checking that the text of the pages
+fetched is the same as in the whole report and that the other pages are
+blank.
+
+Run from the root of the repository:
+    python benchmarks/partial_fetch.py [file [page ...]]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import warnings
+import requests
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"
+    )
+)
+from common.pages import get_store
+from common.partial import fetch_pages
+from report_server import serve
+
+warnings.filterwarnings("ignore")
+
+
+def main():
+    """Parse arguments, fetch the pages and print the comparison."""
+    args = sys.argv[1:]
+    read_file = args[0] if args else "pdf/scor/scor1.pdf"
+    pages = [int(x) for x in args[1:]] or [1, 2, 21, 22, 23]
+    server = serve(os.path.dirname(read_file))
+    url = "http://%s:%d/%s" % (
+        server.server_address + (os.path.basename(read_file),)
+    )
+    fd, part = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        received = fetch_pages(url, pages, part, requests.Session())
+        seconds = time.perf_counter() - start
+        whole, partial = get_store(read_file), get_store(part)
+        same = all(whole[i - 1] == partial[i - 1] for i in pages)
+        blank = all(
+            not partial[i].strip()
+            for i in range(len(partial))
+            if i + 1 not in pages
+        )
+    finally:
+        os.remove(part)
+        server.shutdown()
+    size = os.path.getsize(read_file)
+    print("file:", read_file, "pages:", pages)
+    print(
+        "%.2f MB of %.2f MB fetched (%.0f%%) in %d requests, %.2f s"
+        % (
+            received / 1e6,
+            size / 1e6,
+            100 * received / size,
+            server.requests,
+            seconds,
+        )
+    )
+    print("pages fetched identical:", same, "other pages blank:", blank)
+
+
+if __name__ == "__main__":
+    main()
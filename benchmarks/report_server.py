@@ -0,0 +1,209 @@
+"""Local stand-in for the sites of the providers, serving the PDFs in pdf/.
+
+Serves the files of a folder over HTTP on localhost, the query string of
+the links being ignored so that as many distinct links as wanted can point
+to the same report. Range requests are answered with the bytes asked for
+(206 Partial Content), unless their If-Range does not match the ETag or
+Last-Modified sent with the file. Every answer waits for a latency first, and bodies
+are sent at most at a bandwidth per connection. A server given a capacity
+answers 429 Too Many Requests, with a Retry-After header, to the requests
+beyond capacity at the same time, like a site throttling its clients. A
+share of the requests, drawn at random, can be answered 503 Service
+Unavailable (errors), or have their connection dropped halfway through the
+body (failures).
+
+Run from the root of the repository:
+    python benchmarks/report_server.py [-port 8000] [-latency s]
+        [-bandwidth MB/s] [-capacity n] [-retry-after s] [-errors rate]
+        [-failures rate] [folder]
+
+Module functions:
+    serve(folder="pdf", port=0, latency=0, bandwidth=None, capacity=None,
+        retry_after=1, errors=0, failures=0, seed=0): --> ThreadingHTTPServer
+"""
+
+import email.utils
+import functools
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ReportHandler(SimpleHTTPRequestHandler):
+    """Serve the files of the folder with latency, throttling and faults."""
+
+    def log_message(self, *args):
+        """Do not log every request."""
+
+    def do_GET(self):
+        """Answer a GET, or 429 if the server is over capacity."""
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            throttled = server.capacity and server.active > server.capacity
+            if throttled:
+                server.throttled += 1
+            error = server.random.random() < server.errors
+            if error:
+                server.error_count += 1
+            self.drop = server.random.random() < server.failures
+        try:
+            time.sleep(server.latency)
+            if throttled or error:
+                self.send_response(429 if throttled else 503)
+                self.send_header("Retry-After", str(server.retry_after))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_file()
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def send_file(self):
+        """Send the file of the path, or the range of it asked for."""
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404, "File not found")
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+        size = len(data)
+        mtime = os.stat(path).st_mtime
+        etag = '"%x-%x"' % (int(mtime), size)
+        last_modified = email.utils.formatdate(mtime, usegmt=True)
+        start, end = 0, size - 1
+        asked = self.headers.get("Range", "")
+        if self.headers.get("If-Range") not in (None, etag, last_modified):
+            # the file changed since the part held by the client
+            asked = ""
+        match = re.match(r"bytes=(\d*)-(\d*)$", asked)
+        if match and match.group(1):
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(end, int(match.group(2)))
+        elif match and match.group(2):
+            start = max(0, size - int(match.group(2)))
+        if match and start >= size:
+            self.send_response(416)
+            self.send_header("Content-Range", "bytes */%d" % size)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if match:
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", "bytes %d-%d/%d" % (start, end, size)
+            )
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.end_headers()
+        self.send_body(data[start : end + 1])
+
+    def send_body(self, body):
+        """Write body at the bandwidth of the server, or half of it."""
+        server = self.server
+        if self.drop and len(body) > 1:
+            with server.lock:
+                server.dropped += 1
+            body = body[: len(body) // 2]
+            self.close_connection = True
+        chunk = 1 << 16
+        for i in range(0, len(body), chunk):
+            self.wfile.write(body[i : i + chunk])
+            if server.bandwidth:
+                time.sleep(len(body[i : i + chunk]) / server.bandwidth)
+
+
+def serve(
+    folder="pdf",
+    port=0,
+    latency=0,
+    bandwidth=None,
+    capacity=None,
+    retry_after=1,
+    errors=0,
+    failures=0,
+    seed=0,
+):
+    """Start serving folder in a background thread; return the server.
+
+    The address of the server is server.server_address, its counts of
+    requests, throttled requests, 503 answers and dropped connections
+    server.requests, server.throttled, server.error_count and
+    server.dropped.
+
+    Keyword Arguments:
+    folder -- folder of the files to serve
+    port -- port to listen on, any free one for 0
+    latency -- seconds to wait before answering each request
+    bandwidth -- bytes per second sent to a connection, None for no limit
+    capacity -- requests at the same time answered, None for no limit
+    retry_after -- seconds of the Retry-After header of the 429 and 503
+        answers
+    errors -- share of the requests answered 503
+    failures -- share of the answers cut off halfway through the body
+    seed -- seed of the random draws of errors and failures
+    """
+    handler = functools.partial(
+        ReportHandler, directory=os.path.abspath(folder)
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.latency = latency
+    server.bandwidth = bandwidth
+    server.capacity = capacity
+    server.retry_after = retry_after
+    server.errors = errors
+    server.failures = failures
+    server.random = random.Random(seed)
+    server.requests = 0
+    server.throttled = 0
+    server.error_count = 0
+    server.dropped = 0
+    server.active = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    """Parse arguments and serve until interrupted."""
+    args = sys.argv[1:]
+    options = {}
+    for name, key, kind in (
+        ("-port", "port", int),
+        ("-latency", "latency", float),
+        ("-bandwidth", "bandwidth", float),
+        ("-capacity", "capacity", int),
+        ("-retry-after", "retry_after", int),
+        ("-errors", "errors", float),
+        ("-failures", "failures", float),
+    ):
+        if name in args:
+            options[key] = kind(args.pop(args.index(name) + 1))
+            args.remove(name)
+    if "bandwidth" in options:
+        options["bandwidth"] *= 1e6
+    folder = args[0] if args else "pdf"
+    server = serve(os.path.normpath(folder), **options)
+    print("serving %s on http://%s:%d/" % ((folder,) + server.server_address))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Time repeated tabula calls with a new JVM per call and with a warm JVM.
+
+Makes the same tabula.read_pdf() call (a page of a sample report read with
+table detection, which stays with tabula) a number of times, first the
+old way with one java subprocess per call, then through
+common.tables.read_pdf(), with which tabula-py keeps one JVM started
+through JPype for the whole run, and prints the latency of every call
+and a summary per engine ("forced" for the old way). The table cache
+is turned off, so that every call runs tabula. Needs Java, and jpype1
+for the warm engine.
+
+Run from the root of the repository:
+    python benchmarks/tabula_latency.py [-n calls] [file]
+"""
+
+import os
+import shutil
+import sys
+import time
+import warnings
+import tabula
+import tabula.io
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"
+    )
+)
+import common.tables
+from common.tables import latency_report, read_pdf
+
+warnings.filterwarnings("ignore")
+
+
+def main():
+    """Parse arguments and print the latency of both engines."""
+    args = sys.argv[1:]
+    calls = 5
+    if "-n" in args:
+        calls = int(args.pop(args.index("-n") + 1))
+        args.remove("-n")
+    read_file = args[0] if args else "pdf/scor/scor1.pdf"
+    if shutil.which("java") is None:
+        print("java not found: tabula cannot run here")
+        return
+    kwargs = dict(pages=2, stream=True, guess=True, silent=True)
+    common.tables.use_cache = False
+    before = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        tabula.read_pdf(read_file, force_subprocess=True, **kwargs)
+        before.append(time.perf_counter() - start)
+    tabula.io._tabula_vm = None
+    common.tables.latencies.clear()
+    for _ in range(calls):
+        read_pdf(read_file, **kwargs)
+    common.tables.latencies["forced"] = before
+    print("file:", read_file)
+    for engine, times in sorted(common.tables.latencies.items()):
+        print("%s: %s s" % (engine, " ".join("%.2f" % x for x in times)))
+    print(latency_report())
+
+
+if __name__ == "__main__":
+    main()
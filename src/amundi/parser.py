@@ -1,13 +1,17 @@
 """Parse PDF files of Amundi."""
 import os.path
-import tabula as tb
 import pandas as pd
 import re
 import sys
-import PyPDF2
-import requests
 import warnings
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.pages import get_store
+from common.tables import read_pdf
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import report_problem
+
 warnings.filterwarnings("ignore")
 
 with open(r"./src/amundi/currencies.txt") as f:
@@ -22,42 +26,17 @@ def find_start_page(pdf, file_name, fund_name):
     file_name -- PDF file name
     fund_name -- fund name website
     """
-    pages = []
-    # get number of pages
-    num_pages = pdf.getNumPages()
     fund_name = "".join(fund_name.split("-")[-1].lower().split())
     # define keyterms
     my_string = "3.12.InventairedétaillédesinstrumentsfinanciersenEUR"
-    # extract text and do the search
-    func = (
-        lambda i, pdf: pdf.getPage(i)
-        .extractText()
-        .replace("\n", "")
-        .replace(" ", "")
-        .lower()
+    # search the text of each page, extracted once per run
+    pages = get_store(file_name, pdf).find(
+        my_string.lower(), fund_name, squash=True
     )
-    pages = [
-        i + 1
-        for i in range(num_pages)
-        if my_string.lower() in func(i, pdf) and fund_name in func(i, pdf)
-    ]
     # print(pages)
     return pages
 
 
-def download_file(download_url, filename):
-    """Download the file from url.
-
-    Keyword Arguments:
-    download_url -- pdf link
-    filename -- PDF file name
-    """
-    response = requests.get(download_url)
-    file = open(filename, "wb")
-    file.write(response.content)
-    file.close()
-
-
 def process_filedata(file_data, meta_data, i):
     """Process dataframe of a fund."""
     file_data = file_data.drop(2, axis=1)
@@ -146,19 +125,25 @@ def main():
     meta_data = pd.read_csv(in_path)
     final_data = []
     os.chdir(os.path.normpath(pdf_out_path))
-    for i, row in meta_data.iterrows():
-        url = row["pdf_url"]
-        file = os.path.join(row["name"] + ".pdf")
-        fund_name = row["name"]
-        if os.path.isfile(file) == 0:
-            print("downloading ", url)
-            download_file(url, file)
+    rows = None
+    if "-pipeline" in sys.argv:
+        rows = download_rows(meta_data)
+    else:
+        links_to_pdf_map = download_all(meta_data["pdf_url"])
+    for i, row in rows or meta_data.iterrows():
+        if rows is not None:
+            file = row["files"]
         else:
-            print("downloaded")
-        pdf = PyPDF2.PdfFileReader(file)
+            file = links_to_pdf_map.get(row["pdf_url"])
+        fund_name = row["name"]
+        problem = report_problem(file)
+        if problem:
+            print("skipping", fund_name, "(%s)" % problem)
+            continue
+        pdf = get_store(file).pdf
         pages = find_start_page(pdf, file, fund_name)
         print(file, pages)
-        file_data = tb.read_pdf(
+        file_data = read_pdf(
             file,
             pages=pages,
             area=(0, 0, 850, 950),
@@ -168,11 +153,7 @@ def main():
         )
         file_data = pd.concat(file_data, ignore_index=True)
         file_data = process_filedata(file_data, meta_data, i)
-        text = pdf.getPage(pages[0] - 1)
-        text = text.extractText()
-        text = text.replace("\n", "")
-        text = text.replace(" ", "")
-        text = text.lower()
+        text = get_store(file, pdf).squashed(pages[0] - 1)
         missing_curr = find_missing_curr(file_data, text)
         file_data = fill_missing_curr(file_data, missing_curr)
         if "isin" in meta_data.columns:
@@ -1,7 +1,8 @@
 """Parse all types of PDF files of financial reports of Aviva company.
 
 Module functions:
-    parse_type1_pdf(args): --> pandas.DataFrame
+    parse_type1_document(read_file, funds): --> list of pandas.DataFrame
+    parse_type1_pdf(args, pages=None, areas=None): --> pandas.DataFrame
     parse_type2_pdf(args): --> pandas.DataFrame
     parse_type1a_table(read_file, start, end,
     fund_name, fund_name_website, isin): -->pandas.DataFrame
@@ -11,15 +12,18 @@ import re
 import sys
 import os
 import warnings
-from pdfminer.high_level import extract_text
-from PyPDF2 import PdfFileReader
-import tabula
 from country_list import countries_for_language as countries_in
 import pandas as pd
 import numpy as np
-import requests
 
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.pages import get_miner_store, get_store
+from common.tables import read_pdf, read_pdf_areas
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import by_document, fund_pages, parsable
+
 COUNTRIES = list(countries_in("en"))
 COUNTRIES = [x[1] for x in COUNTRIES]
 COUNTRIES.extend(
@@ -33,6 +37,9 @@ COUNTRIES.extend(
 )
 
 COLUMN_NAMES = ["holding_name", "market_value", "currency", "net_assets"]
+# Each page of type 1 tables contain two tables, the left one starting lower
+# on the first page.
+TYPE1_AREAS = [(210, 35, 790, 300), (175, 35, 790, 300), (175, 302, 790, 560)]
 warnings.filterwarnings("ignore")
 
 # Two types of PDFs in Aviva have been encountered so far.
@@ -44,12 +51,65 @@ warnings.filterwarnings("ignore")
 # parses the second.
 
 
-def parse_type1_pdf(args):
+def parse_type1_document(read_file, funds):
+    """Parses the funds of type 1 PDF file read_file together.
+
+    The pages of all the funds are located in one pass over the text of
+    the report, and their tables read in one pass over their pages.
+    Input: file name, list of the parse_type1_pdf() args of its funds
+    Output: list of pandas.DataFrame
+    """
+    located = fund_pages(
+        get_store(read_file),
+        [args[2].upper() for args in funds],
+        first=11,
+        normalise=lambda text: text.replace(" - ", " "),
+    )
+    page_areas = {}
+    for pages in located.values():
+        for page, indices in type1_page_areas(pages).items():
+            page_areas.setdefault(page, set()).update(indices)
+    areas = {}
+    if page_areas:
+        areas = read_pdf_areas(
+            read_file,
+            sorted(page_areas),
+            TYPE1_AREAS,
+            stream=True,
+            guess=False,
+            silent=True,
+            page_areas=page_areas,
+        )
+    results = []
+    for args in funds:
+        pages = located[args[2].upper()]
+        # tables are cleaned in place: every fund gets its own copies
+        fund_areas = {
+            key: [table.copy() for table in tables]
+            for key, tables in areas.items()
+            if key[0] in pages
+        }
+        results.append(parse_type1_pdf(args, pages, fund_areas))
+    return results
+
+
+def type1_page_areas(pages):
+    """Returns the indices in TYPE1_AREAS of the areas read on each page.
+
+    The left table starts lower on the first page of a fund.
+    Input: the pages of a fund
+    Output: dict page -> list of indices
+    """
+    return {page: [1, 2] if i else [0, 2] for i, page in enumerate(pages)}
+
+
+def parse_type1_pdf(args, pages=None, areas=None):
     """Takes result DataFrame and returns after appending it with DataFrame.
 
     created by parsing type 1 PDF file read_file
     for fund name fund_name.
-    Input: list(args)
+    Input: list(args), and the pages of the fund and tables read from them
+    if already known (see parse_type1_document())
     Output: pandas.DataFrame
     """
     (
@@ -64,18 +124,18 @@ def parse_type1_pdf(args):
     print("Parsing:", read_file, " for ", fund_name + "\n")
 
     countries = COUNTRIES[:]
-    pdf = PdfFileReader(read_file)
-    total_pages = pdf.getNumPages()
-
-    pages = [
-        i + 1
-        for i in range(11, total_pages)
-        if fund_name.upper()
-        in pdf.getPage(i).extractText().replace(" - ", " ")
-    ]
+    store = get_store(read_file)
+    total_pages = len(store)
+
+    if pages is None:
+        pages = [
+            i + 1
+            for i in range(11, total_pages)
+            if fund_name.upper() in store[i].replace(" - ", " ")
+        ]
 
     if len(pages) == 0:
-        contents = tabula.read_pdf(
+        contents = read_pdf(
             read_file, pages=[2], stream=True, guess=False, silent=True
         )[0]
         start, end = 0, 0
@@ -116,33 +176,24 @@ def parse_type1_pdf(args):
     fund_name.insert(2, "-")
     fund_name = " ".join(fund_name)
 
-    # Each page contain two tables, each are extracted separately.
-    left_tables = tabula.read_pdf(
-        read_file,
-        pages=pages[0],
-        area=(210, 35, 790, 300),
-        stream=True,
-        guess=False,
-        silent=True,
-    )
-
-    left_tables = left_tables + tabula.read_pdf(
-        read_file,
-        pages=pages[1:],
-        area=(175, 35, 790, 300),
-        stream=True,
-        guess=False,
-        silent=True,
-    )
-
-    right_tables = tabula.read_pdf(
-        read_file,
-        pages=pages,
-        area=(175, 302, 790, 560),
-        stream=True,
-        guess=False,
-        silent=True,
-    )
+    # The areas of all the pages are read in one pass over the pages.
+    if areas is None:
+        areas = read_pdf_areas(
+            read_file,
+            pages,
+            TYPE1_AREAS,
+            stream=True,
+            guess=False,
+            silent=True,
+            page_areas=type1_page_areas(pages),
+        )
+    # in the order of the pages, as the rows of the report
+    left_tables = areas[pages[0], 0]
+    for page in pages[1:]:
+        left_tables = left_tables + areas[page, 1]
+    right_tables = []
+    for page in pages:
+        right_tables = right_tables + areas[page, 2]
     # Correcting table format if incorrect format detected
     left_tables = correct_corrupt_tables(left_tables, currencies)
     right_tables = correct_corrupt_tables(right_tables, currencies)
@@ -292,7 +343,7 @@ def parse_type1a_tables(
 
     Returns DataFrame with column names set as COLUMN_NAMES.
     """
-    tables = tabula.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=list(range(int(start), end + 1)),
         stream=True,
@@ -364,11 +415,11 @@ def parse_type2_pdf(args):
         pdf_url,
     ) = args
     print("Parsing:", read_file, " for ", fund_name + "\n")
-    pdf = PdfFileReader(read_file)
-    total_pages = pdf.getNumPages()
+    store = get_miner_store(read_file)
+    total_pages = len(get_store(read_file))
 
     for i in range(total_pages, 0, -1):
-        text = extract_text(read_file, page_numbers=[i], codec="iso-8859-1")
+        text = store[i]
         cond_1 = "inventaire" in text
         cond_2 = "Libellé valeur" in text
         cond_3 = "Valeur \nboursière" in text and "% Actif\nnet" in text
@@ -376,7 +427,7 @@ def parse_type2_pdf(args):
             start_page = i
             break
 
-    tables = tabula.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=[start_page + 1],
         area=(185, 41, 810, 558),
@@ -385,7 +436,7 @@ def parse_type2_pdf(args):
         silent=True,
     )
 
-    tables = tables + tabula.read_pdf(
+    tables = tables + read_pdf(
         read_file,
         pages=list(range(start_page + 2, total_pages + 1)),
         area=(80, 41, 810, 558),
@@ -549,38 +600,29 @@ def main():
     print("Taking input from " + in_path)
     pdf_links_df = pd.DataFrame(pd.read_csv(os.path.join(currdir, in_path)))
     os.chdir(os.path.join(currdir, pdf_out_path))
-    if len(pdf_links_df.columns) == 3:
+    landed = None
+    if "-pipeline" in sys.argv and len(pdf_links_df.columns) == 3:
+        # rows missing a value are left out, as by dropna() below
+        landed = (
+            (index, row)
+            for index, row in download_rows(pdf_links_df)
+            if not row.isna().any()
+        )
+    elif len(pdf_links_df.columns) == 3:
         links_set = set(pdf_links_df["pdf_url"])
-
-        links_to_pdf_map = {}
-
-        num = 1
         links_set.discard("annual_report_does_not_exists")
         links_set.discard("nan")
-        print("Downloading " + str(len(links_set)) + " files...")
-        for link in links_set:
-            if link in ["nan", "annual_report_does_not_exists"]:
-                links_to_pdf_map[link] = np.nan
-                continue
-
-            response = requests.get(link)
-
-            links_to_pdf_map[link] = "Aviva" + str(num) + ".pdf"
-            print("Aviva" + str(num) + ".pdf")
-            with open("Aviva" + str(num) + ".pdf", "wb") as file:
-                file.write(response.content)
-            num += 1
-
-        print(len(links_set), " files downloaded")
+        links_to_pdf_map = download_all(links_set)
         links_to_pdf_map["annual_report_does_not_exists"] = np.nan
         links_to_pdf_map["nan"] = np.nan
 
         pdf_links_df["files"] = pdf_links_df["pdf_url"].apply(
             lambda x: links_to_pdf_map[x]
         )
-        del num, links_set
-    pdf_links_df.dropna(inplace=True)
-    pdf_links_df.to_csv("aviva_pdf_names.csv", index=False, mode="w")
+        del links_set
+    if landed is None:
+        pdf_links_df.dropna(inplace=True)
+        pdf_links_df.to_csv("aviva_pdf_names.csv", index=False, mode="w")
 
     result = pd.DataFrame(
         columns=[
@@ -595,59 +637,71 @@ def main():
         ]
     )
 
-    done1, done2, type1, type2 = [], [], [], []
-
-    for row in pdf_links_df.iterrows():
-        row = row[1]
-        pdf_url = row["pdf_url"]
-        fund_name_website = row["name"]
-        isin = row["isin"]
-        read_file = row["files"]
+    done1, done2, type2result, type1result = [], [], [], []
 
-        if "Fund" in row["name"]:
-            fund_name = " ".join(
-                row["name"].split()[: row["name"].split().index("Fund") + 1]
-            )
+    # the type 1 funds of a report are parsed together
+    for read_file, rows in by_document(landed or parsable(pdf_links_df)):
+        type1 = []
+        for _, row in rows:
+            pdf_url = row["pdf_url"]
+            fund_name_website = row["name"]
+            isin = row["isin"]
 
-            if not pd.isna(read_file) and fund_name not in done1:
-                type1.append(
-                    [
-                        result,
-                        read_file,
-                        fund_name,
-                        fund_name_website,
-                        isin,
-                        currencies[:],
-                        pdf_url,
+            if "Fund" in row["name"]:
+                fund_name = " ".join(
+                    row["name"].split()[
+                        : row["name"].split().index("Fund") + 1
                     ]
                 )
-                done1.append(fund_name)
 
-        elif (not pd.isna(row["files"])) and read_file not in done2:
-            cond1 = "-" in row["name"]
-            if cond1:
-                val = row["name"].split()[: row["name"].split().index("-")]
-                fund_name = " ".join(val)
-            else:
-                fund_name = row["name"]
+                if not pd.isna(read_file) and fund_name not in done1:
+                    type1.append(
+                        [
+                            result,
+                            read_file,
+                            fund_name,
+                            fund_name_website,
+                            isin,
+                            currencies[:],
+                            pdf_url,
+                        ]
+                    )
+                    done1.append(fund_name)
 
-            type2.append(
-                [
-                    result,
-                    read_file,
-                    fund_name,
-                    fund_name_website,
-                    isin,
-                    currencies[:],
-                    pdf_url,
-                ]
-            )
-            done2.append(read_file)
+            elif (not pd.isna(row["files"])) and read_file not in done2:
+                cond1 = "-" in row["name"]
+                if cond1:
+                    val = row["name"].split()[
+                        : row["name"].split().index("-")
+                    ]
+                    fund_name = " ".join(val)
+                else:
+                    fund_name = row["name"]
+
+                # parsed as its report lands
+                type2result.append(
+                    parse_type2_pdf(
+                        [
+                            result,
+                            read_file,
+                            fund_name,
+                            fund_name_website,
+                            isin,
+                            currencies[:],
+                            pdf_url,
+                        ]
+                    )
+                )
+                done2.append(read_file)
 
-        else:
-            pass
-    type2result = list(map(parse_type2_pdf, type2))
-    type1result = list(map(parse_type1_pdf, type1))
+            else:
+                pass
+        if type1:
+            type1result.extend(parse_type1_document(read_file, type1))
+    if landed is not None:
+        pdf_links_df.dropna().to_csv(
+            "aviva_pdf_names.csv", index=False, mode="w"
+        )
 
     result = pd.concat(type2result + type1result, ignore_index=True)
     result = result[result["currency"].isin(currencies)]
@@ -7,12 +7,15 @@ import re
 import sys
 import os
 import warnings
-from pdfminer.high_level import extract_text
-from PyPDF2 import PdfFileReader
-import tabula
 import pandas as pd
 import numpy as np
-import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.pages import get_miner_store, get_store
+from common.tables import read_pdf
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import parsable
 
 warnings.filterwarnings("ignore")
 pd.set_option("display.max_rows", 18000)
@@ -43,8 +46,9 @@ def parse(pdf, read_file, website, pdf_url):
         print(" memory")
     else:
         pages = []
+        store = get_miner_store(read_file)
         for i in range(pdf.getNumPages() - 3, 0, -1):
-            text = extract_text(read_file, page_numbers=[i]).replace("\n", "")
+            text = store.flat(i)
             if re.search(
                 r"Désignation.*des.*valeurs.*Devise.*Qté.*Nbreou", text
             ):
@@ -57,9 +61,7 @@ def parse(pdf, read_file, website, pdf_url):
                 ):
                     pages.append(k + 1)
                     k -= 1
-                    text = extract_text(read_file, page_numbers=[k]).replace(
-                        "\n", ""
-                    )
+                    text = store.flat(k)
                 break
             if re.search(
                 r"Désignation.*des.*valeurs.*Quantité.*Cours.*Devise", text
@@ -74,14 +76,12 @@ def parse(pdf, read_file, website, pdf_url):
                 ):
                     pages.append(k + 1)
                     k -= 1
-                    text = extract_text(read_file, page_numbers=[k]).replace(
-                        "\n", ""
-                    )
+                    text = store.flat(k)
                 break
         pages = pages[::-1]
         print(pages)
         if typ == 1:
-            tables = tabula.read_pdf(
+            tables = read_pdf(
                 read_file,
                 pages=pages,
                 area=[0, 0, 828, 590],
@@ -100,7 +100,7 @@ def parse(pdf, read_file, website, pdf_url):
                 ]
                 tables[i].drop(columns=["_1"], inplace=True)
         elif typ == 2:
-            tables = tabula.read_pdf(
+            tables = read_pdf(
                 read_file,
                 pages=pages,
                 area=[0, 0, 828, 590],
@@ -178,23 +178,14 @@ def main():
     links_set.discard("annual_report_does_not_exists")
     os.chdir(os.path.join(currdir, os.path.normpath(pdf_out_path)))
 
-    if len(pdf_links_df.columns) == 2:
+    rows = None
+    if "-pipeline" in sys.argv and len(pdf_links_df.columns) == 2:
+        rows = download_rows(pdf_links_df, save="pdf_names.csv")
+    elif len(pdf_links_df.columns) == 2:
         links_set = set(pdf_links_df["pdf_url"])
         links_set.discard("nan")
         links_set.discard("annual_report_does_not_exists")
-        links_to_pdf_map = {}
-        num = 1
-        print("Downloading " + str(len(links_set)) + " files...")
-        for link in links_set:
-            if link in ["nan", "annual_report_does_not_exists"]:
-                continue
-            response = requests.get(link)
-            links_to_pdf_map[link] = "banque" + str(num) + ".pdf"
-            with open("banque" + str(num) + ".pdf", "wb") as f:
-                print("banque" + str(num) + ".pdf")
-                f.write(response.content)
-            num += 1
-        del num
+        links_to_pdf_map = download_all(links_set)
         links_to_pdf_map[np.nan] = np.nan
         links_to_pdf_map["annual_report_does_not_exists"] = np.nan
         pdf_links_df["files"] = pdf_links_df["pdf_url"].apply(
@@ -203,7 +194,7 @@ def main():
         pdf_links_df.to_csv("pdf_names.csv", mode="w", index=False)
     tables = []
     done = {}
-    for idx, row in pdf_links_df.iterrows():
+    for idx, row in rows or parsable(pdf_links_df).iterrows():
         website = row["name"]
         read_file = row["files"]
         if str(read_file) == "nan":
@@ -212,7 +203,7 @@ def main():
         if read_file in done:
             pdf = done[read_file]
         else:
-            pdf = PdfFileReader(read_file)
+            pdf = get_store(read_file).pdf
             done[read_file] = pdf
         pdf._override_encryption = True
         pdf._flatten()
@@ -7,21 +7,26 @@ import re
 import sys
 import os
 import warnings
-from pdfminer.high_level import extract_text
-from PyPDF2 import PdfFileReader
-import tabula
 import pandas as pd
 import numpy as np
-import requests
 import time
 import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import common.pages
+from common.pages import get_miner_store, get_store
+from common.outline import outline_contents
+from common.tables import read_pdf
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import parsable
+
 warnings.filterwarnings("ignore")
 
 with open("./src/bnp/currencies.txt") as f:
     currencies = f.readline().split()
 
-done1, type1_cont = {}, {}
+type1_cont = {}
 
 
 def parse_type1(pdf, read_file, website, pdf_url):
@@ -33,23 +38,35 @@ def parse_type1(pdf, read_file, website, pdf_url):
     website -- fund_name_website
     pdf_url -- pdf link
     """
-    if "Table des matières" not in extract_text(read_file, page_numbers=[2]):
+    if "Table des matières" not in get_miner_store(read_file)[2]:
         return []
         return parse_type3(pdf, read_file, website, pdf_url)
     elif "BNP Paribas" in website:
         return []
         return parse_type2(pdf, read_file, website, pdf_url)
     else:
-        if read_file in type1_cont:
+        text = (
+            re.sub(
+                "THEAM QUANT- |BNP PARIBAS COMFORT |C CAPITALISATION| LIFE EUR CAPITALISATION|BNP PARIBAS FLEXI I |BNP PARIBAS A FUND ",
+                "",
+                website,
+            )
+            .split("[")[0]
+            .strip()
+        )
+        # the printed page p is searched from index p + 1 (page p + 2)
+        contents = outline_contents(
+            read_file, lambda x: text in x.upper(), offset=2
+        )
+        if contents is not None:
+            contents["pg"] = contents["pg"].apply(str)
+        elif read_file in type1_cont:
             contents = type1_cont[read_file]
         else:
-            content_pgs = [
-                i + 1
-                for i in range(8)
-                if "Table des matières"
-                in extract_text(read_file, page_numbers=[i])
-            ]
-            contents = tabula.read_pdf(
+            content_pgs = get_miner_store(read_file).find(
+                "Table des matières", pages=range(8)
+            )
+            contents = read_pdf(
                 read_file,
                 pages=content_pgs,
                 area=[0, 0, 828, 590],
@@ -66,54 +83,39 @@ def parse_type1(pdf, read_file, website, pdf_url):
             type1_cont[read_file] = contents
         start, end = 0, 0
         for idx, r in contents.iterrows():
-            text = (
-                re.sub(
-                    "THEAM QUANT- |BNP PARIBAS COMFORT |C CAPITALISATION| LIFE EUR CAPITALISATION|BNP PARIBAS FLEXI I |BNP PARIBAS A FUND ",
-                    "",
-                    website,
-                )
-                .split("[")[0]
-                .strip()
-            )
             if text in r["fund"].upper():
                 start, end = (
                     int(r["pg"].strip()),
                     int(contents["pg"][idx + 1].strip()) - 1,
                 )
                 break
-        pages = [
-            i + 1
-            for i in range(start + 1, end + 2)
-            if "Portefeuille-titres au"
-            in extract_text(read_file, page_numbers=[i])
-        ]
-        pages = tuple(pages)
+        pages = tuple(
+            get_miner_store(read_file).find(
+                "Portefeuille-titres au", pages=range(start + 1, end + 2)
+            )
+        )
         if not pages:
             print("not found")
             return []
         print(pages)
-        if pages in done1:
-            table = done1[(pages, read_file)]
-        else:
-            tables = tabula.read_pdf(
-                read_file,
-                pages=pages,
-                area=[0, 0, 828, 590],
-                columns=[100, 352, 373, 498],
-                guess=False,
-                silent=True,
-            )
-            for i in range(len(tables)):
-                tables[i].columns = [
-                    "_1",
-                    "holding_name",
-                    "currency",
-                    "market_value",
-                    "net_assets",
-                ]
-                tables[i].drop(columns=["_1"], inplace=True)
-            table = pd.concat(tables, ignore_index=True)
-            done1[(pages, read_file)] = table
+        tables = read_pdf(
+            read_file,
+            pages=pages,
+            area=[0, 0, 828, 590],
+            columns=[100, 352, 373, 498],
+            guess=False,
+            silent=True,
+        )
+        for i in range(len(tables)):
+            tables[i].columns = [
+                "_1",
+                "holding_name",
+                "currency",
+                "market_value",
+                "net_assets",
+            ]
+            tables[i].drop(columns=["_1"], inplace=True)
+        table = pd.concat(tables, ignore_index=True)
         table["fund_name_website"] = website
         table["fund_name_report"] = text.upper()
         table["pdf_url"] = pdf_url
@@ -134,7 +136,7 @@ def parse_type1(pdf, read_file, website, pdf_url):
         return table.reset_index(drop=True)
 
 
-type2_cont, done2 = {}, {}
+type2_cont = {}
 
 
 def parse_type2(pdf, read_file, website, pdf_url):
@@ -146,16 +148,24 @@ def parse_type2(pdf, read_file, website, pdf_url):
     website -- fund_name_website
     pdf_url -- pdf link
     """
-    if read_file in type2_cont:
+    text = (
+        website.replace("BNP Paribas ", "")
+        .replace("Sustainable ", "")
+        .replace("  ", " ")
+        .split("[")[0]
+        .strip()
+    )
+    # the printed page p is searched from index p + 1 (page p + 2)
+    contents = outline_contents(read_file, lambda x: text in x, offset=2)
+    if contents is not None:
+        contents["pg"] = contents["pg"].apply(str)
+    elif read_file in type2_cont:
         contents = type2_cont[read_file]
     else:
-        content_pgs = [
-            i + 1
-            for i in range(8)
-            if "Table des matières"
-            in extract_text(read_file, page_numbers=[i])
-        ]
-        contents = tabula.read_pdf(
+        content_pgs = get_miner_store(read_file).find(
+            "Table des matières", pages=range(8)
+        )
+        contents = read_pdf(
             read_file,
             pages=content_pgs,
             area=[0, 0, 828, 590],
@@ -172,72 +182,59 @@ def parse_type2(pdf, read_file, website, pdf_url):
         type2_cont[read_file] = contents
     start, end, report = 0, 0, None
     for idx, r in contents.iterrows():
-        text = (
-            website.replace("BNP Paribas ", "")
-            .replace("Sustainable ", "")
-            .replace("  ", " ")
-            .split("[")[0]
-            .strip()
-        )
         if text in r["fund"]:
             start, end = (
                 int(r["pg"].strip()),
                 int(contents["pg"][idx + 1].strip()) - 1,
             )
             break
-    pages = [
-        i + 1
-        for i in range(start + 1, end + 2)
-        if "Portefeuille-titres au"
-        in extract_text(read_file, page_numbers=[i])
-    ]
-    pages = tuple(pages)
-    print(pages)
-    if pages in done2:
-        table = done2[(pages, read_file)]
-    else:
-        tables = tabula.read_pdf(
-            read_file,
-            pages=pages,
-            area=[0, 0, 828, 590],
-            columns=[71, 186, 204, 263, 299, 338, 456, 473, 533],
-            guess=False,
-            silent=True,
+    pages = tuple(
+        get_miner_store(read_file).find(
+            "Portefeuille-titres au", pages=range(start + 1, end + 2)
         )
-        for i in range(len(tables)):
-            df1, df2 = tables[i].iloc[:, :5], tables[i].iloc[:, 5:]
-            if len(df1.columns) == 5 and len(df2.columns) == 5:
-                df1.columns = df2.columns = [
-                    "_1",
-                    "holding_name",
-                    "currency",
-                    "market_value",
-                    "net_assets",
-                ]
-                tables[i] = pd.concat([df1, df2], ignore_index=True)
-                tables[i].drop(columns=["_1"], inplace=True)
-            elif len(df1.columns) == 5:
-                df1.columns = [
-                    "_1",
-                    "holding_name",
-                    "currency",
-                    "market_value",
-                    "net_assets",
-                ]
-                tables[i] = df1
-                tables[i].drop(columns=["_1"], inplace=True)
-            elif len(df2.columns) == 5:
-                df2.columns = [
-                    "_1",
-                    "holding_name",
-                    "currency",
-                    "market_value",
-                    "net_assets",
-                ]
-                tables[i] = df2
-                tables[i].drop(columns=["_1"], inplace=True)
-        table = pd.concat(tables, ignore_index=True)
-        done2[(pages, read_file)] = table
+    )
+    print(pages)
+    tables = read_pdf(
+        read_file,
+        pages=pages,
+        area=[0, 0, 828, 590],
+        columns=[71, 186, 204, 263, 299, 338, 456, 473, 533],
+        guess=False,
+        silent=True,
+    )
+    for i in range(len(tables)):
+        df1, df2 = tables[i].iloc[:, :5], tables[i].iloc[:, 5:]
+        if len(df1.columns) == 5 and len(df2.columns) == 5:
+            df1.columns = df2.columns = [
+                "_1",
+                "holding_name",
+                "currency",
+                "market_value",
+                "net_assets",
+            ]
+            tables[i] = pd.concat([df1, df2], ignore_index=True)
+            tables[i].drop(columns=["_1"], inplace=True)
+        elif len(df1.columns) == 5:
+            df1.columns = [
+                "_1",
+                "holding_name",
+                "currency",
+                "market_value",
+                "net_assets",
+            ]
+            tables[i] = df1
+            tables[i].drop(columns=["_1"], inplace=True)
+        elif len(df2.columns) == 5:
+            df2.columns = [
+                "_1",
+                "holding_name",
+                "currency",
+                "market_value",
+                "net_assets",
+            ]
+            tables[i] = df2
+            tables[i].drop(columns=["_1"], inplace=True)
+    table = pd.concat(tables, ignore_index=True)
 
     table["fund_name_website"] = website
     table["fund_name_report"] = text
@@ -283,8 +280,6 @@ def parse_type2(pdf, read_file, website, pdf_url):
     return table.reset_index(drop=True)
 
 
-done3 = {}
-
 type3_cont = {}
 
 
@@ -300,8 +295,9 @@ def parse_type3(pdf, read_file, website, pdf_url):
     typ = None
     if "CRELAN PENSION FUND" in website:
         pages = []
+        store = get_miner_store(read_file)
         for i in range(pdf.getNumPages() - 2):
-            text = extract_text(read_file, page_numbers=[i]).replace("\n", "")
+            text = store.flat(i)
             k = i
             if (
                 website.split("[")[0].strip() in text
@@ -315,16 +311,34 @@ def parse_type3(pdf, read_file, website, pdf_url):
                 ):
                     pages.append(k + 1)
                     k += 1
-                    text = extract_text(read_file, page_numbers=[k]).replace(
-                        "\n", ""
-                    )
+                    text = store.flat(k)
                 pages = tuple(pages)
                 break
     else:
-        if read_file in type3_cont:
+        text = (
+            re.sub(
+                r"BNP PARIBAS B STRATEGY |METROPOLITAN-RENTASTRO |BNPPF PRIVATE |BNPPF S-FUND |BPOST BANK FUND |BNP PARIBAS B INVEST |BNP PARIBAS B CONTROL |BNP PARIBAS A FUND ",
+                "",
+                website,
+            )
+            .split("[")[0]
+            .lower()
+            .strip()
+        )
+        # the section is the composition heading following the fund
+        contents = outline_contents(
+            read_file,
+            lambda x: text in x.lower(),
+            lambda x: "COMPOSITION DES ACTIFS ET CHIFFRES" in x
+            or "Composition des actifs au" in x,
+        )
+        if contents is not None:
+            contents["pg"] = contents["pg"].apply(float)
+            contents = [contents]
+        elif read_file in type3_cont:
             contents = type3_cont[read_file]
         else:
-            contents = tabula.read_pdf(
+            contents = read_pdf(
                 read_file,
                 pages=[2, 3, 4, 5],
                 area=[0, 50, 835, 590],
@@ -354,16 +368,6 @@ def parse_type3(pdf, read_file, website, pdf_url):
                     else:
                         start, end = int(r["pg"]), int(contents["pg"][idx + 1])
                     break
-                text = (
-                    re.sub(
-                        r"BNP PARIBAS B STRATEGY |METROPOLITAN-RENTASTRO |BNPPF PRIVATE |BNPPF S-FUND |BPOST BANK FUND |BNP PARIBAS B INVEST |BNP PARIBAS B CONTROL |BNP PARIBAS A FUND ",
-                        "",
-                        website,
-                    )
-                    .split("[")[0]
-                    .lower()
-                    .strip()
-                )
                 if text in r["fund"].lower():
                     for i in range(idx, len(contents)):
                         if (
@@ -389,11 +393,9 @@ def parse_type3(pdf, read_file, website, pdf_url):
             pages = tuple(range(start, end))
         else:
             typ = 1
-            for i in range(pdf.getNumPages() - 1, 0, -1):
-                if (
-                    "Inventaire des instruments financiers au"
-                    in pdf.getPage(i).extractText()
-                ):
+            store = get_store(read_file, pdf)
+            for i in range(len(store) - 1, 0, -1):
+                if "Inventaire des instruments financiers au" in store[i]:
                     page = i + 1
                     break
             if not page:
@@ -401,59 +403,53 @@ def parse_type3(pdf, read_file, website, pdf_url):
                 return []
             pages = tuple(range(page, pdf.getNumPages() + 1))
     print(pages)
-    if (read_file, pages) in done3:
-        table = done3[read_file, pages]
+    if typ:
+        tables = read_pdf(
+            read_file,
+            pages=pages,
+            area=[0, 0, 835, 590],
+            columns=[254, 319, 373, 405, 506],
+            guess=False,
+            silent=True,
+        )
     else:
-        if typ:
-            tables = tabula.read_pdf(
-                read_file,
-                pages=pages,
-                area=[0, 0, 835, 590],
-                columns=[254, 319, 373, 405, 506],
-                guess=False,
-                silent=True,
-            )
-        else:
-            tables = tabula.read_pdf(
-                read_file,
-                pages=pages,
-                area=[0, 0, 835, 590],
-                lattice=True,
-                #columns=[251, 323, 356, 413, 463, 536],
-                guess=False,
-                silent=True,
-            )
-        _tables = []
-        for i in range(len(tables)):
-            if len(tables[i].columns) == 8:
-                tables[i].columns = [
-                    "holding_name",
-                    "_1",
-                    "currency",
-                    "_2",
-                    "market_value",
-                    "_3",
-                    "_4",
-                    "net_assets",
-                ]
-                tables[i] = tables[i].drop(columns=["_1", "_2", "_3","_4"])
-                _tables.append(tables[i])
-            if len(tables[i].columns) == 7:
-                tables[i].columns = [
-                    "holding_name",
-                    "_1",
-                    "currency",
-                    "_4"
-                    "market_value",
-                    "_3"
-                    "net_assets",
-                ]
-                tables[i] = tables[i].drop(columns=["_1", "_2","_3"])
-            df = tables[i].copy()
-            
-                _tables.append(tables[i])
-        table = pd.concat(_tables, ignore_index=True)
-        done3[(read_file, pages)] = table
+        tables = read_pdf(
+            read_file,
+            pages=pages,
+            area=[0, 0, 835, 590],
+            lattice=True,
+            #columns=[251, 323, 356, 413, 463, 536],
+            guess=False,
+            silent=True,
+        )
+    _tables = []
+    for i in range(len(tables)):
+        if len(tables[i].columns) == 8:
+            tables[i].columns = [
+                "holding_name",
+                "_1",
+                "currency",
+                "_2",
+                "market_value",
+                "_3",
+                "_4",
+                "net_assets",
+            ]
+            tables[i] = tables[i].drop(columns=["_1", "_2", "_3","_4"])
+            _tables.append(tables[i])
+        if len(tables[i].columns) == 7:
+            tables[i].columns = [
+                "holding_name",
+                "_1",
+                "currency",
+                "_2",
+                "market_value",
+                "_3",
+                "net_assets",
+            ]
+            tables[i] = tables[i].drop(columns=["_1", "_2", "_3"])
+            _tables.append(tables[i])
+    table = pd.concat(_tables, ignore_index=True)
     table["fund_name_report"] = " ".join(website.split()[:-1])
     table["fund_name_website"] = website
     table["pdf_url"] = pdf_url
@@ -487,6 +483,8 @@ def main():
     in_path = sys.argv[sys.argv.index("-i") + 1]
     out_path = sys.argv[sys.argv.index("-o") + 1]
     pdf_out_path = sys.argv[sys.argv.index("-p") + 1]
+    if "-w" in sys.argv:
+        common.pages.workers = int(sys.argv[sys.argv.index("-w") + 1])
     currdir = os.getcwd()
     print("Taking input from " + in_path)
 
@@ -495,23 +493,14 @@ def main():
     links_set.discard("annual_report_does_not_exists")
     os.chdir(os.path.join(currdir, os.path.normpath(pdf_out_path)))
 
-    if len(pdf_links_df.columns) == 3:
+    rows = None
+    if "-pipeline" in sys.argv and len(pdf_links_df.columns) == 3:
+        rows = download_rows(pdf_links_df, save="pdf_names.csv")
+    elif len(pdf_links_df.columns) == 3:
         links_set = set(pdf_links_df["pdf_url"])
         links_set.discard("nan")
         links_set.discard("annual_report_does_not_exists")
-        links_to_pdf_map = {}
-        num = 1
-        print("Downloading " + str(len(links_set)) + " files...")
-        for link in links_set:
-            if link in ["nan", "annual_report_does_not_exists"]:
-                continue
-            response = requests.get(link)
-            links_to_pdf_map[link] = "BNP_" + str(num) + ".pdf"
-            with open("BNP_" + str(num) + ".pdf", "wb") as f:
-                print("BNP_" + str(num) + ".pdf")
-                f.write(response.content)
-            num += 1
-        del num
+        links_to_pdf_map = download_all(links_set)
         links_to_pdf_map[np.nan] = np.nan
         links_to_pdf_map["annual_report_does_not_exists"] = np.nan
         pdf_links_df["files"] = pdf_links_df["pdf_url"].apply(
@@ -521,7 +510,7 @@ def main():
     tables = []
     issues = []
     start = time.time()
-    for idx, row in pdf_links_df.iterrows():
+    for idx, row in rows or parsable(pdf_links_df).iterrows():
         table = []
         website = row["name"]
         read_file = row["files"]
@@ -531,12 +520,10 @@ def main():
             issues.append([website, read_file])
             continue
         try:
-            pdf = PdfFileReader(read_file)
-        except BaseException:
+            pdf = get_store(read_file).pdf
+        except Exception:
             print("Error reading PDF", read_file, "containing fund: ", website)
             continue
-        pdf._override_encryption = True
-        pdf._flatten()
         print("parsing ", read_file, website, end="   ")
         table = parse_type1(pdf, read_file, website, pdf_url)
         if len(table) > 0:
@@ -10,13 +10,17 @@ import warnings
 import re
 import os
 import sys
-from pdfminer.high_level import extract_text
-import tabula
 from country_list import countries_for_language as countries_in
 import pandas as pd
 from pandas import DataFrame as DF
 import numpy as np
-import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.pages import get_miner_store
+from common.tables import read_pdf
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import parsable
 
 warnings.filterwarnings("ignore")
 
@@ -174,26 +178,16 @@ def main():
     links_set = set(pdf_links_df["pdf_url"])
     links_set.discard("annual_report_does_not_exists")
     os.chdir(os.path.join(currdir, pdf_out_path))
-    if len(pdf_links_df.columns) == 2:
+    rows = None
+    if "-pipeline" in sys.argv and len(pdf_links_df.columns) == 2:
+        rows = download_rows(
+            pdf_links_df, save="capitalatwork_pdf_names.csv"
+        )
+    elif len(pdf_links_df.columns) == 2:
         links_set = set(pdf_links_df["pdf_url"])
         links_set.discard("nan")
         links_set.discard("annual_report_does_not_exists")
-        links_to_pdf_map = {}
-
-        num = 1
-
-        print("Downloading " + str(len(links_set)) + " files...")
-        for link in links_set:
-            if link in ["nan", "annual_report_does_not_exists"]:
-                links_to_pdf_map[link] = np.nan
-                continue
-
-            response = requests.get(link)
-            links_to_pdf_map[link] = "capitalatwork_" + str(num) + ".pdf"
-            print("capitalatwork_" + str(num) + ".pdf")
-            with open("capitalatwork_" + str(num) + ".pdf", "wb") as file:
-                file.write(response.content)
-            num += 1
+        links_to_pdf_map = download_all(links_set)
 
         links_set.discard("annual_report_does_not_exists")
 
@@ -201,8 +195,6 @@ def main():
             lambda x: links_to_pdf_map[x]
         )
 
-        del num
-
         pdf_links_df.to_csv(
             "capitalatwork_pdf_names.csv",
             mode="w",
@@ -210,25 +202,16 @@ def main():
         )
 
     fund_to_tables = {}
-    if len(links_set) == 1:
-        read_file = pdf_links_df["files"][0]
-        contents_list = extract_text(
-            read_file,
-            page_numbers=[1],
-        ).split("\n")
+    # the contents are those of the report of the first row
+    read_file, contents_list = None, None
 
-    else:
-        read_file, contents_list = None, None
-
-    for index, row in pdf_links_df.iterrows():
+    for index, row in rows or parsable(pdf_links_df).iterrows():
         fund_name_website = row["name"]
         fund_name = row["name"].split(" - ")[0]
         pdf_url = row["pdf_url"]
         if not read_file:
             read_file = row["files"]
-            contents_list = extract_text(read_file, page_numbers=[1]).split(
-                "\n"
-            )
+            contents_list = get_miner_store(read_file)[1].split("\n")
 
         start, end = 0, 0
         for i in range(len(contents_list)):
@@ -239,7 +222,7 @@ def main():
 
         if start != 0 and end != 0:
             print("Parsing : " + read_file + " for " + fund_name + "\n")
-            tables = tabula.read_pdf(
+            tables = read_pdf(
                 read_file,
                 pages=list(range(start, end + 1)),
                 area=(205, 85, 710, 500),
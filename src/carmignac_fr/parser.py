@@ -7,12 +7,15 @@ containing parsed results.
 import sys
 import os
 import warnings
-from pdfminer.high_level import extract_text
-from PyPDF2 import PdfFileReader
-import tabula
 import pandas as pd
 import numpy as np
-import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.pages import get_miner_store, get_store
+from common.tables import read_pdf
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import parsable
 
 warnings.filterwarnings("ignore")
 
@@ -35,7 +38,7 @@ def parse_type1(pdf, read_file, website, pdf_url):
     if len(_contents) > 0:
         contents = _contents
     else:
-        contents = tabula.read_pdf(
+        contents = read_pdf(
             read_file,
             pages=[2, 3],
             area=[0, 0, 828, 590],
@@ -71,14 +74,11 @@ def parse_type1(pdf, read_file, website, pdf_url):
         return pd.DataFrame(
             columns=["holding_name", "currency", "market_value", "net_assets"]
         )
-    pages = [
-        i + 1
-        for i in range(start + 1, end)
-        if "Portefeuille-titres au"
-        in pdf.getPage(i).extractText().replace("\n", "")
-    ]
+    pages = get_store(read_file, pdf).find(
+        "Portefeuille-titres au", pages=range(start + 1, end)
+    )
     print(pages)
-    tables = tabula.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=pages,
         area=[0, 0, 828, 590],
@@ -115,31 +115,23 @@ def parse_type2(pdf, read_file, website, pdf_url):
     website -- fund_name_website
     pdf_url -- Pdf file link
     """
-    pages = []
-    pages = [
-        i + 1
-        for i in range(
-            pdf.getNumPages() - 1, max(pdf.getNumPages() - 16, 0), -1
-        )
-        if "Désignation des valeurs"
-        in pdf.getPage(i).extractText().replace("\n", "")
-    ]
+    store = get_store(read_file, pdf)
+    pages = store.find(
+        "Désignation des valeurs",
+        pages=range(len(store) - 1, max(len(store) - 16, 0), -1),
+    )
     if not pages:
-        pages = [
-            i + 1
-            for i in range(
-                pdf.getNumPages() - 1, max(pdf.getNumPages() - 16, 0), -1
-            )
-            if "Désignation des valeurs"
-            in extract_text(read_file, page_numbers=[i])
-        ]
+        pages = get_miner_store(read_file).find(
+            "Désignation des valeurs",
+            pages=range(len(store) - 1, max(len(store) - 16, 0), -1),
+        )
     if not pages:
         print("not found")
         return pd.DataFrame(
             columns=["holding_name", "currency", "market_value", "net_assets"]
         )
     print(pages)
-    tables = tabula.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=pages[::-1],
         area=[0, 0, 828, 590],
@@ -178,23 +170,14 @@ def main():
     links_set = set(pdf_links_df["pdf_url"])
     links_set.discard("annual_report_does_not_exists")
     os.chdir(os.path.join(currdir, os.path.normpath(pdf_out_path)))
-    if len(pdf_links_df.columns) == 2:
+    rows = None
+    if "-pipeline" in sys.argv and len(pdf_links_df.columns) == 2:
+        rows = download_rows(pdf_links_df, save="pdf_names.csv")
+    elif len(pdf_links_df.columns) == 2:
         links_set = set(pdf_links_df["pdf_url"])
         links_set.discard("nan")
         links_set.discard("annual_report_does_not_exists")
-        links_to_pdf_map = {}
-        num = 1
-        print("Downloading " + str(len(links_set)) + " files...")
-        for link in links_set:
-            if link in ["nan", "annual_report_does_not_exists"]:
-                continue
-            response = requests.get(link)
-            links_to_pdf_map[link] = "carmignac" + str(num) + ".pdf"
-            with open("carmignac" + str(num) + ".pdf", "wb") as f:
-                print("carmignac" + str(num) + ".pdf")
-                f.write(response.content)
-            num += 1
-        del num
+        links_to_pdf_map = download_all(links_set)
         links_to_pdf_map[np.nan] = np.nan
         links_to_pdf_map["annual_report_does_not_exists"] = np.nan
         pdf_links_df["files"] = pdf_links_df["pdf_url"].apply(
@@ -203,16 +186,12 @@ def main():
         pdf_links_df.to_csv("pdf_names.csv", mode="w", index=False)
 
     tables = []
-    for idx, row in pdf_links_df.iterrows():
+    for idx, row in rows or parsable(pdf_links_df).iterrows():
         website = row["name"]
         read_file = row["files"]
         pdf_url = row["pdf_url"]
-        pdf = PdfFileReader(read_file)
-        pdf._override_encryption = True
-        pdf._flatten()
-        if "CARMIGNAC PORTFOLIO" in pdf.getPage(0).extractText().replace(
-            "\n", ""
-        ):
+        pdf = get_store(read_file).pdf
+        if "CARMIGNAC PORTFOLIO" in get_store(read_file).flat(0):
             print("parsing ", read_file, website, end="  ")
             tables.append(parse_type1(pdf, read_file, website, pdf_url))
         else:
@@ -7,11 +7,15 @@ import re
 import sys
 import os
 import warnings
-from PyPDF2 import PdfFileReader
-import tabula
 import pandas as pd
 import numpy as np
-import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.pages import get_store
+from common.tables import read_pdf
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import parsable
 
 warnings.filterwarnings("ignore")
 
@@ -32,21 +36,20 @@ def parse_type1(pdf, read_file, website, pdf_url):
     if read_file in file_contents:
         contents = file_contents[read_file]
     else:
+        store = get_store(read_file, pdf)
         cont_pg = []
         for i in range(5):
-            if "TABLE DES MATIERES" in pdf.getPage(i).extractText().replace(
-                "\n", ""
-            ):
+            if "TABLE DES MATIERES" in store.flat(i):
                 k = i
                 while (
                     "Mouvements Significatifs Du Portefeuille"
-                    not in pdf.getPage(k).extractText().replace("\n", "")
+                    not in store.flat(k)
                 ):
                     cont_pg.append(k + 1)
                     k += 1
                 cont_pg.append(k + 1)
                 break
-        contents = tabula.read_pdf(
+        contents = read_pdf(
             read_file,
             pages=cont_pg,
             area=[0, 0, 828, 590],
@@ -88,7 +91,7 @@ def parse_type1(pdf, read_file, website, pdf_url):
         return []
 
     def func(x, i):
-        return x.getPage(i).extractText().replace("\n", "")
+        return get_store(read_file, x).flat(i)
 
     text = "Juste valeur"
     pattern1 = re.compile(
@@ -96,7 +99,7 @@ def parse_type1(pdf, read_file, website, pdf_url):
     )
 
     def func1(i):
-        return tabula.read_pdf(
+        return read_pdf(
             read_file,
             pages=[i],
             area=[121, 0, 176, 590],
@@ -118,7 +121,7 @@ def parse_type1(pdf, read_file, website, pdf_url):
                 pages.append(i + 1)
     pages = tuple(pages)
     print(pages)
-    tables = tabula.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=pages,
         area=[0, 0, 828, 590],
@@ -178,21 +181,18 @@ def parse_type2(pdf, read_file, website, pdf_url):
     )
     text = re.sub(pattern, "", website)
     report = re.sub("\\s+", " ", text).strip()
+    store = get_store(read_file, pdf)
     pages = []
-    for i in range(pdf.getNumPages() - 1, 0, -1):
-        if "Désignation des valeurs" in pdf.getPage(i).extractText().replace(
-            "\n", ""
-        ):
+    for i in range(len(store) - 1, 0, -1):
+        if "Désignation des valeurs" in store.flat(i):
             k = i
-            while "Désignation des valeurs" in pdf.getPage(
-                k
-            ).extractText().replace("\n", ""):
+            while "Désignation des valeurs" in store.flat(k):
                 pages.append(k + 1)
                 k -= 1
             break
     pages = tuple(sorted(pages))
     print(pages)
-    tables = tabula.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=pages,
         area=[0, 0, 828, 590],
@@ -246,23 +246,14 @@ def main():
     links_set = set(pdf_links_df["pdf_url"])
     links_set.discard("annual_report_does_not_exists")
     os.chdir(os.path.join(currdir, os.path.normpath(pdf_out_path)))
-    if len(pdf_links_df.columns) == 2:
+    rows = None
+    if "-pipeline" in sys.argv and len(pdf_links_df.columns) == 2:
+        rows = download_rows(pdf_links_df, save="pdf_names.csv")
+    elif len(pdf_links_df.columns) == 2:
         links_set = set(pdf_links_df["pdf_url"])
         links_set.discard("nan")
         links_set.discard("annual_report_does_not_exists")
-        links_to_pdf_map = {}
-        num = 1
-        print("Downloading " + str(len(links_set)) + " files...")
-        for link in links_set:
-            if link in ["nan", "annual_report_does_not_exists"]:
-                continue
-            response = requests.get(link)
-            links_to_pdf_map[link] = "comgest" + str(num) + ".pdf"
-            with open("comgest" + str(num) + ".pdf", "wb") as f:
-                print("comgest" + str(num) + ".pdf")
-                f.write(response.content)
-            num += 1
-        del num
+        links_to_pdf_map = download_all(links_set)
         links_to_pdf_map[np.nan] = np.nan
         links_to_pdf_map["annual_report_does_not_exists"] = np.nan
         pdf_links_df["files"] = pdf_links_df["pdf_url"].apply(
@@ -279,7 +270,7 @@ def main():
         "|".join(to_remove) + "|(?<= )[A-Z](?= )" + "|ACC|DIS"
     )
     type1_file = None
-    for idx, row in pdf_links_df.iterrows():
+    for idx, row in rows or parsable(pdf_links_df).iterrows():
         website = row["name"]
         text = re.sub(pattern, "", website)
         report = re.sub("\\s+", " ", text).strip()
@@ -294,10 +285,8 @@ def main():
             table = done[read_file].copy()
             print("parsing", read_file, website, "  memory")
         else:
-            pdf = PdfFileReader(read_file)
-            if "COMGEST GROWTH PLC" in pdf.getPage(0).extractText().replace(
-                "\n", ""
-            ):
+            pdf = get_store(read_file).pdf
+            if "COMGEST GROWTH PLC" in get_store(read_file).flat(0):
                 if not type1_file: type1_file = read_file
                 else: read_file = type1_file
                 print("parsing1 ", read_file, website, end="  \n")
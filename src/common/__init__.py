@@ -0,0 +1 @@
+"""Helpers shared by the provider parsers in src/<fund_provider_code>/."""
@@ -0,0 +1,280 @@
+"""On-disk caches kept next to the downloaded reports, in the -p folder.
+
+Entries are keyed by the SHA-256 of the PDF bytes, so a report downloaded
+again under another name, or into another run, is still recognised, while
+a report whose content changed is not.
+
+Module functions:
+    file_digest(read_file): --> str
+    encode_mixed(table): --> (DataFrame, list)
+    parser_version(parser_file): --> str
+    text_cache(read_file): --> TextCache
+    table_cache(read_file): --> TableCache
+    result_cache(read_file, version): --> ResultCache
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+
+TEXT_CACHE_NAME = ".page_text.sqlite"
+TABLE_CACHE_NAME = ".tables"
+RESULT_CACHE_NAME = ".results"
+COMMON = os.path.dirname(os.path.abspath(__file__))
+
+digests = {}
+
+
+def file_digest(read_file):
+    """Return the SHA-256 hex digest of the bytes of read_file.
+
+    The digest is remembered for the run as long as the size and the
+    modification time of the file do not change.
+    """
+    key = os.path.abspath(read_file)
+    stat = os.stat(key)
+    if key in digests and digests[key][0] == (stat.st_size, stat.st_mtime):
+        return digests[key][1]
+    sha = hashlib.sha256()
+    with open(key, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    digests[key] = ((stat.st_size, stat.st_mtime), sha.hexdigest())
+    return digests[key][1]
+
+
+def parser_version(parser_file):
+    """Return the SHA-256 hex digest of the code of a parser.
+
+    The code is every file of the folder of parser_file (the parser and
+    its data, e.g. currencies.txt) and the modules of common, which clean
+    the tables as much as the parser does. Call it before changing the
+    working directory, parser_file being usually a relative __file__.
+    """
+    sha = hashlib.sha256()
+    for folder in (os.path.dirname(os.path.abspath(parser_file)), COMMON):
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if os.path.isfile(path) and not name.endswith(".pyc"):
+                sha.update(name.encode() + b"\0")
+                with open(path, "rb") as f:
+                    sha.update(f.read())
+    return sha.hexdigest()
+
+
+class TextCache:
+    """SQLite table of extracted page texts.
+
+    A row is identified by the digest of the PDF, the name and version of
+    the extractor that produced the text and the page index (from 0). The
+    page count of a PDF is stored as page -1.
+    """
+
+    def __init__(self, path):
+        """Open (or create) the cache database at path."""
+        self.path = path
+        self.con = sqlite3.connect(path, timeout=60)
+        with self.con:
+            self.con.execute(
+                "CREATE TABLE IF NOT EXISTS page_text ("
+                "digest TEXT, extractor TEXT, page INTEGER, text TEXT, "
+                "PRIMARY KEY (digest, extractor, page))"
+            )
+
+    def load(self, digest, extractor):
+        """Return {page: text} of everything cached for the PDF."""
+        rows = self.con.execute(
+            "SELECT page, text FROM page_text WHERE digest = ? AND extractor = ?",
+            (digest, extractor),
+        )
+        return dict(rows.fetchall())
+
+    def put(self, digest, extractor, page, text):
+        """Store the text of one page."""
+        try:
+            with self.con:
+                self.con.execute(
+                    "INSERT OR REPLACE INTO page_text VALUES (?, ?, ?, ?)",
+                    (digest, extractor, page, text),
+                )
+        except sqlite3.OperationalError:
+            # a read-only or busy folder only costs the extraction next run
+            pass
+
+
+class TableCache:
+    """Folder of extracted tables stored as Feather files.
+
+    An entry is identified by a key string and made of one file per table,
+    <key>.<i>.feather, with the columns named by their position, and of
+    <key>.json, holding the real column labels of every table and written
+    last, so that an entry is only seen once complete. Object columns
+    holding anything else than strings, which Feather cannot store, are
+    stored as the JSON text of their cells, listed in <key>.json too.
+    Entries read are also kept in memory for the run.
+    """
+
+    def __init__(self, path):
+        """Use (and create if needed) the cache folder at path."""
+        self.path = path
+        self.memory = {}
+        os.makedirs(path, exist_ok=True)
+
+    def load(self, key):
+        """Return the list of DataFrames stored under key, or None.
+
+        The DataFrames are copies which the caller is free to modify.
+        """
+        if key not in self.memory:
+            try:
+                with open(os.path.join(self.path, key + ".json")) as f:
+                    entry = json.load(f)
+                if isinstance(entry, list):
+                    # written before mixed columns were stored
+                    entry = {"columns": entry, "json": [[] for x in entry]}
+                tables = []
+                for i, columns in enumerate(entry["columns"]):
+                    table = pd.read_feather(
+                        os.path.join(self.path, "%s.%d.feather" % (key, i))
+                    )
+                    for j in entry["json"][i]:
+                        table[str(j)] = table[str(j)].map(json.loads)
+                    table.columns = columns
+                    tables.append(table)
+            except (OSError, ValueError, ImportError):
+                return None
+            self.memory[key] = tables
+        return [x.copy() for x in self.memory[key]]
+
+    def put(self, key, tables):
+        """Store the list of DataFrames tables under key.
+
+        Tables which cannot be stored are reported and the files of the
+        entry already written removed: they are extracted again next run.
+        """
+        self.memory[key] = [x.copy() for x in tables]
+        written = []
+        try:
+            mixed = []
+            for i, table in enumerate(tables):
+                table = table.reset_index(drop=True)
+                table.columns = [str(j) for j in range(len(table.columns))]
+                table, columns = encode_mixed(table)
+                mixed.append(columns)
+                written.append(
+                    os.path.join(self.path, "%s.%d.feather" % (key, i))
+                )
+                table.to_feather(written[-1])
+            labels = [list(x.columns) for x in tables]
+            written.append(os.path.join(self.path, key + ".json.tmp"))
+            with open(written[-1], "w") as f:
+                json.dump({"columns": labels, "json": mixed}, f)
+            os.replace(written[-1], os.path.join(self.path, key + ".json"))
+        except (OSError, ValueError, TypeError, ImportError) as e:
+            print("Cannot cache the tables", key, ":", e)
+            for path in written:
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+def encode_mixed(table):
+    """Return table with its mixed object columns as JSON, and their indexes.
+
+    A column is mixed when it holds other values than strings and nulls,
+    e.g. the numbers and the text left in a column by a parser. Its cells
+    become their JSON text, read back to the same values by json.loads.
+    Raise TypeError for a value JSON cannot represent.
+    """
+    mixed = []
+    for j, column in enumerate(table.columns):
+        values = table[column]
+        if values.dtype == object and not all(
+            isinstance(x, str) for x in values.dropna()
+        ):
+            mixed.append(j)
+    if mixed:
+        table = table.copy()
+        for j in mixed:
+            table.iloc[:, j] = [
+                json.dumps(x, default=json_scalar) for x in table.iloc[:, j]
+            ]
+    return table, mixed
+
+
+def json_scalar(value):
+    """Return the Python value of a NumPy scalar, for json.dumps."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("%r cannot be cached" % (value,))
+
+
+class ResultCache(TableCache):
+    """TableCache of the tables parsed for the funds of the reports.
+
+    An entry is the table of one fund (a name or an ISIN, or a tuple of
+    them) of one report, as parsed by one version of a parser: a report
+    or a parser which changed is parsed again, every other fund is read
+    back as it was parsed.
+    """
+
+    def __init__(self, path, version):
+        """Use the cache folder at path for the parser of version."""
+        super().__init__(path)
+        self.version = version
+
+    def key(self, read_file, fund):
+        """Return the key of the entry of fund in read_file."""
+        return hashlib.sha256(
+            json.dumps(
+                [file_digest(read_file), fund, self.version], default=str
+            ).encode()
+        ).hexdigest()
+
+    def get(self, read_file, fund):
+        """Return a copy of the table of fund in read_file, or None."""
+        tables = self.load(self.key(read_file, fund))
+        return None if tables is None else tables[0]
+
+    def set(self, read_file, fund, table):
+        """Store the table of fund in read_file."""
+        self.put(self.key(read_file, fund), [table])
+
+
+caches = {}
+
+
+def text_cache(read_file):
+    """Return the text cache of the folder holding read_file."""
+    folder = os.path.dirname(os.path.abspath(read_file))
+    if folder not in caches:
+        caches[folder] = TextCache(os.path.join(folder, TEXT_CACHE_NAME))
+    return caches[folder]
+
+
+table_caches = {}
+
+
+def table_cache(read_file):
+    """Return the table cache of the folder holding read_file."""
+    folder = os.path.dirname(os.path.abspath(read_file))
+    if folder not in table_caches:
+        table_caches[folder] = TableCache(
+            os.path.join(folder, TABLE_CACHE_NAME)
+        )
+    return table_caches[folder]
+
+
+result_caches = {}
+
+
+def result_cache(read_file, version):
+    """Return the result cache of version of the folder holding read_file."""
+    folder = os.path.dirname(os.path.abspath(read_file))
+    if (folder, version) not in result_caches:
+        result_caches[folder, version] = ResultCache(
+            os.path.join(folder, RESULT_CACHE_NAME), version
+        )
+    return result_caches[folder, version]
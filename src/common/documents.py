@@ -0,0 +1,57 @@
+"""Map the report files of the input rows to the distinct documents.
+
+The same report is often linked from several fund pages under different
+URLs. Downloads are named by their digest, but an input file may still
+name several copies of a report, e.g. a pdf_names.csv of an older run.
+Rows are mapped to one canonical file per SHA-256 of the content, so that
+src/run.py hands every distinct document to one parser process, which
+reads it once for all the fund rows referencing it.
+
+Module functions:
+    canonical_files(files, folder="."): --> dict
+    dedupe_files(files, folder="."): --> pd.Series
+"""
+import os
+from .cache import file_digest
+
+
+def canonical_files(files, folder="."):
+    """Return {file: first file of the same content} for the given files.
+
+    Missing files are mapped to themselves.
+
+    Keyword Arguments:
+    files -- file names
+    folder -- folder the file names are relative to
+    """
+    by_digest, canonical = {}, {}
+    for read_file in files:
+        if read_file in canonical:
+            continue
+        path = os.path.join(folder, str(read_file))
+        if not os.path.isfile(path):
+            canonical[read_file] = read_file
+            continue
+        digest = file_digest(path)
+        canonical[read_file] = by_digest.setdefault(digest, read_file)
+    return canonical
+
+
+def dedupe_files(files, folder="."):
+    """Return files with every file replaced by its canonical file.
+
+    Keyword Arguments:
+    files -- pd.Series of file names, NaN for rows without a report
+    folder -- folder the file names are relative to
+    """
+    canonical = canonical_files(files.dropna().unique(), folder)
+    distinct = len(set(canonical.values()))
+    if distinct < len(canonical):
+        print(
+            "Found",
+            len(canonical),
+            "files,",
+            distinct,
+            "distinct reports",
+        )
+    return files.apply(lambda x: canonical.get(x, x))
@@ -0,0 +1,943 @@
+"""Report downloads shared by the provider parsers.
+
+The reports of a run are fetched through one requests.Session, whose
+connection pool keeps the connections to every host alive from one file to
+the next, by a bounded pool of threads. The main() of every parser hands
+the links of its input file to download_all() and gets back the name of
+the file each link was saved to.
+
+The number of transfers to the same host at a time is adapted to what the
+host bears by additive increase, multiplicative decrease (AIMD): starting
+from HOST_LIMIT, it grows by one every round of answers which come back
+about as fast as the fastest one seen, and is halved when the host answers
+429 Too Many Requests or 5xx, after which its transfers wait for the delay
+given in Retry-After and are retried. The transfers, throttled answers and
+throughput of every host are printed after each batch of downloads.
+
+Bodies are streamed to disk in chunks, never held in memory whole, into a
+partial file named after the URL next to the final one. A transfer broken
+off is resumed from the end of the partial file with an HTTP Range request,
+also in a later run, and the partial file is renamed to its final name
+only once complete, so a file found under its final name is never cut
+short. The ETag or Last-Modified of the answer a partial file was started
+from is kept next to it (<part>.json) and sent as If-Range, so that a
+report changed meanwhile comes back whole instead of being spliced onto
+the old bytes; a partial file without one is downloaded again from zero.
+The session follows redirects. The hosts of the links given to
+download_all() with browser=True (the roth parser, whose site answers
+scripts with an error page where a browser gets the report) are sent the
+headers of a browser (BROWSER_HEADERS), and only their cookies are kept
+from one request to the next; every other host gets the defaults of
+requests and no cookie it did not set along the redirects of the same
+request.
+
+Reports are kept in the -p folder under the SHA-256 of their content
+(<digest>.pdf), so the same report always has the same name whatever the
+link and the run it was downloaded in. A manifest in the folder
+(.manifest.json) records for every link the digest of the report it served
+and its ETag and Last-Modified headers: a report downloaded before is
+revalidated with If-None-Match / If-Modified-Since, and costs a single 304
+answer when unchanged.
+
+Every file downloaded is checked to be a whole PDF before it is stored, at
+the cost of reading its first and last kilobyte: it must start with the
+%PDF- header, end with the startxref / %%EOF trailer, and not have been
+served as HTML or text. Error pages and truncated files are moved to the
+.quarantine folder of the registry and listed in .quarantine/report.csv,
+and their links get no file, so they never reach the parsers.
+
+A caller which knows which pages of a report it needs can pass them to
+download_all(): when the server answers Range requests, only these pages
+are fetched (see partial.py), into a report of the same number of pages,
+the others left blank, stored under the key <link>#pages=<pages> of the
+manifest. A whole report at hand is always used instead.
+
+Every report of the run goes first through one registry, a report store
+shared by all the providers (REGISTRY, pdf/.registry by default), and is
+linked from there into the -p folder asking for it. A link checked with its
+server less than MAX_AGE seconds ago is served from the registry without a
+request, so processing all the input files downloads each distinct link
+once, however many rows and providers reference it. Lock files keep two
+processes from fetching the same link, or writing a manifest, at the same
+time.
+
+Module functions:
+    get_downloader(): --> Downloader
+    get_store(folder="."): --> ReportStore
+    download_all(links, folder=".", pages=None, browser=False): --> dict
+"""
+
+import csv
+import email.utils
+import hashlib
+import http.cookiejar
+import json
+import mimetypes
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from .cache import file_digest
+from .partial import fetch_pages
+
+# threads downloading at the same time
+WORKERS = 8
+# transfers to the same host at a time to start with, at most WORKERS
+HOST_LIMIT = 2
+# answers slower than this times the fastest one do not raise the limit
+LATENCY_FACTOR = 2
+# seconds to wait after a throttled answer without Retry-After, doubled
+# at every retry
+BACKOFF = 1
+# seconds to wait for the server to connect or to send data
+TIMEOUT = 60
+# bytes written at a time
+CHUNK_SIZE = 1 << 16
+# transfers broken off or throttled are retried this many times
+RETRIES = 3
+# pdf_url values of the input files which are not links
+MISSING = ("nan", "annual_report_does_not_exists")
+MANIFEST_NAME = ".manifest.json"
+# report store shared by all the providers of a run
+REGISTRY = os.environ.get(
+    "REPORT_REGISTRY",
+    os.path.join(
+        os.path.dirname(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ),
+        "pdf",
+        ".registry",
+    ),
+)
+# seconds a link checked with its server is served without a new request
+MAX_AGE = int(os.environ.get("REPORT_MAX_AGE", 6 * 3600))
+# a PDF has its header within its first PDF_SLACK bytes and its trailer
+# within its last ones
+PDF_HEADER = b"%PDF-"
+PDF_TRAILER = (b"startxref", b"%%EOF")
+PDF_SLACK = 1024
+QUARANTINE_NAME = ".quarantine"
+# seconds after which the lock file of a process which died is ignored
+LOCK_TIMEOUT = 600
+# sent to the hosts downloaded from as a browser, which answer the default
+# requests User-Agent with an error page, where a browser gets the report
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept": "application/pdf,*/*;q=0.8",
+}
+
+
+def url_key(url):
+    """Return a short hash of url, for the names of partial files."""
+    return hashlib.sha1(url.encode()).hexdigest()[:12]
+
+
+class FileLock:
+    """Lock shared by threads and processes through an exclusive file."""
+
+    def __init__(self, path):
+        """Create the lock held by the existence of the file path."""
+        self.path = path
+
+    def __enter__(self):
+        """Wait until the lock file can be created."""
+        while True:
+            try:
+                os.close(os.open(self.path, os.O_CREAT | os.O_EXCL))
+                return self
+            except FileExistsError:
+                try:
+                    if (
+                        time.time() - os.path.getmtime(self.path)
+                        > LOCK_TIMEOUT
+                    ):
+                        # left by a process which died
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    continue
+                time.sleep(0.1)
+
+    def __exit__(self, *args):
+        """Remove the lock file."""
+        os.remove(self.path)
+
+
+class InvalidReport(Exception):
+    """Downloaded file which is not a PDF."""
+
+
+class Throttled(requests.HTTPError):
+    """429 Too Many Requests or 5xx answer, to retry after retry_after s."""
+
+    def __init__(self, message, retry_after=None, **kwargs):
+        """Create the error, retry_after being the Retry-After seconds."""
+        super().__init__(message, **kwargs)
+        self.retry_after = retry_after
+
+
+class HostLimiter:
+    """Adaptive limit of the transfers to one host at a time.
+
+    Used as a context manager around each transfer, which waits until the
+    host has a free slot and is not backing off. answered() raises the
+    limit by 1 / limit for every answer within LATENCY_FACTOR times the
+    fastest one, so by one per round of healthy answers; backoff() halves
+    it, once per round of transfers however many of them were throttled.
+    """
+
+    def __init__(self, limit=HOST_LIMIT, max_limit=WORKERS):
+        """Create the limiter of a host.
+
+        Keyword Arguments:
+        limit -- transfers at a time to start with
+        max_limit -- transfers at a time at most
+        """
+        self.limit = float(limit)
+        self.max_limit = max_limit
+        self.condition = threading.Condition()
+        self.active = 0
+        # time.monotonic() before which no transfer starts
+        self.resume = 0.0
+        # time of the last decrease
+        self.cut = 0.0
+        self.fastest = None
+        self.peak = limit
+        self.answers = 0
+        self.throttled = 0
+        self.received = 0
+        self.start = None
+        self.end = None
+
+    def __enter__(self):
+        """Wait for a free slot; return the time the transfer starts."""
+        with self.condition:
+            while True:
+                delay = self.resume - time.monotonic()
+                if delay <= 0 and self.active < int(self.limit):
+                    break
+                self.condition.wait(delay if delay > 0 else None)
+            self.active += 1
+            now = time.monotonic()
+            if self.start is None:
+                self.start = now
+            return now
+
+    def __exit__(self, *args):
+        """Free the slot."""
+        with self.condition:
+            self.active -= 1
+            self.end = time.monotonic()
+            self.condition.notify_all()
+
+    def answered(self, latency):
+        """Record an answer received latency seconds after the request."""
+        with self.condition:
+            self.answers += 1
+            if self.fastest is None or latency < self.fastest:
+                self.fastest = latency
+            if latency <= LATENCY_FACTOR * self.fastest:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.peak = max(self.peak, int(self.limit))
+                self.condition.notify_all()
+
+    def backoff(self, started, delay):
+        """Halve the limit and pause the host for delay seconds.
+
+        Keyword Arguments:
+        started -- time the throttled transfer started
+        delay -- seconds before the next transfer to the host
+        """
+        with self.condition:
+            self.answers += 1
+            self.throttled += 1
+            if started >= self.cut:
+                # the transfers started before the last cut do not count
+                self.limit = max(1.0, self.limit / 2)
+                self.cut = time.monotonic()
+            self.resume = max(self.resume, time.monotonic() + delay)
+
+    def report(self):
+        """Return the statistics of the host as a line of text."""
+        seconds = max((self.end or 0) - (self.start or 0), 1e-9)
+        return (
+            "%d answers, %d throttled, %.1f MB at %.2f MB/s, limit %d "
+            "(peak %d)"
+            % (
+                self.answers,
+                self.throttled,
+                self.received / 1e6,
+                self.received / 1e6 / seconds,
+                int(self.limit),
+                self.peak,
+            )
+        )
+
+
+class Downloader:
+    """Fetch URLs into files with a pooled session and a thread pool."""
+
+    def __init__(self, workers=WORKERS, host_limit=HOST_LIMIT):
+        """Create a downloader.
+
+        Keyword Arguments:
+        workers -- number of threads downloading at the same time
+        host_limit -- number of transfers to the same host at a time to
+            start with
+        """
+        self.workers = workers
+        self.host_limit = host_limit
+        self.session = requests.Session()
+        # hosts sent BROWSER_HEADERS, the only ones whose cookies are kept
+        self.browser_hosts = set()
+        self.session.cookies.set_policy(
+            http.cookiejar.DefaultCookiePolicy(allowed_domains=[])
+        )
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.lock = threading.Lock()
+        self.hosts = {}
+        self.received = 0
+        self.retries = 0
+        self.not_modified = 0
+        self.shared = 0
+        self.quarantined = 0
+        self.partial = 0
+
+    def host(self, url):
+        """Return the HostLimiter of the host of url."""
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = HostLimiter(self.host_limit, self.workers)
+            return self.hosts[host]
+
+    def browse(self, urls):
+        """Download from the hosts of urls as a browser from now on.
+
+        They are sent BROWSER_HEADERS, and the cookies they set are kept
+        for the next requests.
+        """
+        with self.lock:
+            self.browser_hosts.update(urlsplit(x).hostname for x in urls)
+            self.session.cookies.set_policy(
+                http.cookiejar.DefaultCookiePolicy(
+                    allowed_domains=sorted(self.browser_hosts)
+                )
+            )
+
+    def headers(self, url, headers=None):
+        """Return headers, with BROWSER_HEADERS for a browser host of url."""
+        if urlsplit(url).hostname in self.browser_hosts:
+            return dict(BROWSER_HEADERS, **(headers or {}))
+        return headers
+
+    def fetch(self, url, filename, headers=None):
+        """Save the body of url to filename.
+
+        Return the response, or None when the server answered 304 Not
+        Modified to the conditional headers given. Raise
+        requests.RequestException when the server answers with an error
+        status, or when the transfer still fails, or is still throttled,
+        after RETRIES retries.
+
+        Keyword Arguments:
+        url -- link to download
+        filename -- name of the file to write
+        headers -- conditional request headers, sent unless resuming
+        """
+        part = "%s.%s.part" % (filename, url_key(url))
+        host = self.host(url)
+        for attempt in range(RETRIES + 1):
+            with host as started:
+                try:
+                    response = self.transfer(url, part, headers, host)
+                    break
+                except Throttled as e:
+                    delay = e.retry_after
+                    if delay is None:
+                        delay = BACKOFF * 2**attempt
+                    host.backoff(started, delay)
+                    if attempt == RETRIES:
+                        raise
+                except (
+                    requests.ConnectionError,
+                    requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError,
+                ):
+                    if attempt == RETRIES:
+                        raise
+            with self.lock:
+                self.retries += 1
+        if response is None:
+            with self.lock:
+                self.not_modified += 1
+            return None
+        os.replace(part, filename)
+        remove_validators(part)
+        return response
+
+    def transfer(self, url, part, headers=None, host=None):
+        """Append the rest of the body of url to the partial file part.
+
+        Return the response, or None for a 304 Not Modified answer. The
+        rest is asked with If-Range set to the validator saved with the
+        partial file, and the transfer restarts from zero when the server
+        sends the whole body instead, because the report changed or the
+        server ignores Range requests. A 416 answer is taken for a
+        complete partial file only if the size of the report, from its
+        Content-Range or a HEAD request, is the size of the file; the file
+        is downloaded again otherwise. Raise Throttled for a 429 or 5xx
+        answer.
+        """
+        conditional = headers
+        validators = read_validators(part)
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        validator = if_range(validators)
+        resumed = bool(offset and validator)
+        if resumed:
+            headers = {"Range": "bytes=%d-" % offset, "If-Range": validator}
+        restart = False
+        received = 0
+        start = time.monotonic()
+        try:
+            with self.session.get(
+                url,
+                headers=self.headers(url, headers),
+                stream=True,
+                timeout=TIMEOUT,
+            ) as response:
+                status = response.status_code
+                if status == 429 or status >= 500:
+                    raise Throttled(
+                        "%d %s for url: %s" % (status, response.reason, url),
+                        retry_after_seconds(response),
+                        response=response,
+                    )
+                if host is not None:
+                    host.answered(time.monotonic() - start)
+                if response.status_code == 304:
+                    return None
+                if response.status_code == 416 and resumed:
+                    # nothing left after offset, if the report is that long
+                    if self.remote_size(url, response) == offset:
+                        restore_validators(response, validators)
+                        return response
+                    restart = True
+                elif response.status_code == 206:
+                    # the rest of the same report, from offset
+                    restart = not (
+                        resumed
+                        and response.headers.get(
+                            "Content-Range", ""
+                        ).startswith("bytes %d-" % offset)
+                    )
+                if not restart:
+                    response.raise_for_status()
+                    mode = "ab" if response.status_code == 206 else "wb"
+                    if mode == "wb":
+                        write_validators(part, response)
+                    with open(part, mode) as f:
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            f.write(chunk)
+                            received += len(chunk)
+                    expected = response.headers.get("Content-Length")
+                    if expected is not None and received < int(expected):
+                        raise requests.exceptions.ChunkedEncodingError(
+                            "%s: %d of %s bytes received"
+                            % (url, received, expected)
+                        )
+        finally:
+            with self.lock:
+                self.received += received
+            if host is not None:
+                with host.condition:
+                    host.received += received
+        if restart:
+            remove_validators(part)
+            os.remove(part)
+            return self.transfer(url, part, conditional, host)
+        return response
+
+    def remote_size(self, url, response):
+        """Return the size of the report of url, None if not known.
+
+        It is read from the Content-Range of the 416 answer response, or
+        else from the Content-Length of a HEAD request.
+        """
+        match = re.fullmatch(
+            r"bytes \*/(\d+)", response.headers.get("Content-Range", "")
+        )
+        if match:
+            return int(match.group(1))
+        try:
+            head = self.session.head(
+                url,
+                headers=self.headers(url),
+                allow_redirects=True,
+                timeout=TIMEOUT,
+            )
+        except requests.RequestException:
+            return None
+        length = head.headers.get("Content-Length")
+        if not head.ok or length is None or "Content-Encoding" in head.headers:
+            return None
+        return int(length)
+
+    def map(self, function, urls):
+        """Call function(url) for urls in parallel and print the throughput.
+
+        Return {url: result} of the calls which succeeded; the others are
+        printed with the reason of the failure.
+        """
+        done = {}
+        received, retries = self.received, self.retries
+        not_modified, shared = self.not_modified, self.shared
+        quarantined, partial = self.quarantined, self.partial
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {url: pool.submit(function, url) for url in urls}
+            for url, future in futures.items():
+                try:
+                    done[url] = future.result()
+                except (
+                    requests.RequestException,
+                    OSError,
+                    InvalidReport,
+                ) as e:
+                    print("Error downloading", url, ":", e)
+        seconds = max(time.perf_counter() - start, 1e-9)
+        print(
+            "%d files (%d not modified, %d shared, %d partial, %d quarantined)"
+            " in %.1f s: %.2f files/s, %.1f MB, %d retries"
+            % (
+                len(done),
+                self.not_modified - not_modified,
+                self.shared - shared,
+                self.partial - partial,
+                self.quarantined - quarantined,
+                seconds,
+                len(done) / seconds,
+                (self.received - received) / 1e6,
+                self.retries - retries,
+            )
+        )
+        for host in sorted(set(urlsplit(x).netloc for x in urls)):
+            if host in self.hosts:
+                print("  %s: %s" % (host, self.hosts[host].report()))
+        return done
+
+
+def read_validators(part):
+    """Return the headers saved with the partial file part, {} if none."""
+    try:
+        with open(part + ".json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_validators(part, response):
+    """Save the ETag, Last-Modified and Content-Type of response with part.
+
+    They identify the version of the report the partial file holds the
+    start of.
+    """
+    validators = {
+        name: response.headers[name]
+        for name in ("ETag", "Last-Modified", "Content-Type")
+        if name in response.headers
+    }
+    with open(part + ".json", "w", encoding="utf-8") as f:
+        json.dump(validators, f)
+
+
+def remove_validators(part):
+    """Delete the headers saved with the partial file part."""
+    if os.path.exists(part + ".json"):
+        os.remove(part + ".json")
+
+
+def if_range(validators):
+    """Return the If-Range value for validators, None if there is none.
+
+    A weak ETag cannot be used in If-Range: Last-Modified is then sent.
+    """
+    etag = validators.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return validators.get("Last-Modified")
+
+
+def restore_validators(response, validators):
+    """Give the 416 answer response the headers of the partial file.
+
+    The partial file is then stored as if it had just been downloaded
+    whole, with the ETag and Last-Modified of the report it holds.
+    """
+    for name in ("ETag", "Last-Modified", "Content-Type"):
+        if name in validators:
+            response.headers[name] = validators[name]
+        else:
+            response.headers.pop(name, None)
+
+
+def page_key(url, pages=None):
+    """Return the manifest key of pages of the report of url."""
+    if not pages:
+        return url
+    return "%s#pages=%s" % (url, ",".join(str(x) for x in sorted(set(pages))))
+
+
+def pdf_problem(filename, content_type=None):
+    """Return why filename is not a whole PDF, None if it looks like one.
+
+    Keyword Arguments:
+    filename -- file to check
+    content_type -- Content-Type header the file was served with
+    """
+    problems = []
+    if content_type and (
+        "html" in content_type or content_type.startswith("text/")
+    ):
+        problems.append("served as " + content_type)
+    with open(filename, "rb") as f:
+        head = f.read(PDF_SLACK)
+        f.seek(max(0, os.fstat(f.fileno()).st_size - PDF_SLACK))
+        tail = f.read()
+    if PDF_HEADER not in head:
+        problems.append("no %PDF- header")
+    for marker in PDF_TRAILER:
+        if marker not in tail:
+            problems.append("no %s trailer" % marker.decode())
+    return ", ".join(problems) or None
+
+
+def retry_after_seconds(response):
+    """Return the seconds of the Retry-After header of response, or None."""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+class ReportStore:
+    """Folder of reports named after the SHA-256 of their content.
+
+    The manifest maps every link downloaded to {"digest", "etag",
+    "last_modified", "checked"} of its last download, checked being the
+    time of the last answer of the server. A store with a registry gets
+    its reports from the registry and links them into its folder.
+    """
+
+    def __init__(self, folder, downloader, registry=None):
+        """Open the store in folder, reading its manifest.
+
+        Keyword Arguments:
+        folder -- folder of the reports
+        downloader -- Downloader fetching the links
+        registry -- ReportStore to get the reports from, None to fetch them
+        """
+        self.folder = folder
+        self.downloader = downloader
+        self.registry = registry
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self.lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        self.manifest = self.read_manifest()
+
+    def read_manifest(self):
+        """Return the manifest saved in the folder, {} if there is none."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """Write the manifest, keeping the newer links of other processes."""
+        with self.lock, FileLock(self.path + ".lock"):
+            manifest = self.read_manifest()
+            for url, entry in self.manifest.items():
+                if entry.get("checked", 0) >= manifest.get(url, {}).get(
+                    "checked", 0
+                ):
+                    manifest[url] = entry
+            self.manifest = manifest
+            tmp = "%s.%d.tmp" % (self.path, os.getpid())
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+
+    def digests(self, urls):
+        """Return {url: digest} of the report each of urls served last time.
+
+        The links never downloaded, in the folder or in the registry, are
+        left out.
+        """
+        manifests = [self.read_manifest()]
+        if self.registry is not None:
+            manifests.append(self.registry.read_manifest())
+        digests = {}
+        for url in urls:
+            for manifest in manifests:
+                if url in manifest:
+                    digests[url] = manifest[url]["digest"]
+                    break
+        return digests
+
+    def fetch(self, url, pages=None):
+        """Return the name of the report of url, downloading it if changed.
+
+        Keyword Arguments:
+        url -- link of the report
+        pages -- page numbers (from 1) needed, to fetch only these pages
+            with Range requests if the server allows; all if not given
+        """
+        if self.registry is None:
+            entry = self.get(url, pages)
+        else:
+            entry = self.registry.get(url, pages)
+            self.link(os.path.basename(self.name(entry["digest"])))
+            with self.lock:
+                self.manifest[page_key(url, pages)] = entry
+        return os.path.basename(self.name(entry["digest"]))
+
+    def get(self, url, pages=None):
+        """Return the manifest entry of url, fetching the report if needed.
+
+        No other thread or process fetches url meanwhile.
+        """
+        with FileLock(os.path.join(self.folder, ".lock." + url_key(url))):
+            entry = self.entry(url)
+            if self.fresh(entry):
+                return entry
+            if pages and not (
+                entry and os.path.isfile(self.name(entry["digest"]))
+            ):
+                # without the whole report at hand, fetch only the pages
+                partial = self.partial(url, pages)
+                if partial:
+                    return partial
+            return self.check(url, entry)
+
+    def entry(self, key):
+        """Return the latest manifest entry of key, on disk or in memory."""
+        entry = self.read_manifest().get(key)
+        with self.lock:
+            if entry is None or self.manifest.get(key, {}).get(
+                "checked", 0
+            ) > entry.get("checked", 0):
+                entry = self.manifest.get(key)
+            else:
+                self.manifest[key] = entry
+        return entry
+
+    def fresh(self, entry):
+        """Return True if the report of entry was checked lately."""
+        if entry and os.path.isfile(self.name(entry["digest"])):
+            if time.time() - entry.get("checked", 0) < MAX_AGE:
+                with self.downloader.lock:
+                    self.downloader.shared += 1
+                return True
+        return False
+
+    def partial(self, url, pages):
+        """Fetch only pages of the report of url; return its entry.
+
+        Return None when the server does not answer Range requests, or
+        when the pages received do not make a whole PDF: the report is
+        then downloaded whole, and checked as such.
+        """
+        key = page_key(url, pages)
+        entry = self.entry(key)
+        if self.fresh(entry):
+            return entry
+        tmp = os.path.join(self.folder, ".download." + url_key(key))
+        host = self.downloader.host(url)
+        try:
+            with host:
+                received = fetch_pages(
+                    url, pages, tmp, self.downloader.session
+                )
+        except Exception:
+            # anything PyPDF2 cannot read remotely is downloaded whole
+            received = None
+        if received is not None and pdf_problem(tmp):
+            os.remove(tmp)
+            received = None
+        if received is None:
+            return None
+        with host.condition:
+            host.received += received
+        entry = {
+            "digest": file_digest(tmp),
+            "pages": sorted(set(pages)),
+            "checked": time.time(),
+        }
+        os.replace(tmp, self.name(entry["digest"]))
+        with self.lock:
+            self.manifest[key] = entry
+        with self.downloader.lock:
+            self.downloader.received += received
+            self.downloader.partial += 1
+        self.save()
+        return entry
+
+    def check(self, url, entry):
+        """Download the report of url, revalidating entry if it has one.
+
+        Return the entry of the report.
+        """
+        found = entry and os.path.isfile(self.name(entry["digest"]))
+        headers = {}
+        if found:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        tmp = os.path.join(self.folder, ".download." + url_key(url))
+        response = self.downloader.fetch(url, tmp, headers)
+        if response is None:
+            entry = dict(entry, checked=time.time())
+        else:
+            content_type = response.headers.get("Content-Type")
+            problem = pdf_problem(tmp, content_type)
+            if problem:
+                self.quarantine(url, tmp, content_type, problem)
+                raise InvalidReport(problem)
+            entry = {
+                "digest": file_digest(tmp),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "checked": time.time(),
+            }
+            os.replace(tmp, self.name(entry["digest"]))
+        with self.lock:
+            self.manifest[url] = entry
+        # other processes find it in the manifest on disk
+        self.save()
+        return entry
+
+    def quarantine(self, url, filename, content_type, problem):
+        """Move the invalid download of url to the quarantine folder.
+
+        The file is listed with the problem in the report.csv of the
+        folder.
+        """
+        folder = os.path.join(self.folder, QUARANTINE_NAME)
+        os.makedirs(folder, exist_ok=True)
+        extension = None
+        if content_type:
+            extension = mimetypes.guess_extension(
+                content_type.split(";")[0].strip()
+            )
+        name = url_key(url) + (extension or ".bin")
+        os.replace(filename, os.path.join(folder, name))
+        report = os.path.join(folder, "report.csv")
+        with FileLock(report + ".lock"):
+            new = not os.path.isfile(report)
+            with open(report, "a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                if new:
+                    writer.writerow(["time", "pdf_url", "file", "problem"])
+                writer.writerow(
+                    [time.strftime("%Y-%m-%d %H:%M:%S"), url, name, problem]
+                )
+        with self.downloader.lock:
+            self.downloader.quarantined += 1
+
+    def link(self, name):
+        """Link the report name of the registry into the folder."""
+        path = os.path.join(self.folder, name)
+        if os.path.isfile(path):
+            return
+        tmp = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+        try:
+            os.link(os.path.join(self.registry.folder, name), tmp)
+        except OSError:
+            # no hard links across file systems
+            shutil.copyfile(os.path.join(self.registry.folder, name), tmp)
+        os.replace(tmp, path)
+
+    def name(self, digest):
+        """Return the path of the report of the given digest."""
+        return os.path.join(self.folder, digest + ".pdf")
+
+    def fetch_all(self, urls, pages=None):
+        """Fetch urls in parallel; return {url: file name} of those found.
+
+        pages maps links to the page numbers needed from their reports.
+        """
+        pages = pages or {}
+        try:
+            return self.downloader.map(
+                lambda url: self.fetch(url, pages.get(url)), urls
+            )
+        finally:
+            self.save()
+
+
+downloaders = []
+
+
+def get_downloader():
+    """Return the downloader shared by the whole run."""
+    if not downloaders:
+        downloaders.append(Downloader())
+    return downloaders[0]
+
+
+stores = {}
+
+
+def get_store(folder="."):
+    """Return the report store of folder, fed by the registry."""
+    key = os.path.abspath(folder)
+    if key not in stores:
+        registry = None
+        if key != os.path.abspath(REGISTRY):
+            registry = get_store(REGISTRY)
+        stores[key] = ReportStore(folder, get_downloader(), registry)
+    return stores[key]
+
+
+def download_all(links, folder=".", pages=None, browser=False):
+    """Download links into the report store of folder.
+
+    Return {link: file name} for every link given as a string, with NaN for
+    the links which are missing ("nan", "annual_report_does_not_exists") or
+    could not be downloaded. File names are relative to folder.
+
+    Keyword Arguments:
+    links -- iterable of the pdf_url values of the input file
+    folder -- folder of the reports, the current one by default
+    pages -- {link: page numbers (from 1)} of the links of which only some
+        pages are needed, e.g. known from a previous run: the other pages
+        are left blank and not downloaded if the server answers Range
+        requests
+    browser -- download from the hosts of links as a browser, see
+        Downloader.browse()
+    """
+    links = set(x for x in links if isinstance(x, str))
+    urls = sorted(links.difference(MISSING))
+    if browser:
+        get_downloader().browse(urls)
+    print("Downloading " + str(len(urls)) + " files...")
+    files = get_store(folder).fetch_all(urls, pages)
+    return {x: files.get(x, float("nan")) for x in links}
@@ -0,0 +1,63 @@
+"""Inverted index from the text of the pages of a report to the page ids.
+
+A locator asks which pages contain a section header and a fund name; the
+index answers by intersecting the posting lists of the character trigrams
+of the phrases, then checks the few remaining pages with a plain substring
+test. The answer is therefore exactly the pages on which `phrase in text`
+holds, found without scanning every page for every fund.
+
+Module functions:
+    trigrams(text): --> set
+"""
+
+
+def trigrams(text):
+    """Return the set of 3-character substrings of text."""
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class PhraseIndex:
+    """Trigram postings of a sequence of page texts."""
+
+    def __init__(self, texts):
+        """Build the index.
+
+        Keyword Arguments:
+        texts -- list of page texts, page ids are the positions in the list
+        """
+        self.texts = texts
+        self.postings = {}
+        for page, text in enumerate(texts):
+            for gram in trigrams(text):
+                self.postings.setdefault(gram, set()).add(page)
+
+    def candidates(self, phrase):
+        """Return the page ids which may contain phrase."""
+        grams = trigrams(phrase)
+        if not grams:
+            return set(range(len(self.texts)))
+        postings = sorted(
+            (self.postings.get(x, set()) for x in grams), key=len
+        )
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result &= posting
+            if not result:
+                break
+        return result
+
+    def pages(self, *phrases, within=None):
+        """Return the sorted page ids whose text contains all phrases.
+
+        Keyword Arguments:
+        phrases -- strings which must all be in the page text
+        within -- page ids to restrict the answer to, all pages if not given
+        """
+        result = set(range(len(self.texts))) if within is None else set(within)
+        for phrase in sorted(phrases, key=len, reverse=True):
+            result &= self.candidates(phrase)
+            if not result:
+                return []
+        return sorted(
+            i for i in result if all(x in self.texts[i] for x in phrases)
+        )
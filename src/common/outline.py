@@ -0,0 +1,78 @@
+"""Fund sections of a report read from its outline (bookmarks).
+
+Most reports list their sub-funds in a table of contents which the parsers
+read with tabula, starting the JVM only to get page numbers. When the top
+level of the PDF outline lists the fund looked for, the same fund -> page
+table is read from it directly in milliseconds. Nested bookmarks (the
+headings inside a fund's section) are left out, so that the next entry is
+the next fund, and the parsers read their printed table of contents when
+the outline does not list the fund, e.g. when its bookmarks are generic
+headings or file names.
+
+The outline points to physical pages, where the printed table of contents
+gives page labels; every parser has its own arithmetic from the printed
+numbers to the pages it reads, and passes the matching offset.
+
+Module functions:
+    outline_contents(read_file, *matches, offset=0, pdf=None):
+        --> pd.DataFrame or None
+"""
+import os
+import pandas as pd
+from .pages import get_store
+
+outlines = {}
+
+
+def top_level(pdf, items):
+    """Yield (title, page number from 1) of the top-level outline items."""
+    for item in items:
+        if isinstance(item, list):
+            # the children of the previous item
+            continue
+        try:
+            page = pdf.getDestinationPageNumber(item)
+        except Exception:
+            continue
+        if page is not None and page >= 0:
+            yield str(item.title).strip(), page + 1
+
+
+def outline_contents(read_file, *matches, offset=0, pdf=None):
+    """Return the top-level outline of read_file as a table of contents.
+
+    Return a pd.DataFrame with columns "fund" (the bookmark title) and "pg"
+    (the page the bookmark points to, from 1, minus offset, as int) in
+    document order, like the contents tables read with tabula; None when
+    the document has no outline, or when one of matches is true of none of
+    its top-level titles.
+
+    Keyword Arguments:
+    read_file -- file name
+    matches -- functions of a bookmark title, e.g. testing for the fund
+    offset -- pages before printed page 1 in the arithmetic of the caller
+    pdf -- PdfFileReader() object of read_file, if already opened
+    """
+    key = os.path.abspath(read_file)
+    if key not in outlines:
+        outlines[key] = read_outline(get_store(read_file, pdf).pdf)
+    contents = outlines[key]
+    if contents is None:
+        return None
+    for match in matches:
+        if not any(match(x) for x in contents["fund"]):
+            return None
+    contents = contents.copy()
+    contents["pg"] = contents["pg"] - offset
+    return contents
+
+
+def read_outline(pdf):
+    """Return the top-level contents table of PdfFileReader() pdf, or None."""
+    try:
+        rows = list(top_level(pdf, pdf.getOutlines()))
+    except Exception:
+        rows = []
+    if not rows:
+        return None
+    return pd.DataFrame(rows, columns=["fund", "pg"])
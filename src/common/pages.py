@@ -0,0 +1,456 @@
+"""Page text of the reports, extracted once per run and shared by all funds.
+
+Every page locator asks the same question of the same report for each fund
+it contains, so the text of a page is extracted the first time it is asked
+for and served from memory afterwards. Extracted text is also written to
+the page text cache of the -p folder (see cache.py), so a rerun over the
+same reports does not extract anything again.
+
+Two extractors are served: PyPDF2 (PageTextStore, get_store) and pdfminer
+(MinerTextStore, get_miner_store). pdfminer keeps the file open and parsed
+(MinerDocument) and lays out only the pages asked for, where calling
+extract_text(read_file, page_numbers=[i]) page by page reopens the file
+and re-parses the xref and resources for every page.
+
+pdfminer's extract_text() orders the text boxes of a page by grouping the
+closest ones first, breaking ties by id(), i.e. by memory address, so the
+text of a page it returns can change with the pages laid out before it
+and from one run to the next. The pages are laid out as OrderedLTPage
+instead, which breaks the ties by the order the boxes were found in: the
+text of a page is the same whatever was read before, in one process or
+split across several.
+
+Extraction is CPU bound and single threaded. With workers set above 1
+(e.g. from the -w argument of a parser) a store which needs every page,
+to build its index, splits the missing ones across a ProcessPoolExecutor,
+each worker opening the file itself, and merges the texts back in page
+order; pages asked for one by one are still the only ones extracted.
+
+Module functions:
+    close_documents(keep=0): --> None
+    layout_pages(read_file, page_numbers=None): --> generator
+    extract_pages(cls, read_file, page_numbers): --> list of (int, str)
+    get_store(read_file, pdf=None): --> PageTextStore
+    get_miner_store(read_file): --> MinerTextStore
+"""
+
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+import pdfminer
+import PyPDF2
+from pdfminer.converter import TextConverter
+from pdfminer.layout import (
+    LAParams,
+    LTPage,
+    LTTextBoxVertical,
+    LTTextGroupLRTB,
+    LTTextGroupTBRL,
+)
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.utils import Plane
+from PyPDF2 import PdfFileReader
+from .cache import file_digest, text_cache
+from .index import PhraseIndex
+
+# number of processes extracting the pages of one document
+workers = 1
+
+# number of pdfminer documents kept open at a time
+OPEN_DOCUMENTS = 4
+
+
+class OrderedLTPage(LTPage):
+    """LTPage grouping its text boxes in the same order every time."""
+
+    def group_textboxes(self, laparams, boxes):
+        """Group textboxes hierarchically, closest pair first.
+
+        pdfminer's own method, with the ties between pairs as close as
+        each other broken by the order the boxes and groups were made in
+        rather than by id().
+        """
+        order = {}
+
+        def number(obj):
+            return order.setdefault(obj, len(order))
+
+        def dist(obj1, obj2):
+            x0, y0 = min(obj1.x0, obj2.x0), min(obj1.y0, obj2.y0)
+            x1, y1 = max(obj1.x1, obj2.x1), max(obj1.y1, obj2.y1)
+            return (
+                (x1 - x0) * (y1 - y0)
+                - obj1.width * obj1.height
+                - obj2.width * obj2.height
+            )
+
+        def isany(obj1, obj2):
+            x0, y0 = min(obj1.x0, obj2.x0), min(obj1.y0, obj2.y0)
+            x1, y1 = max(obj1.x1, obj2.x1), max(obj1.y1, obj2.y1)
+            objs = set(plane.find((x0, y0, x1, y1)))
+            return objs.difference((obj1, obj2))
+
+        plane = Plane(self.bbox)
+        for box in boxes:
+            number(box)
+        dists = [
+            (False, dist(box1, box2), number(box1), number(box2), box1, box2)
+            for i, box1 in enumerate(boxes)
+            for box2 in boxes[i + 1 :]
+        ]
+        heapq.heapify(dists)
+        plane.extend(boxes)
+        done = set()
+        while dists:
+            skip_isany, d, id1, id2, obj1, obj2 = heapq.heappop(dists)
+            if id1 in done or id2 in done:
+                continue
+            if not skip_isany and isany(obj1, obj2):
+                heapq.heappush(dists, (True, d, id1, id2, obj1, obj2))
+                continue
+            vertical = (LTTextBoxVertical, LTTextGroupTBRL)
+            if isinstance(obj1, vertical) or isinstance(obj2, vertical):
+                group = LTTextGroupTBRL([obj1, obj2])
+            else:
+                group = LTTextGroupLRTB([obj1, obj2])
+            plane.remove(obj1)
+            plane.remove(obj2)
+            done.update([id1, id2])
+            for other in plane:
+                heapq.heappush(
+                    dists,
+                    (
+                        False,
+                        dist(group, other),
+                        number(group),
+                        number(other),
+                        group,
+                        other,
+                    ),
+                )
+            plane.add(group)
+        return list(plane)
+
+
+class LayoutTextConverter(TextConverter):
+    """TextConverter laying pages out as OrderedLTPage, keeping the last."""
+
+    def begin_page(self, page, ctm):
+        super().begin_page(page, ctm)
+        self.cur_item = OrderedLTPage(self.pageno, self.cur_item.bbox)
+
+    def receive_layout(self, ltpage):
+        self.layout = ltpage
+        super().receive_layout(ltpage)
+
+
+class MinerDocument:
+    """A PDF opened and parsed once by pdfminer, laid out page by page.
+
+    Opening reads the xref and the page tree only; the content of a page
+    is interpreted when it is asked for, so that reading page i does not
+    lay out the pages before it.
+    """
+
+    def __init__(self, read_file):
+        """Open read_file."""
+        self.fp = open(read_file, "rb")
+        document = PDFDocument(PDFParser(self.fp), caching=True)
+        self.pages = list(PDFPage.create_pages(document))
+        rsrcmgr = PDFResourceManager(caching=True)
+        self.output = StringIO()
+        self.device = LayoutTextConverter(
+            rsrcmgr, self.output, laparams=LAParams()
+        )
+        self.interpreter = PDFPageInterpreter(rsrcmgr, self.device)
+
+    def __len__(self):
+        """Return the number of pages."""
+        return len(self.pages)
+
+    def layout(self, i):
+        """Return (text, OrderedLTPage) of page i (from 0).
+
+        The text is laid out like extract_text(read_file, page_numbers=[i])
+        does, the ties in the order of the text boxes aside, and does not
+        depend on the pages laid out before.
+        """
+        self.output.seek(0)
+        self.output.truncate()
+        self.interpreter.process_page(self.pages[i])
+        return self.output.getvalue(), self.device.layout
+
+    def close(self):
+        """Close the file."""
+        self.fp.close()
+
+
+def layout_pages(read_file, page_numbers=None):
+    """Yield (page index from 0, text, LTPage) for the pages of read_file.
+
+    The file is opened and parsed once, and only page_numbers laid out.
+
+    Keyword Arguments:
+    read_file -- file name
+    page_numbers -- page indexes (from 0) to extract, all pages if not given
+    """
+    document = MinerDocument(read_file)
+    try:
+        for i in range(len(document)):
+            if page_numbers is None or i in page_numbers:
+                yield (i,) + document.layout(i)
+    finally:
+        document.close()
+
+
+def extract_pages(cls, read_file, page_numbers):
+    """Return [(page index, text)] of page_numbers, extracted by cls.
+
+    Run in the worker processes of PageTextStore.prefetch().
+    """
+    return list(cls.read(read_file, set(page_numbers)))
+
+
+def chunks(pages, n):
+    """Split the sorted list pages into at most n runs of adjacent pages."""
+    size = -(-len(pages) // n)
+    return [pages[i : i + size] for i in range(0, len(pages), size)]
+
+
+class PageTextStore:
+    """Text of the pages of one PDF, extracted lazily and at most once.
+
+    Pages are indexed from 0 like PdfFileReader.getPage(), and the text is
+    what PdfFileReader.getPage(i).extractText() returns.
+    """
+
+    extractor = "PyPDF2.extractText " + PyPDF2.__version__
+
+    def __init__(self, read_file, pdf=None):
+        """Create an empty store.
+
+        Keyword Arguments:
+        read_file -- file name
+        pdf -- PdfFileReader() object of read_file, opened if not given
+        """
+        self.read_file = read_file
+        self._pdf = pdf
+        self._texts = None
+        self._indexes = {}
+
+    @property
+    def pdf(self):
+        """PdfFileReader() object of the file."""
+        if self._pdf is None:
+            self._pdf = PdfFileReader(self.read_file)
+            self._pdf._override_encryption = True
+            self._pdf._flatten()
+        return self._pdf
+
+    @property
+    def texts(self):
+        """{page: text} extracted so far, starting from the cached ones."""
+        if self._texts is None:
+            self._digest = file_digest(self.read_file)
+            self._cache = text_cache(self.read_file)
+            self._texts = self._cache.load(self._digest, self.extractor)
+        return self._texts
+
+    def _keep(self, i, text):
+        """Remember the text of page i, in memory and on disk."""
+        self.texts[i] = text
+        self._cache.put(self._digest, self.extractor, i, text)
+
+    @staticmethod
+    def read(read_file, page_numbers):
+        """Yield (page index, text) of page_numbers, opening read_file."""
+        pdf = PdfFileReader(read_file)
+        pdf._override_encryption = True
+        pdf._flatten()
+        for i in sorted(page_numbers):
+            yield i, pdf.getPage(i).extractText()
+
+    def _count(self):
+        try:
+            return self.pdf.getNumPages()
+        except PyPDF2.utils.PdfReadError:
+            # encrypted reports opened with _override_encryption
+            if self.pdf.flattenedPages is None:
+                self.pdf._flatten()
+            return len(self.pdf.flattenedPages)
+
+    def prefetch(self, n=None):
+        """Extract all pages not known yet with n (default workers) processes.
+
+        Does nothing for a single worker; the pages are then extracted one
+        by one as they are asked for.
+        """
+        n = workers if n is None else n
+        if n <= 1:
+            return
+        missing = [i for i in range(len(self)) if i not in self.texts]
+        if len(missing) < 2:
+            return
+        with ProcessPoolExecutor(max_workers=n) as pool:
+            jobs = [
+                pool.submit(extract_pages, type(self), self.read_file, pages)
+                for pages in chunks(missing, n)
+            ]
+            for job in jobs:
+                for i, text in job.result():
+                    self._keep(i, text)
+
+    def _extract(self, i):
+        self._keep(i, self.pdf.getPage(i).extractText())
+        return self.texts[i]
+
+    def __len__(self):
+        """Return the number of pages."""
+        if -1 not in self.texts:
+            self._keep(-1, str(self._count()))
+        return int(self.texts[-1])
+
+    def __getitem__(self, i):
+        """Return the raw text of page i."""
+        if i < 0:
+            i += len(self)
+        if i not in self.texts:
+            return self._extract(i)
+        return self.texts[i]
+
+    def flat(self, i):
+        """Return the text of page i without line breaks."""
+        return self[i].replace("\n", "")
+
+    def squashed(self, i):
+        """Return the text of page i without line breaks and spaces, lower."""
+        return self[i].replace("\n", "").replace(" ", "").lower()
+
+    def find(self, *phrases, pages=None, squash=False):
+        """Return page numbers (from 1) of the pages containing all phrases.
+
+        An explicit range of pages is scanned directly, extracting these
+        pages only, unless the index is already built; the index is built
+        for a search of the whole document.
+
+        Keyword Arguments:
+        phrases -- strings which must all be in the page text
+        pages -- page indexes (from 0) to look at, all pages if not given
+        squash -- match against squashed() text instead of flat() text
+        """
+        if pages is not None and squash not in self._indexes:
+            text = self.squashed if squash else self.flat
+            count = len(self)
+            return [
+                i + 1
+                for i in sorted(set(pages))
+                if 0 <= i < count and all(x in text(i) for x in phrases)
+            ]
+        return [
+            i + 1 for i in self.index(squash).pages(*phrases, within=pages)
+        ]
+
+    def index(self, squash=False):
+        """Return the PhraseIndex of the flat() (or squashed()) page texts.
+
+        The index is built on first use, which extracts every page.
+        """
+        if squash not in self._indexes:
+            self.prefetch()
+            text = self.squashed if squash else self.flat
+            self._indexes[squash] = PhraseIndex(
+                [text(i) for i in range(len(self))]
+            )
+        return self._indexes[squash]
+
+
+class MinerTextStore(PageTextStore):
+    """Text of the pages of one PDF as extracted by pdfminer.
+
+    The text of page i is laid out by MinerDocument.layout(), "" for a
+    negative index or a page past the end of the document (where
+    PageTextStore wraps and raises like a list). The file is kept
+    open as a MinerDocument (the last OPEN_DOCUMENTS of them, see
+    close_documents()) and only the pages asked for are laid out.
+    """
+
+    extractor = "pdfminer.six ordered layout " + pdfminer.__version__
+
+    def __init__(self, read_file):
+        """Create an empty store."""
+        super().__init__(read_file)
+        self._document = None
+
+    @property
+    def document(self):
+        """MinerDocument of the file, opened if needed."""
+        if self._document is None:
+            close_documents(OPEN_DOCUMENTS - 1)
+            self._document = MinerDocument(self.read_file)
+            open_stores.append(self)
+        return self._document
+
+    def close(self):
+        """Close the file; it is opened again when a page is asked for."""
+        if self._document is not None:
+            self._document.close()
+            self._document = None
+            open_stores.remove(self)
+
+    def __getitem__(self, i):
+        """Return the raw text of page i."""
+        if i < 0:
+            return ""
+        return super().__getitem__(i)
+
+    def _extract(self, i):
+        if i >= len(self):
+            return ""
+        self._keep(i, self.document.layout(i)[0])
+        return self.texts[i]
+
+    @staticmethod
+    def read(read_file, page_numbers):
+        """Yield (page index, text) of page_numbers, opening read_file."""
+        for i, text, _ in layout_pages(read_file, page_numbers):
+            yield i, text
+
+    def _count(self):
+        return len(self.document)
+
+
+stores = {}
+open_stores = []
+
+
+def close_documents(keep=0):
+    """Close the files of the miner stores but the keep last opened."""
+    while len(open_stores) > keep:
+        open_stores[0].close()
+
+
+def get_store(read_file, pdf=None):
+    """Return the page text store of read_file, shared for the whole run.
+
+    Keyword Arguments:
+    read_file -- file name
+    pdf -- PdfFileReader() object of read_file, if already opened
+    """
+    key = os.path.abspath(read_file)
+    if key not in stores:
+        stores[key] = PageTextStore(read_file, pdf)
+    elif pdf is not None and stores[key]._pdf is None:
+        stores[key]._pdf = pdf
+    return stores[key]
+
+
+def get_miner_store(read_file):
+    """Return the pdfminer page text store of read_file, shared for the run."""
+    key = (os.path.abspath(read_file), "pdfminer")
+    if key not in stores:
+        stores[key] = MinerTextStore(read_file)
+    return stores[key]
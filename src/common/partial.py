@@ -0,0 +1,181 @@
+"""Download only some pages of a report, with HTTP Range requests.
+
+A parser which knows from previous runs where the sections it reads are in
+a long report does not need the rest of it. When the server answers Range
+requests, fetch_pages() opens the report remotely with PyPDF2 through
+RangeFile, a read-only file whose blocks are fetched on demand: PyPDF2
+reads the trailer and the cross-reference table at the end of the file,
+then only the objects of the pages copied. The pages wanted are written to
+a local PDF with their content; every other page is replaced by a blank
+page of the same size, so that pages keep their numbers.
+
+Module functions:
+    range_size(session, url): --> int or None
+    fetch_pages(url, pages, filename, session): --> int or None
+"""
+
+import io
+import os
+import re
+from PyPDF2 import PdfFileReader, PdfFileWriter
+from PyPDF2.generic import DecodedStreamObject, NameObject
+
+# bytes fetched at a time: smaller blocks fetch fewer bytes around the
+# objects read, in more requests
+BLOCK_SIZE = 1 << 14
+# seconds to wait for the server to connect or to send data
+TIMEOUT = 60
+
+
+class RangeFile(io.RawIOBase):
+    """Read-only file over the body of a URL, fetched with Range requests.
+
+    Blocks of BLOCK_SIZE bytes are fetched when first read and kept, the
+    missing blocks of one read being fetched in one request. fetched is
+    the number of bytes received.
+    """
+
+    def __init__(self, url, session, size):
+        """Open url, whose body is size bytes long, through session."""
+        super().__init__()
+        self.url = url
+        self.session = session
+        self.size = size
+        self.position = 0
+        self.blocks = {}
+        self.fetched = 0
+        self.requests = 0
+
+    def readable(self):
+        """Return True."""
+        return True
+
+    def seekable(self):
+        """Return True."""
+        return True
+
+    def tell(self):
+        """Return the current position."""
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        """Move to offset from the start, the position or the end."""
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+
+    def read(self, n=-1):
+        """Return up to n bytes from the position, all the rest if n < 0."""
+        end = self.size if n is None or n < 0 else self.position + n
+        end = min(end, self.size)
+        if end <= self.position:
+            return b""
+        first, last = self.position // BLOCK_SIZE, (end - 1) // BLOCK_SIZE
+        missing = [i for i in range(first, last + 1) if i not in self.blocks]
+        while missing:
+            run = 1
+            while run < len(missing) and missing[run] == missing[0] + run:
+                run += 1
+            self.fetch(missing[0], run)
+            missing = missing[run:]
+        data = b"".join(self.blocks[i] for i in range(first, last + 1))
+        start = self.position - first * BLOCK_SIZE
+        data = data[start : start + end - self.position]
+        self.position = end
+        return data
+
+    def readinto(self, buffer):
+        """Read into buffer; return the number of bytes read."""
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def fetch(self, block, count):
+        """Fetch count blocks from block in one request."""
+        start = block * BLOCK_SIZE
+        end = min(self.size, (block + count) * BLOCK_SIZE) - 1
+        response = self.session.get(
+            self.url,
+            headers={"Range": "bytes=%d-%d" % (start, end)},
+            timeout=TIMEOUT,
+        )
+        self.requests += 1
+        if response.status_code != 206:
+            raise OSError(
+                "%s: %d answer to a Range request"
+                % (self.url, response.status_code)
+            )
+        data = response.content
+        if len(data) != end - start + 1:
+            raise OSError(
+                "%s: %d of %d bytes received"
+                % (self.url, len(data), end - start + 1)
+            )
+        self.fetched += len(data)
+        for i in range(count):
+            self.blocks[block + i] = data[
+                i * BLOCK_SIZE : (i + 1) * BLOCK_SIZE
+            ]
+
+
+def range_size(session, url):
+    """Return the size of the body of url, None without Range support."""
+    with session.get(
+        url, headers={"Range": "bytes=0-0"}, stream=True, timeout=TIMEOUT
+    ) as response:
+        if response.status_code != 206:
+            return None
+        match = re.match(
+            r"bytes\s+0-0/(\d+)", response.headers.get("Content-Range", "")
+        )
+        return int(match.group(1)) if match else None
+
+
+def fetch_pages(url, pages, filename, session):
+    """Write the pages of the report of url to filename, fetching no more.
+
+    Return the number of bytes received, or None when the server does not
+    answer Range requests or the report is encrypted, in which case
+    nothing is written and the whole report is to be downloaded.
+
+    Keyword Arguments:
+    url -- link of the report
+    pages -- page numbers (from 1) to copy, the others left blank
+    filename -- name of the PDF to write
+    session -- requests.Session to fetch with
+    """
+    size = range_size(session, url)
+    if size is None:
+        return None
+    source = RangeFile(url, session, size)
+    pdf = PdfFileReader(source, strict=False)
+    if pdf.isEncrypted:
+        return None
+    wanted = set(pages)
+    writer = PdfFileWriter()
+    # blank pages share an empty content stream, for the text extractors
+    empty = DecodedStreamObject()
+    empty.setData(b"")
+    empty = writer._addObject(empty)
+    for i in range(pdf.getNumPages()):
+        page = pdf.getPage(i)
+        if i + 1 in wanted:
+            # links and article threads would drag other pages along
+            for key in ("/Annots", "/B"):
+                if key in page:
+                    del page[key]
+            writer.addPage(page)
+        else:
+            box = page.mediaBox
+            blank = writer.addBlankPage(
+                float(box.getWidth()), float(box.getHeight())
+            )
+            blank[NameObject("/Contents")] = empty
+    tmp = "%s.%d.tmp" % (filename, os.getpid())
+    with open(tmp, "wb") as f:
+        writer.write(f)
+    os.replace(tmp, filename)
+    return source.fetched
@@ -0,0 +1,110 @@
+"""Parse the reports of an input file while the others are downloading.
+
+Without it a main() downloads every report before parsing the first one,
+leaving the CPU idle during the downloads and the network idle during the
+parsing. download_rows() starts the downloads in background threads, which
+push every report landed onto a bounded queue (blocking when the parser is
+QUEUE_SIZE reports behind), and yields the input rows referencing a report
+together as soon as it is there, so that parsing starts with the first
+report downloaded. The rows are grouped by report, not by link: the links
+which served the same report (the same SHA-256 digest in the report store)
+when last downloaded are fetched one after the other, and their rows
+handed on together once they all landed. Only the rows of which the
+report can be parsed are handed on (see schedule.parsable()).
+
+Module functions:
+    download_rows(df, column="files", save=None, browser=False): --> generator
+    landed_rows(df, column="files", save=None, browser=False): --> generator
+"""
+
+import queue
+import threading
+import pandas as pd
+from .download import MISSING, get_store
+from .schedule import parsable
+
+# reports downloaded and waiting to be parsed
+QUEUE_SIZE = 4
+
+
+def download_rows(df, column="files", save=None, browser=False):
+    """Download the reports of df and yield the rows to parse as they land.
+
+    Yield (index, row) like landed_rows(), skipping the rows without a
+    report which can be parsed, see schedule.parsable(). The arguments are
+    those of landed_rows().
+    """
+    return parsable(landed_rows(df, column, save, browser), column)
+
+
+def landed_rows(df, column="files", save=None, browser=False):
+    """Download the reports of df and yield its rows as they land.
+
+    Yield (index, row) like df.iterrows(), with row[column] set to the file
+    name of the report of row["pdf_url"] (NaN for missing links and failed
+    downloads), the rows of the same report one after the other, whatever
+    their link. The rows without a report come first, then the others in
+    the order the reports are downloaded. df[column] is filled in as well.
+
+    Keyword Arguments:
+    df -- input pd.DataFrame with a "pdf_url" column
+    column -- column to store the file names in
+    save -- name of the CSV file to write df to once all rows were yielded
+    browser -- download from the hosts of the links as a browser, see
+        download.Downloader.browse()
+    """
+    groups = {}
+    for index, url in df["pdf_url"].items():
+        groups.setdefault(url, []).append(index)
+    store = get_store()
+    links = sorted(
+        x for x in groups if isinstance(x, str) and x not in MISSING
+    )
+    # links are known by the digest of their report once downloaded
+    digests = store.digests(links)
+    reports = {}
+    for url in links:
+        reports.setdefault(digests.get(url, url), []).append(url)
+    urls = [url for report in reports.values() for url in report]
+    df[column] = pd.Series(float("nan"), index=df.index, dtype=object)
+    if browser:
+        store.downloader.browse(urls)
+    landed = queue.Queue(QUEUE_SIZE)
+
+    def fetch(url):
+        name = float("nan")
+        try:
+            name = store.fetch(url)
+        finally:
+            landed.put((url, name))
+        return name
+
+    def download():
+        try:
+            store.downloader.map(fetch, urls)
+        finally:
+            store.save()
+
+    print("Downloading " + str(len(urls)) + " files...")
+    threading.Thread(target=download, daemon=True).start()
+    for url in groups:
+        if url not in links:
+            for index in groups[url]:
+                yield index, df.loc[index]
+    names = {}
+    for _ in range(len(urls)):
+        url, name = landed.get()
+        df.loc[groups[url], column] = name
+        report = digests.get(url, url)
+        names[url] = name
+        if any(x not in names for x in reports[report]):
+            continue
+        # the file names tell the reports which changed since apart
+        rows = {}
+        for x in reports[report]:
+            rows.setdefault(str(names[x]), []).extend(groups[x])
+        for indexes in rows.values():
+            for index in indexes:
+                yield index, df.loc[index]
+    if save:
+        df.to_csv(save, mode="w", index=False)
@@ -0,0 +1,117 @@
+"""Hand the parsers the funds of the input file report by report.
+
+The input files have one row per fund, and many funds share a report.
+Going through the rows one at a time, a parser opens the same report and
+looks for each fund's pages in it again for every fund. by_document()
+groups the rows by report instead, so that a parser opens a report once,
+and fund_pages() finds the pages of all the funds of a report in one pass
+over its text.
+
+Every main() goes through parsable() (or report_problem()) before opening
+the reports: rows without a report (a missing link, a failed download, a
+report quarantined as not a PDF), and rows whose file is gone or is not a
+whole PDF (e.g. listed in a pdf_names.csv from an earlier run, or fetched
+in part), are printed and skipped instead of failing the run.
+
+Module functions:
+    report_problem(read_file): --> str or None
+    parsable(rows, column="files"): --> pd.DataFrame or generator
+    by_document(rows, column="files"): --> generator of (str, list)
+    fund_pages(store, names, first=0, normalise=None): --> dict
+"""
+
+import os
+import pandas as pd
+from .download import pdf_problem
+
+
+def report_problem(read_file):
+    """Return why the report read_file cannot be parsed, None if it can.
+
+    Keyword Arguments:
+    read_file -- file name of the report, NaN when there is none
+    """
+    if not isinstance(read_file, str) or read_file == "nan":
+        return "no report"
+    if not os.path.isfile(read_file):
+        return "%s not found" % read_file
+    return pdf_problem(read_file)
+
+
+def parsable(rows, column="files"):
+    """Return the rows of which the report can be parsed.
+
+    The other rows are printed with the reason. A DataFrame gives the
+    DataFrame of these rows, with their index; an iterator of (index, row),
+    like the one of pipeline.download_rows(), an iterator of these.
+
+    Keyword Arguments:
+    rows -- input pd.DataFrame, or iterator of (index, row)
+    column -- column of the file names of the reports
+    """
+    problems = {}
+
+    def ok(row):
+        read_file = row[column]
+        key = str(read_file)
+        if key not in problems:
+            problems[key] = report_problem(read_file)
+        if problems[key]:
+            print("skipping", row.get("name"), "(%s)" % problems[key])
+        return not problems[key]
+
+    if isinstance(rows, pd.DataFrame):
+        keep = [ok(row) for _, row in rows.iterrows()]
+        return rows.loc[pd.Series(keep, index=rows.index, dtype=bool)]
+    return ((index, row) for index, row in rows if ok(row))
+
+
+def by_document(rows, column="files"):
+    """Yield (file name, [(index, row), ...]) for every report of rows.
+
+    A DataFrame is grouped whole, reports in the order of their first row.
+    An iterator of (index, row), like the one of pipeline.download_rows(),
+    is grouped as it goes, the rows of a report being expected together.
+    Rows without a report (NaN file name) are grouped under NaN.
+
+    Keyword Arguments:
+    rows -- input pd.DataFrame, or iterator of (index, row)
+    column -- column of the file names of the reports
+    """
+    if isinstance(rows, pd.DataFrame):
+        groups = {}
+        for index, row in rows.iterrows():
+            groups.setdefault(str(row[column]), []).append((index, row))
+        for group in groups.values():
+            yield group[0][1][column], group
+        return
+    group = []
+    for index, row in rows:
+        if group and str(row[column]) != str(group[0][1][column]):
+            yield group[0][1][column], group
+            group = []
+        group.append((index, row))
+    if group:
+        yield group[0][1][column], group
+
+
+def fund_pages(store, names, first=0, normalise=None):
+    """Return {name: page numbers (from 1) whose text contains name}.
+
+    Every page is read once for all the names.
+
+    Keyword Arguments:
+    store -- page text store of the report (see pages.py)
+    names -- names to look for
+    first -- index (from 0) of the first page to look at
+    normalise -- function applied to the text of a page before the search
+    """
+    pages = {name: [] for name in names}
+    for i in range(first, len(store)):
+        text = store[i]
+        if normalise is not None:
+            text = normalise(text)
+        for name in pages:
+            if name in text:
+                pages[name].append(i + 1)
+    return pages
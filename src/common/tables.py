@@ -0,0 +1,323 @@
+"""Table extraction front door shared by the provider parsers.
+
+read_pdf() takes the arguments of tabula.read_pdf(), and calls tabula.
+tabula-py runs the calls in one JVM started through JPype on the first
+call and kept warm for the whole run when jpype1 is installed (it is in
+requirements.txt), and in a new java process for every call otherwise.
+The latency of every call is recorded per engine, see latency_report().
+When only some pages of a report are wanted, they are first copied into a
+small temporary PDF with PyPDF2, so that tabula loads and parses those
+pages and not the whole report; the pages of the copy are in document
+order, like the tables tabula returns, so the result is the same.
+read_pdf_areas() reads several areas of the same pages (e.g. both columns
+of two-column pages) in a single pass.
+
+The tables read are stored in the table cache of the folder of the report
+(pdf_folder_path/.tables), keyed by the SHA-256 of the PDF, the exact
+extraction arguments (pages, area, columns, mode, options) and the
+version of tabula-py, so that rerunning a parser over the same reports, e.g.
+while changing how the tables are cleaned, skips the extraction.
+
+Module functions:
+    page_list(pages, read_file): --> list
+    sub_pdf(read_file, pages): --> str or None
+    run_tabula(read_file, pages, **kwargs): --> list
+    read_pdf(read_file, pages=1, area=None, columns=None, ...): --> list
+    read_pdf_areas(read_file, pages, areas, ...): --> dict
+    table_key(read_file, engine, **args): --> str
+    tabula_engine(): --> str
+    latency_report(): --> str
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+import tabula
+import tabula.io
+from PyPDF2 import PdfFileWriter
+from tabula.io import _extract_from
+from .cache import file_digest, table_cache
+from .pages import get_store
+
+# {engine: [seconds of each call]}
+latencies = {}
+# set to False to always extract the tables again
+use_cache = True
+
+
+def page_list(pages, read_file):
+    """Return the page numbers (from 1) meant by tabula's pages argument.
+
+    Like tabula, the pages are read in document order whatever the order
+    they are given in.
+    """
+    if pages is None:
+        return [1]
+    if isinstance(pages, int):
+        return [pages]
+    if isinstance(pages, str):
+        if pages == "all":
+            return list(range(1, len(get_store(read_file)) + 1))
+        result = set()
+        for part in pages.split(","):
+            first, _, last = part.partition("-")
+            result.update(range(int(first), int(last or first) + 1))
+        return sorted(result)
+    return sorted(set(int(x) for x in pages))
+
+
+def sub_pdf(read_file, pages):
+    """Copy pages (from 1, sorted) of read_file into a temporary PDF.
+
+    Return the name of the new file, to be removed by the caller, or None
+    when the copy would hold the whole document or cannot be made (e.g.
+    encrypted documents, whose streams PyPDF2 copies still encrypted).
+    """
+    try:
+        pdf = get_store(read_file).pdf
+        if pdf.isEncrypted or len(pages) >= pdf.getNumPages():
+            return None
+        writer = PdfFileWriter()
+        for page in pages:
+            writer.addPage(pdf.getPage(page - 1))
+        fd, name = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            writer.write(f)
+    except Exception:
+        return None
+    return name
+
+
+def run_tabula(read_file, pages, **kwargs):
+    """Call tabula.read_pdf() on a sub-PDF of pages."""
+    part = None
+    if pages != "all":
+        pages = page_list(pages, read_file)
+        part = sub_pdf(read_file, pages)
+    try:
+        return tabula.read_pdf(
+            part or read_file,
+            pages=list(range(1, len(pages) + 1)) if part else pages,
+            **kwargs
+        )
+    finally:
+        if part:
+            os.remove(part)
+
+
+def engine_version():
+    """Return the name and version of the extractor, for the cache key."""
+    return "tabula-py " + tabula.__version__
+
+
+def read_pdf(
+    read_file,
+    pages=1,
+    area=None,
+    columns=None,
+    stream=False,
+    lattice=False,
+    guess=True,
+    silent=False,
+    pandas_options=None,
+    **kwargs
+):
+    """Read tables of read_file, taking the arguments of tabula.read_pdf().
+
+    Results found in the table cache are returned without extraction.
+    """
+    start = time.perf_counter()
+    if use_cache:
+        key = table_key(
+            read_file,
+            engine_version(),
+            pages=page_list(pages, read_file),
+            area=area,
+            columns=columns,
+            stream=stream,
+            lattice=lattice,
+            guess=guess,
+            pandas_options=pandas_options,
+            **kwargs
+        )
+        cache = table_cache(read_file)
+        tables = cache.load(key)
+        if tables is not None:
+            latencies.setdefault("cache", []).append(
+                time.perf_counter() - start
+            )
+            return tables
+    tables = run_tabula(
+        read_file,
+        pages,
+        area=area,
+        columns=columns,
+        stream=stream,
+        lattice=lattice,
+        guess=guess,
+        silent=silent,
+        pandas_options=pandas_options,
+        **kwargs
+    )
+    latencies.setdefault(tabula_engine(), []).append(
+        time.perf_counter() - start
+    )
+    if use_cache:
+        cache.put(key, tables)
+    return tables
+
+
+def read_pdf_areas(
+    read_file,
+    pages,
+    areas,
+    columns=None,
+    stream=False,
+    lattice=False,
+    guess=False,
+    silent=False,
+    pandas_options=None,
+    page_areas=None,
+    **kwargs
+):
+    """Read several areas of every page of pages in one extraction pass.
+
+    Return {(page, i): list of DataFrames} for every page (from 1) and
+    every index i of areas read on it, the list being what read_pdf()
+    returns for that page and areas[i] alone, with which the table cache
+    is shared. Each page is parsed once for all its areas, where separate
+    read_pdf() calls would parse it once per area.
+
+    Keyword Arguments:
+    read_file -- file name
+    pages -- tabula pages argument
+    areas -- list of [top, left, bottom, right] in points
+    page_areas -- {page: indices in areas of the areas read on the page},
+    for pages not reading every area; the pages reading the same areas are
+    extracted together
+    the others -- as for read_pdf()
+    """
+    start = time.perf_counter()
+    pages = page_list(pages, read_file)
+    page_areas = page_areas or {}
+    wanted = [
+        (page, i)
+        for page in pages
+        for i in sorted(page_areas.get(page, range(len(areas))))
+    ]
+    options = dict(
+        columns=columns,
+        stream=stream,
+        lattice=lattice,
+        guess=guess,
+        pandas_options=pandas_options,
+        **kwargs
+    )
+    result, keys = {}, {}
+    if use_cache:
+        cache = table_cache(read_file)
+        for page, i in wanted:
+            keys[page, i] = table_key(
+                read_file,
+                engine_version(),
+                pages=[page],
+                area=areas[i],
+                **options
+            )
+            tables = cache.load(keys[page, i])
+            if tables is not None:
+                result[page, i] = tables
+        if len(result) == len(keys):
+            latencies.setdefault("cache", []).append(
+                time.perf_counter() - start
+            )
+            return result
+    # one extraction per set of areas, over the pages reading them
+    groups = {}
+    for page, i in wanted:
+        groups.setdefault(page, []).append(i)
+    calls = {}
+    for page, indices in groups.items():
+        calls.setdefault(tuple(indices), []).append(page)
+    for indices, group in calls.items():
+        raw = run_tabula(
+            read_file,
+            group,
+            area=[areas[i] for i in indices],
+            silent=silent,
+            output_format="json",
+            **options
+        )
+        if len(raw) != len(group) * len(indices):
+            # not one table per page and area (lattice mode): one call per
+            # area
+            return {
+                (page, i): read_pdf(
+                    read_file,
+                    pages=[page],
+                    area=areas[i],
+                    silent=silent,
+                    **options
+                )
+                for page, i in wanted
+            }
+        tables = iter(raw)
+        for page in group:
+            for i in indices:
+                result[page, i] = _extract_from(
+                    [next(tables)], dict(pandas_options or {})
+                )
+    if calls:
+        latencies.setdefault(tabula_engine(), []).append(
+            time.perf_counter() - start
+        )
+    if use_cache:
+        for page_area, tables in result.items():
+            cache.put(keys[page_area], tables)
+    return result
+
+
+def table_key(read_file, engine, **args):
+    """Return the table cache key of an extraction.
+
+    Keyword Arguments:
+    read_file -- file name
+    engine -- name and version of the extractor
+    args -- the extraction arguments, as JSON-serialisable values
+    """
+    text = json.dumps(
+        [file_digest(read_file), engine, args], sort_keys=True, default=str
+    )
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def tabula_engine():
+    """Return how tabula runs: "jpype" (one warm JVM) or "subprocess"."""
+    if isinstance(tabula.io._tabula_vm, tabula.io.TabulaVm):
+        return "jpype"
+    return "subprocess"
+
+
+def latency_report():
+    """Return a table of the calls made so far and their latency per engine.
+
+    The first call of the jpype engine includes starting the JVM.
+    """
+    lines = [
+        "%-10s %6s %9s %9s %9s"
+        % ("engine", "calls", "first s", "mean s", "max s")
+    ]
+    for engine, times in sorted(latencies.items()):
+        lines.append(
+            "%-10s %6d %9.2f %9.2f %9.2f"
+            % (
+                engine,
+                len(times),
+                times[0],
+                sum(times) / len(times),
+                max(times),
+            )
+        )
+    return "\n".join(lines)
@@ -1,24 +1,28 @@
 """Parse PDF files of CPR."""
 import os.path
-import tabula as tb
 import pandas as pd
 import numpy as np
 import re
 import sys
 from os.path import exists
-import PyPDF2
-import requests
 import glob
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.pages import get_store
+from common.tables import read_pdf
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import report_problem
+
 with open(r"./src/cpr/currencies.txt") as f:
     currencies = f.readline().split()
 
 
 def findPages(file,name):
-    object = PyPDF2.PdfFileReader(file)
+    store = get_store(file)
     pages = []
     # get number of pages
-    NumPages = object.getNumPages()
+    NumPages = len(store)
 
     name = name.lower().split('-')[1].replace(' ','')
     String = name + 'quantitdnominationdevisedecotation%actifsnetsvaleurd\'valuation'
@@ -29,9 +33,7 @@ def findPages(file,name):
     # extract text and do the search
     check = False
     for i in range(0, NumPages):
-        PageObj = object.getPage(i)
-        Text = PageObj.extractText()
-        Text = Text.replace('\n',' ').replace(' ','').lower()
+        Text = store.squashed(i)
 
         if (String in Text) or (String2 in Text) or (String3 in Text) or (all(x in Text for x in s3)):
             pages.append(i+1)
@@ -42,11 +44,11 @@ def findPages(file,name):
     return pages
 
 def findPages2(file,name):
-    object = PyPDF2.PdfFileReader(file)
+    store = get_store(file)
     pages = []
 
     # get number of pages
-    NumPages = object.getNumPages()
+    NumPages = len(store)
 
     # define keyterms
     #String = "3.12."
@@ -60,9 +62,7 @@ def findPages2(file,name):
     # extract text and do the search
     check = False
     for i in range(0, NumPages):
-        PageObj = object.getPage(i)
-        Text = PageObj.extractText()
-        Text = Text.replace('\n',' ').replace(' ','').lower()
+        Text = store.squashed(i)
 #        ResSearch = re.search(String, Text, re.IGNORECASE)
 #        if ResSearch != None:
         if all(x in Text for x in Strings) or all(x in Text for x in Strings2):
@@ -73,19 +73,6 @@ def findPages2(file,name):
 
     return pages
 
-def download_file(download_url, filename):
-    """Download the file from url.
-
-    Keyword Arguments:
-    download_url -- pdf link
-    filename -- PDF file name
-    """
-    response = requests.get(download_url)
-    file = open(filename, "wb")
-    file.write(response.content)
-    file.close()
-
-
 def main():
     """Main."""
     assert "-i" in sys.argv, "No input file path provided as argument."
@@ -95,25 +82,31 @@ def main():
     out_path = sys.argv[sys.argv.index("-o") + 1]
     pdf_out_path = sys.argv[sys.argv.index("-p") + 1]
 
+    currdir = os.getcwd()
     meta_data = pd.read_csv(in_path)
     final_data = []
-    for i in range(len(meta_data)):
-        url = meta_data.iloc[i, 1]
-        file = os.path.join(
-            meta_data.iloc[i, 0] + ".pdf"
-        )  # Can give full path here
-        fund_name = meta_data.iloc[i, 0]
-        if os.path.isfile(file) == 0:
-            print("downloading ", url)
-            download_file(url, file)
+    os.chdir(os.path.normpath(pdf_out_path))
+    rows = None
+    if "-pipeline" in sys.argv:
+        rows = download_rows(meta_data)
+    else:
+        links_to_pdf_map = download_all(meta_data["pdf_url"])
+    for i, row in rows or meta_data.iterrows():
+        if rows is not None:
+            file = row["files"]
         else:
-            print("downloaded")
+            file = links_to_pdf_map.get(meta_data.iloc[i, 1])
+        fund_name = meta_data.iloc[i, 0]
+        problem = report_problem(file)
+        if problem:
+            print("skipping", fund_name, "(%s)" % problem)
+            continue
         pages = find_start_page(file, fund_name)
         print(file, pages)
         file_data = []
 
         for j in pages:
-            df = tb.read_pdf(
+            df = read_pdf(
                 file,
                 pages=j,
                 area=(0, 0, 850, 950),
@@ -186,7 +179,9 @@ def main():
     )
     final_data = final_data[cols]
     print("Total rows: ", len(final_data))
-    final_data.to_csv(out_path, index=False)
+    final_data.to_csv(
+        os.path.join(currdir, os.path.normpath(out_path)), index=False
+    )
 
 
 if __name__ == "__main__":
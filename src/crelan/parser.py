@@ -7,21 +7,29 @@ import re
 import sys
 import os
 import warnings
-from pdfminer.high_level import extract_text
-from PyPDF2 import PdfFileReader as Read
-import tabula as tb
 import pandas as pd
 import numpy as np
-import requests
 import time
 import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import common.pages
+from common.pages import get_miner_store, get_store
+from common.outline import outline_contents
+from common.tables import read_pdf
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import by_document, parsable
+from common.cache import parser_version, result_cache
+
 warnings.filterwarnings("ignore")
 
 with open("./src/crelan/currencies.txt") as f:
     currencies = f.readline().split()
 
 currencies.extend(["CNH", "CHN"])
+# funds parsed by this version of the parser are kept between runs
+VERSION = parser_version(__file__)
 
 
 def parse_crelan(
@@ -35,10 +43,23 @@ def parse_crelan(
     website -- fund name website
     columns -- column measurements of table in pts.
     """
-    if read_file in file_contents:
+    pattern = re.compile(
+        r"crelan fund |crelan invest |crelan pension |metropolitan rentastro | \(cap\)| \(dis\)"
+    )
+    fund = re.sub(pattern, "", website.lower()).split("-")[0]
+    # the section is the composition heading following the fund
+    contents = outline_contents(
+        read_file,
+        lambda x: fund in x.lower(),
+        lambda x: "Composition des actifs au" in x
+        or "COMPOSITION DES ACTIFS ET CHIFFRES-CLES" in x,
+    )
+    if contents is not None:
+        contents["pg"] = contents["pg"].apply(float)
+    elif read_file in file_contents:
         contents = file_contents[read_file]
     else:
-        contents = tb.read_pdf(
+        contents = read_pdf(
             read_file,
             pages=[2, 3, 4, 5],
             area=[0, 50, 835, 590],
@@ -55,14 +76,8 @@ def parse_crelan(
         contents = contents.reset_index(drop=True)
         file_contents[read_file] = contents
     start, end = 0, 0
-    pattern = re.compile(
-        r"crelan fund |crelan invest |crelan pension |metropolitan rentastro | \(cap\)| \(dis\)"
-    )
     for i, r in contents.iterrows():
-        if (
-            re.sub(pattern, "", website.lower()).split("-")[0]
-            in r["fund"].lower()
-        ):
+        if fund in r["fund"].lower():
             break
     if i == len(contents) - 1:
         i = 0
@@ -93,7 +108,7 @@ def parse_crelan(
         return []
     print((start, end))
     pages = tuple(range(start, end + 1))
-    tables = tb.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=pages,
         area=[0, 0, 835, 590],
@@ -146,10 +161,19 @@ def parse_bnp(pdf, read_file, website):
     read_file -- file name
     website -- fund name website
     """
-    if read_file in file_contents:
+    # the section is the composition heading following the fund
+    contents = outline_contents(
+        read_file,
+        lambda x: website.lower().split("-")[0] in x.lower(),
+        lambda x: "Composition des actifs au" in x
+        or "COMPOSITION DES ACTIFS ET CHIFFRES-CLES" in x,
+    )
+    if contents is not None:
+        contents["pg"] = contents["pg"].apply(float)
+    elif read_file in file_contents:
         contents = file_contents[read_file]
     else:
-        contents = tb.read_pdf(
+        contents = read_pdf(
             read_file,
             pages=[2, 3, 4],
             area=[0, 50, 835, 590],
@@ -198,7 +222,7 @@ def parse_bnp(pdf, read_file, website):
         return []
     print((start, end))
     pages = tuple(range(start, end + 1))
-    tables = tb.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=pages,
         area=[0, 0, 835, 590],
@@ -246,10 +270,17 @@ def parse_cpr(pdf, read_file, website):
     read_file -- file name
     website -- fund name website
     """
-    if read_file in file_contents:
+    fund = website.split(" - ")[0].replace("CPR Invest ", "").strip().lower()
+    # the printed page p is searched from index p + 1 (page p + 2)
+    contents = outline_contents(
+        read_file, lambda x: fund in x.lower(), offset=2
+    )
+    if contents is not None:
+        contents["pg"] = contents["pg"].apply(str)
+    elif read_file in file_contents:
         contents = file_contents[read_file]
     else:
-        contents = tb.read_pdf(
+        contents = read_pdf(
             read_file,
             pages=[2, 3],
             area=[0, 0, 828, 590],
@@ -267,10 +298,7 @@ def parse_cpr(pdf, read_file, website):
         file_contents[read_file] = contents
     start, end = 0, 0
     for idx, r in contents.iterrows():
-        if (
-            website.split(" - ")[0].replace("CPR Invest ", "").strip().lower()
-            in r["fund"].lower()
-        ):
+        if fund in r["fund"].lower():
             start, end = int(r["pg"].split()[-1].strip()), int(
                 contents["pg"][idx + 1].split()[-1].strip()
             )
@@ -279,15 +307,12 @@ def parse_cpr(pdf, read_file, website):
         print("not found")
         return []
     pages = tuple(
-        (
-            i + 1
-            for i in range(start + 1, end)
-            if "Securities portfolio as at"
-            in pdf.getPage(i).extractText().replace("\n", "")
+        get_store(read_file, pdf).find(
+            "Securities portfolio as at", pages=range(start + 1, end)
         )
     )
     print((pages[0], pages[-1]))
-    tables = tb.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=pages,
         area=[0, 0, 828, 590],
@@ -329,16 +354,15 @@ def parse_amundi(pdf, read_file, website):
     read_file -- file name
     website -- fund name website
     """
-    if read_file in file_contents:
+    fund = website.split(" - ")[0].replace("Amundi Funds ", "").lower()
+    contents = outline_contents(read_file, lambda x: fund in x.lower())
+    if contents is not None:
+        contents["pg"] = contents["pg"].apply(str)
+    elif read_file in file_contents:
         contents = file_contents[read_file]
     else:
-        cont_pgs = [
-            i + 1
-            for i in range(2, 6)
-            if "Table"
-            in extract_text(read_file, page_numbers=[i]).replace("\n", "")
-        ]
-        dfs = tb.read_pdf(
+        cont_pgs = get_miner_store(read_file).find("Table", pages=range(2, 6))
+        dfs = read_pdf(
             read_file,
             pages=cont_pgs,
             area=[0, 0, 828, 590],
@@ -363,10 +387,7 @@ def parse_amundi(pdf, read_file, website):
         file_contents[read_file] = contents
     start, end = 0, 0
     for idx, r in contents.iterrows():
-        if (
-            website.split(" - ")[0].replace("Amundi Funds ", "").lower()
-            in r["fund"].lower()
-        ):
+        if fund in r["fund"].lower():
             start, end = int(r["pg"]), int(contents["pg"][idx + 1])
             break
     if not (start and end):
@@ -375,7 +396,7 @@ def parse_amundi(pdf, read_file, website):
     pages = tuple(range(start, end))
     print((start, end))
     tables = []
-    df = tb.read_pdf(
+    df = read_pdf(
         read_file,
         pages=pages,
         area=[0, 0, 828, 590],
@@ -430,10 +451,19 @@ def parse_indosuez(pdf, read_file, website):
     read_file -- file name
     website -- fund name website
     """
-    if read_file in file_contents:
+    pattern = "|".join(currencies) + "|Indosuez Funds "
+    pattern = re.compile(pattern)
+    report = re.sub(pattern, "", website.split(" - ")[0])
+    # the printed page p is read from page p + 1
+    contents = outline_contents(
+        read_file, lambda x: report.lower() in x.lower(), offset=1
+    )
+    if contents is not None:
+        contents["pg"] = contents["pg"].apply(str)
+    elif read_file in file_contents:
         contents = file_contents[read_file]
     else:
-        contents = tb.read_pdf(
+        contents = read_pdf(
             read_file,
             pages=[2, 3, 4, 5],
             area=[0, 50, 835, 590],
@@ -449,9 +479,6 @@ def parse_indosuez(pdf, read_file, website):
         contents = contents.reset_index(drop=True)
         file_contents[read_file] = contents
     start, end = 0, 0
-    pattern = "|".join(currencies) + "|Indosuez Funds "
-    pattern = re.compile(pattern)
-    report = re.sub(pattern, "", website.split(" - ")[0])
     for i, r in contents.iterrows():
         if report.lower() in r["fund"].lower():
             start, end = int(r["pg"]), int(contents["pg"][i + 1])
@@ -461,7 +488,7 @@ def parse_indosuez(pdf, read_file, website):
         return []
     pages = tuple(range(start + 1, end))
     print((start, end))
-    tables = tb.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=pages,
         area=[0, 0, 828, 590],
@@ -502,7 +529,7 @@ def parse_econopolis(pdf, read_file, website):
     if read_file in file_contents:
         contents = file_contents[read_file]
     else:
-        contents = tb.read_pdf(
+        contents = read_pdf(
             read_file,
             pages=[2, 3, 4, 5],
             area=[0, 50, 835, 590],
@@ -542,7 +569,7 @@ def parse_econopolis(pdf, read_file, website):
     print((start, end))
     pages = tuple(range(start, end))
     print(pages)
-    tables = tb.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=pages,
         area=[0, 0, 828, 590],
@@ -588,8 +615,8 @@ def parse_pricos(pdf, read_file, website):
     read_file -- file name
     website -- fund name website
     """
-    tables = tb.read_pdf(
-        "crelan11.pdf", pages="all", stream=False, silent=True, guess=False
+    tables = read_pdf(
+        read_file, pages="all", stream=False, silent=True, guess=False
     )
     tables = [
         x.dropna(axis=1, how="all")
@@ -667,6 +694,8 @@ def main():
     in_path = sys.argv[sys.argv.index("-i") + 1]
     out_path = sys.argv[sys.argv.index("-o") + 1]
     pdf_out_path = sys.argv[sys.argv.index("-p") + 1]
+    if "-w" in sys.argv:
+        common.pages.workers = int(sys.argv[sys.argv.index("-w") + 1])
     currdir = os.getcwd()
     print("Taking input from " + in_path)
     pdf_links_df = pd.read_csv(
@@ -675,23 +704,14 @@ def main():
     links_set = set(pdf_links_df["pdf_url"])
     links_set.discard("annual_report_does_not_exists")
     os.chdir(os.path.join(currdir, os.path.normpath(pdf_out_path)))
-    if len(pdf_links_df.columns) == 3:
+    rows = None
+    if "-pipeline" in sys.argv and len(pdf_links_df.columns) == 3:
+        rows = download_rows(pdf_links_df, save="pdf_names.csv")
+    elif len(pdf_links_df.columns) == 3:
         links_set = set(pdf_links_df["pdf_url"])
         links_set.discard("nan")
         links_set.discard("annual_report_does_not_exists")
-        links_to_pdf_map = {}
-        num = 1
-        print("Downloading " + str(len(links_set)) + " files...")
-        for link in links_set:
-            if link in ["nan", "annual_report_does_not_exists"]:
-                continue
-            response = requests.get(link)
-            links_to_pdf_map[link] = "crelan" + str(num) + ".pdf"
-            with open("crelan" + str(num) + ".pdf", "wb") as f:
-                print("crelan" + str(num) + ".pdf")
-                f.write(response.content)
-            num += 1
-        del num
+        links_to_pdf_map = download_all(links_set)
         links_to_pdf_map[np.nan] = np.nan
         links_to_pdf_map["annual_report_does_not_exists"] = np.nan
         pdf_links_df["files"] = pdf_links_df["pdf_url"].apply(
@@ -704,73 +724,81 @@ def main():
 
     done_report = {}
     start = time.time()
-    for idx, row in pdf_links_df.iterrows():
-        table = []
-        website = row["name"]
-        read_file = row["files"]
-        pattern = (
-            "|".join(currencies)
-            + "|Indosuez Funds "
-            + "|Amundi Funds |Crelan Fund |Crelan Invest |Crelan Pension |Metropolitan Rentastro | \\(DIS\\)| \\(CAP\\)"
-        )
-        pattern = re.compile(pattern)
-        report = re.sub(pattern, "", website.split(" - ")[0].split("-")[0])
+    pattern = (
+        "|".join(currencies)
+        + "|Indosuez Funds "
+        + "|Amundi Funds |Crelan Fund |Crelan Invest |Crelan Pension |Metropolitan Rentastro | \\(DIS\\)| \\(CAP\\)"
+    )
+    pattern = re.compile(pattern)
+    # the rows of a report come together: it is opened and flattened once
+    for read_file, group in by_document(rows or parsable(pdf_links_df)):
         if str(read_file) == "nan":
             continue
-        pdf_url = row["pdf_url"]
-        isin = row["isin"]
-        if report in done_report:
-            print("parsing", read_file, website, "  memory")
-            table = done_report[report].copy()
-        else:
-            if read_file in done:
+        for idx, row in group:
+            table = []
+            website = row["name"]
+            report = re.sub(pattern, "", website.split(" - ")[0].split("-")[0])
+            pdf_url = row["pdf_url"]
+            isin = row["isin"]
+            if report not in done_report:
+                cached = result_cache(read_file, VERSION).get(read_file, report)
+                if cached is not None:
+                    done_report[report] = cached
+            if report in done_report:
+                print("parsing", read_file, website, "  memory")
+                table = done_report[report].copy()
+            else:
+                if read_file not in done:
+                    pdf = get_store(read_file).pdf
+                    pdf._override_encryption = True
+                    pdf._flatten()
+                    done[read_file] = pdf
                 pdf = done[read_file]
 
-            else:
-                pdf = Read(read_file)
-                done[read_file] = pdf
-
-            pdf._override_encryption = True
-            pdf._flatten()
-
-            if "amundi" in website.lower():
-                print("parsing ", read_file, website, end="  ")
-                table = parse_amundi(pdf, read_file, website)
-                done_report[report] = table.copy()
-            elif "CPR" in website:
-                print("parsing", read_file, website, end="  ")
-                table = parse_cpr(pdf, read_file, website)
-                done_report[report] = table.copy()
-            elif "BNP" in website:
-                print("parsing", read_file, website, end="  ")
-                table = parse_bnp(pdf, read_file, website)
-                done_report[report] = table.copy()
-            elif "Crelan" in website or "Metropolitan Rentastro" in website:
-                print("parsing ", read_file, website, end="  ")
-                table = parse_crelan(pdf, read_file, website)
-                done_report[report] = table.copy()
-            elif "Indosuez" in website:
-                print("parsing ", read_file, website, end="  ")
-                table = parse_indosuez(pdf, read_file, website)
-                done_report[report] = table.copy()
-            elif "Econopolis" in website:
-                print("parsing ", read_file, website, end="  ")
-                table = parse_econopolis(pdf, read_file, website)
-                done_report[report] = table.copy()
-            elif "Pricos" in website:
-                print("parsing ", read_file, website, end="  ")
-                table = parse_pricos(pdf, read_file, website)
-                done_report[report] = table.copy()
-            else:
-                continue
+                if "amundi" in website.lower():
+                    print("parsing ", read_file, website, end="  ")
+                    table = parse_amundi(pdf, read_file, website)
+                    done_report[report] = table.copy()
+                elif "CPR" in website:
+                    print("parsing", read_file, website, end="  ")
+                    table = parse_cpr(pdf, read_file, website)
+                    done_report[report] = table.copy()
+                elif "BNP" in website:
+                    print("parsing", read_file, website, end="  ")
+                    table = parse_bnp(pdf, read_file, website)
+                    done_report[report] = table.copy()
+                elif (
+                    "Crelan" in website or "Metropolitan Rentastro" in website
+                ):
+                    print("parsing ", read_file, website, end="  ")
+                    table = parse_crelan(pdf, read_file, website)
+                    done_report[report] = table.copy()
+                elif "Indosuez" in website:
+                    print("parsing ", read_file, website, end="  ")
+                    table = parse_indosuez(pdf, read_file, website)
+                    done_report[report] = table.copy()
+                elif "Econopolis" in website:
+                    print("parsing ", read_file, website, end="  ")
+                    table = parse_econopolis(pdf, read_file, website)
+                    done_report[report] = table.copy()
+                elif "Pricos" in website:
+                    print("parsing ", read_file, website, end="  ")
+                    table = parse_pricos(pdf, read_file, website)
+                    done_report[report] = table.copy()
+                else:
+                    continue
+                if len(table) > 0:
+                    result_cache(read_file, VERSION).set(
+                        read_file, report, table
+                    )
 
-        if len(table) > 0:
-            table["isin"] = isin
-            table["fund_name_website"] = website
-            table["pdf_url"] = pdf_url
-            tables.append(table)
-        else:
-            issues.append((read_file, website))
+            if len(table) > 0:
+                table["isin"] = isin
+                table["fund_name_website"] = website
+                table["pdf_url"] = pdf_url
+                tables.append(table)
+            else:
+                issues.append((read_file, website))
     print("Time elapsed: ", datetime.timedelta(seconds=time.time() - start))
 
     tables = list(filter(lambda x: len(x) > 0, tables))
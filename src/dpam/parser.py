@@ -7,16 +7,23 @@ import re
 import sys
 import os
 import warnings
-import tabula
-import PyPDF2
 import pandas as pd
 import numpy as np
-import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.pages import get_store
+from common.tables import read_pdf
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import parsable
+from common.cache import parser_version, result_cache
 
 warnings.filterwarnings("ignore")
 
 with open("./src/dpam/currencies.txt") as f:
     currencies = f.readline().split()
+# funds parsed by this version of the parser are kept between runs
+VERSION = parser_version(__file__)
 
 
 def findPages1(file, name):
@@ -26,9 +33,9 @@ def findPages1(file, name):
     file-- file name
     name-- fund name website
     """
-    pdf = PyPDF2.PdfFileReader(file)
+    store = get_store(file)
     pages = []
-    NumPages = pdf.getNumPages()
+    NumPages = len(store)
 
     name = (
         name.split("-")[0]
@@ -45,9 +52,7 @@ def findPages1(file, name):
 
     check = False
     for i in range(0, NumPages):
-        PageObj = pdf.getPage(i)
-        Text = PageObj.extractText()
-        Text = Text.replace("\n", " ").replace(" ", "").lower()
+        Text = store.squashed(i)
         if s1 in Text:
             pages.append(i + 1)
             check = True
@@ -64,10 +69,10 @@ def findPages2(file, name):
     file-- file name
     name-- fund name website
     """
-    pdf = PyPDF2.PdfFileReader(file)
+    store = get_store(file)
     pages = []
 
-    NumPages = pdf.getNumPages()
+    NumPages = len(store)
 
     name = name.split("-")[0].lower().replace(" ", "")
 
@@ -77,9 +82,7 @@ def findPages2(file, name):
     ]
     check = False
     for i in range(0, NumPages):
-        PageObj = pdf.getPage(i)
-        Text = PageObj.extractText()
-        Text = Text.replace("\n", " ").replace(" ", "").lower()
+        Text = store.squashed(i)
         if all(x in Text for x in s1):
             pages.append(i + 1)
             check = True
@@ -102,25 +105,14 @@ def main():
     links_set = set(meta_data["pdf_url"])
     links_set.discard("annual_report_does_not_exists")
     os.chdir(os.path.join(currdir, os.path.normpath(pdf_out_path)))
-    if "file_names" not in meta_data.columns:
+    rows = None
+    if "-pipeline" in sys.argv and "file_names" not in meta_data.columns:
+        rows = download_rows(meta_data, "file_names", save="pdf_names.csv")
+    elif "file_names" not in meta_data.columns:
         links_set = set(meta_data["pdf_url"])
         links_set.discard("nan")
         links_set.discard("annual_report_does_not_exists")
-        links_to_pdf_map = {}
-        num = 1
-        print("Downloading " + str(len(links_set)) + " files...")
-        for link in links_set:
-            if link in ["nan", "annual_report_does_not_exists"]:
-                continue
-            response = requests.get(link)
-            links_to_pdf_map[link] = "dpam" + str(num) + ".pdf"
-            with open("dpam" + str(num) + ".pdf", "wb") as f:
-                print("dpam" + str(num) + ".pdf")
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk:
-                        f.write(chunk)
-            num += 1
-        del num, response
+        links_to_pdf_map = download_all(links_set)
         links_to_pdf_map[np.nan] = np.nan
         links_to_pdf_map["annual_report_does_not_exists"] = np.nan
         meta_data["file_names"] = meta_data["pdf_url"].apply(
@@ -130,10 +122,10 @@ def main():
 
     fnr_dict = {}
     final_data = []
-    for i in range(len(meta_data)):
+    for i, _ in rows or parsable(meta_data, "file_names").iterrows():
         file = meta_data["file_names"][i]
         df = (
-            tb.read_pdf(
+            read_pdf(
                 file,
                 pages=1,
                 area=(100, 30, 740, 630),
@@ -147,8 +139,11 @@ def main():
         if str(df[0][0]).startswith("DPAM"):
             s = meta_data["name"][i]
             print("parsing", file, s, end="  ")
-            file = "dpam" + str(i + 1) + ".pdf"
             fnr = s.split("-")[0].split("L ")[-1].split("B ")[-1]
+            if fnr not in fnr_dict:
+                cached = result_cache(file, VERSION).get(file, fnr)
+                if cached is not None:
+                    fnr_dict[fnr] = cached
             if fnr not in fnr_dict:
                 pages = findPages1(file, s)
                 print(pages)
@@ -158,7 +153,7 @@ def main():
 
                 pages_data = []
                 for p in pages:
-                    df = tb.read_pdf(
+                    df = read_pdf(
                         file,
                         pages=p,
                         area=(150, 50, 770, 630),
@@ -197,6 +192,7 @@ def main():
                     lambda x: float(str(x).replace("%", ""))
                 )
                 fnr_dict[fnr] = fund_name.copy()
+                result_cache(file, VERSION).set(file, fnr, fund_name)
 
             else:
                 print("memory")
@@ -221,8 +217,11 @@ def main():
         else:
             fnw = meta_data["name"][i]
             print("parsing", file, fnw, end="  ")
-            file = "dpam" + str(i + 1) + ".pdf"
             fnr = fnw.split("-")[0].split("L ")[-1].split("B ")[-1]
+            if fnr not in fnr_dict:
+                cached = result_cache(file, VERSION).get(file, fnr)
+                if cached is not None:
+                    fnr_dict[fnr] = cached
             if fnr not in fnr_dict:
                 pages = findPages2(file, fnw)
                 print(pages)
@@ -232,7 +231,7 @@ def main():
 
                 pages_data = []
                 for p in pages:
-                    df = tb.read_pdf(
+                    df = read_pdf(
                         file,
                         pages=p,
                         area=(100, 50, 750, 630),
@@ -271,6 +270,7 @@ def main():
                     lambda x: float(str(x).replace("%", ""))
                 )
                 fnr_dict[fnr] = fund_name.copy()
+                result_cache(file, VERSION).set(file, fnr, fund_name)
 
             else:
                 print("memory")
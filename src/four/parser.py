@@ -3,13 +3,17 @@ import re
 import sys
 import os
 import warnings
-from PyPDF2 import PdfFileReader
 import pandas as pd
 import numpy as np
-import requests
 import camelot
 
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.pages import get_store
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import parsable
+
 warnings.filterwarnings("ignore")
 
 
@@ -157,23 +161,14 @@ def main():
     links_set.discard("annual_report_does_not_exists")
     os.chdir(os.path.join(currdir, os.path.normpath(pdf_out_path)))
 
-    if len(pdf_links_df.columns) == 2:
+    rows = None
+    if "-pipeline" in sys.argv and len(pdf_links_df.columns) == 2:
+        rows = download_rows(pdf_links_df, save="pdf_names.csv")
+    elif len(pdf_links_df.columns) == 2:
         links_set = set(pdf_links_df["pdf_url"])
         links_set.discard("nan")
         links_set.discard("annual_report_does_not_exists")
-        links_to_pdf_map = {}
-        num = 1
-        print("Downloading " + str(len(links_set)) + " files...")
-        for link in links_set:
-            if link in ["nan", "annual_report_does_not_exists"]:
-                continue
-            response = requests.get(link)
-            links_to_pdf_map[link] = "four" + str(num) + ".pdf"
-            with open("four" + str(num) + ".pdf", "wb") as f:
-                print("four" + str(num) + ".pdf")
-                f.write(response.content)
-            num += 1
-        del num
+        links_to_pdf_map = download_all(links_set)
         links_to_pdf_map[np.nan] = np.nan
         links_to_pdf_map["annual_report_does_not_exists"] = np.nan
         pdf_links_df["files"] = pdf_links_df["pdf_url"].apply(
@@ -182,17 +177,12 @@ def main():
         pdf_links_df.to_csv("pdf_names.csv", mode="w", index=False)
 
     fund_to_tables_cam = {}
-    for index, row in pdf_links_df.iterrows():
+    for index, row in rows or parsable(pdf_links_df).iterrows():
         read_file = row["files"]
         fund_name = row["name"]
-        pdf = PdfFileReader(read_file)
-        total_pages = pdf.getNumPages()
+        store = get_store(read_file)
         text1 = "Inventaire sur historique"
-        pages = [
-            i + 1
-            for i in range(1, total_pages)
-            if text1 in pdf.getPage(i).extractText().replace("\n", "")
-        ]
+        pages = store.find(text1, pages=range(1, len(store)))
         tables = camelot.read_pdf(
             read_file,
             pages=",".join(map(str, pages)),
@@ -7,15 +7,20 @@ import re
 import sys
 import os
 import warnings
-from PyPDF2 import PdfFileReader
 import pandas as pd
 import numpy as np
-import requests
-import tabula
 from pdfminer.pdfparser import PDFParser
 from pdfminer.pdfdocument import PDFDocument
 from pdfminer.pdfinterp import resolve1
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.documents import dedupe_files
+from common.pages import get_store
+from common.tables import read_pdf
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import parsable
+
 warnings.filterwarnings("ignore")
 
 with open("./src/mandarin/currencies.txt") as f:
@@ -32,12 +37,8 @@ def parse_type1(pdf, read_file, website, pdf_url):
     pdf_url-- PDF file link
     """
     text = "Inventaire des instruments financiers"
-    pages = [
-        i + 1
-        for i in range(pdf.getNumPages())
-        if text in pdf.getPage(i).extractText().replace("\n", "")
-    ]
-    tables = tabula.read_pdf(
+    pages = get_store(read_file, pdf).find(text)
+    tables = read_pdf(
         read_file,
         pages=pages,
         area=(145, 43, 830, 571),
@@ -72,26 +73,17 @@ def parse_type2(pdf, read_file, website, pdf_url):
     website-- fund_name_website
     pdf_url-- PDF file link
     """
-    pdf = PdfFileReader(read_file)
-    pdf._override_encryption = True
-    pdf._flatten()
+    store = get_store(read_file, pdf)
     text1 = website.upper()
     text2 = "Portefeuille-Titres au"
     file = open(read_file, "rb")
     parser = PDFParser(file)
     document = PDFDocument(parser)
     tot_pg = resolve1(document.catalog["Pages"])["Count"]
-    pages = [
-        i + 1
-        for i in range(tot_pg)
-        if text1 in pdf.getPage(i).extractText().replace("\n", "")
-        and text2 in pdf.getPage(i).extractText().replace("\n", "")
-    ]
+    pages = store.find(text1, text2, pages=range(tot_pg))
     pages.pop(0)
-    report = re.search(r"\n(.*)\n", pdf.getPage(pages[0]).extractText()).group(
-        1
-    )
-    tables = tabula.read_pdf(
+    report = re.search(r"\n(.*)\n", store[pages[0]]).group(1)
+    tables = read_pdf(
         read_file,
         pages=pages,
         columns=(76, 207, 222, 271, 299, 344, 476, 491, 539),
@@ -138,38 +130,30 @@ def main():
     links_set = set(pdf_links_df["pdf_url"])
     links_set.discard("annual_report_does_not_exists")
     os.chdir(os.path.join(currdir, os.path.normpath(pdf_out_path)))
-    if len(pdf_links_df.columns) == 2:
+    rows = None
+    if "-pipeline" in sys.argv and len(pdf_links_df.columns) == 2:
+        rows = download_rows(pdf_links_df, save="pdf_names.csv")
+    elif len(pdf_links_df.columns) == 2:
         links_set = set(pdf_links_df["pdf_url"])
         links_set.discard("nan")
         links_set.discard("annual_report_does_not_exists")
-        links_to_pdf_map = {}
-        num = 1
-        print("Downloading " + str(len(links_set)) + " files...")
-        for link in links_set:
-            if link in ["nan", "annual_report_does_not_exists"]:
-                continue
-            response = requests.get(link)
-            links_to_pdf_map[link] = "mandarin" + str(num) + ".pdf"
-            with open("mandarin" + str(num) + ".pdf", "wb") as f:
-                print("mandarin" + str(num) + ".pdf")
-                f.write(response.content)
-            num += 1
-        del num
+        links_to_pdf_map = download_all(links_set)
         links_to_pdf_map[np.nan] = np.nan
         links_to_pdf_map["annual_report_does_not_exists"] = np.nan
         pdf_links_df["files"] = pdf_links_df["pdf_url"].apply(
             lambda x: links_to_pdf_map[x]
         )
         pdf_links_df.to_csv("pdf_names.csv", mode="w", index=False)
+    if rows is None:
+        # copies of a report named in the input are read as one
+        pdf_links_df["files"] = dedupe_files(pdf_links_df["files"])
     tables = []
-    for idx, row in pdf_links_df.iterrows():
+    for idx, row in rows or parsable(pdf_links_df).iterrows():
         website = row["name"]
         read_file = row["files"]
         pdf_url = row["pdf_url"]
-        pdf = PdfFileReader(read_file)
-        pdf._override_encryption = True
-        pdf._flatten()
-        if website in pdf.getPage(0).extractText().replace("\n", ""):
+        pdf = get_store(read_file).pdf
+        if website in get_store(read_file).flat(0):
             print("parsing ", read_file, website)
             tables.append(parse_type1(pdf, read_file, website, pdf_url))
         else:
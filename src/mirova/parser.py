@@ -7,11 +7,16 @@ import re
 import sys
 import os
 import warnings
-from PyPDF2 import PdfFileReader
-import tabula
 import pandas as pd
 import numpy as np
-import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.pages import get_store
+from common.outline import outline_contents
+from common.tables import read_pdf
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import parsable
 
 warnings.filterwarnings("ignore")
 
@@ -29,10 +34,17 @@ def parse_type1(pdf, read_file, website, pdf_url, isin):
     pdf_url-- PDF file link
     isin-- ISIN
     """
-    if read_file in file_contents:
+    fund = website.lower()[: website.find("Fund") - 1].replace("&", " and ")
+    # the printed page p is searched from index p + 1 (page p + 2)
+    contents = outline_contents(
+        read_file, lambda x: fund in x.lower(), offset=2
+    )
+    if contents is not None:
+        contents["pg"] = contents["pg"].apply(str)
+    elif read_file in file_contents:
         contents = file_contents[read_file]
     else:
-        contents = tabula.read_pdf(
+        contents = read_pdf(
             read_file,
             pages=[2, 3],
             area=[0, 0, 828, 590],
@@ -47,12 +59,10 @@ def parse_type1(pdf, read_file, website, pdf_url, isin):
         contents = pd.concat(contents, ignore_index=True)
         contents = contents.dropna()
         contents = contents.reset_index(drop=True)
+        file_contents[read_file] = contents
     start, end = 0, 0
     for idx, r in contents.iterrows():
-        if (
-            website.lower()[: website.find("Fund") - 1].replace("&", " and ")
-            in r["fund"].lower()
-        ):
+        if fund in r["fund"].lower():
             start, end = (
                 int(r["pg"].split()[-1].strip()),
                 int(contents["pg"][idx + 1].split()[-1].strip()) - 1,
@@ -63,14 +73,11 @@ def parse_type1(pdf, read_file, website, pdf_url, isin):
         return pd.DataFrame(
             columns=["holding_name", "currency", "market_value", "net_assets"]
         )
-    pages = [
-        i + 1
-        for i in range(start + 1, end)
-        if "Securities portfolio as at"
-        in pdf.getPage(i).extractText().replace("\n", "")
-    ]
+    pages = get_store(read_file, pdf).find(
+        "Securities portfolio as at", pages=range(start + 1, end)
+    )
     print(pages)
-    tables = tabula.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=pages,
         area=[0, 0, 828, 590],
@@ -105,14 +112,9 @@ def parse_type2(pdf, read_file, website, pdf_url, isin):
     website-- fund_name_website
     pdf_url-- PDF file link
     """
-    pages = [
-        i + 1
-        for i in range(pdf.getNumPages())
-        if "Désignation des valeurs"
-        in pdf.getPage(i).extractText().replace("\n", "")
-    ]
+    pages = get_store(read_file, pdf).find("Désignation des valeurs")
     print(pages)
-    tables = tabula.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=pages,
         area=[0, 0, 828, 590],
@@ -158,23 +160,14 @@ def main():
     links_set = set(pdf_links_df["pdf_url"])
     links_set.discard("annual_report_does_not_exists")
     os.chdir(os.path.join(currdir, os.path.normpath(pdf_out_path)))
-    if len(pdf_links_df.columns) == 3:
+    rows = None
+    if "-pipeline" in sys.argv and len(pdf_links_df.columns) == 3:
+        rows = download_rows(pdf_links_df, save="pdf_names.csv")
+    elif len(pdf_links_df.columns) == 3:
         links_set = set(pdf_links_df["pdf_url"])
         links_set.discard("nan")
         links_set.discard("annual_report_does_not_exists")
-        links_to_pdf_map = {}
-        num = 1
-        print("Downloading " + str(len(links_set)) + " files...")
-        for link in links_set:
-            if link in ["nan", "annual_report_does_not_exists"]:
-                continue
-            response = requests.get(link)
-            links_to_pdf_map[link] = "mirova" + str(num) + ".pdf"
-            with open("mirova" + str(num) + ".pdf", "wb") as f:
-                print("mirova" + str(num) + ".pdf")
-                f.write(response.content)
-            num += 1
-        del num
+        links_to_pdf_map = download_all(links_set)
         links_to_pdf_map[np.nan] = np.nan
         links_to_pdf_map["annual_report_does_not_exists"] = np.nan
         pdf_links_df["files"] = pdf_links_df["pdf_url"].apply(
@@ -183,17 +176,15 @@ def main():
         pdf_links_df.to_csv("pdf_names.csv", mode="w", index=False)
 
     tables = []
-    for idx, row in pdf_links_df.iterrows():
+    for idx, row in rows or parsable(pdf_links_df).iterrows():
         website = row["name"]
         read_file = row["files"]
         pdf_url = row["pdf_url"]
         isin = row["isin"]
-        pdf = PdfFileReader(read_file)
-        pdf._override_encryption = True
-        pdf._flatten()
+        pdf = get_store(read_file).pdf
         if re.sub(
             r" ([A-Z] )?\([A-Z]\) .*$", "", website
-        ).upper() in pdf.getPage(0).extractText().replace("\n", ""):
+        ).upper() in get_store(read_file).flat(0):
             print("parsing ", read_file, website)
             tables.append(parse_type2(pdf, read_file, website, pdf_url, isin))
         else:
@@ -7,12 +7,16 @@ import re
 import sys
 import os
 import warnings
-from pdfminer.high_level import extract_text
-from PyPDF2 import PdfFileReader
-import tabula
 import pandas as pd
 import numpy as np
-import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.pages import get_miner_store, get_store
+from common.outline import outline_contents
+from common.tables import read_pdf
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import parsable
 
 warnings.filterwarnings("ignore")
 
@@ -21,7 +25,6 @@ with open("./src/oddo/currencies.txt") as f:
 currencies.append("UNITÉ")
 currencies.append("PART")
 file_contents = {}
-done1 = {}
 
 
 def parse_type1(pdf, read_file, website, pdf_url, isin):
@@ -35,10 +38,19 @@ def parse_type1(pdf, read_file, website, pdf_url, isin):
     isin -- unique name for fund name
     """
     start, end = 0, 0
-    if read_file in file_contents:
+    fund = (
+        " ".join(website.split()[:-1])
+        .replace("ODDO BHF ", "")
+        .replace("Sustainable ", "")
+    )
+    # the printed page p is searched from index p + 1 (page p + 2)
+    contents = outline_contents(read_file, lambda x: fund in x, offset=2)
+    if contents is not None:
+        contents["pg"] = contents["pg"].apply(str)
+    elif read_file in file_contents:
         contents = file_contents[read_file]
     else:
-        contents = tabula.read_pdf(
+        contents = read_pdf(
             read_file,
             pages=[2, 3],
             area=[0, 0, 828, 590],
@@ -55,12 +67,7 @@ def parse_type1(pdf, read_file, website, pdf_url, isin):
         contents = contents.reset_index(drop=True)
         file_contents[read_file] = contents
     for idx, r in contents.iterrows():
-        if (
-            " ".join(website.split()[:-1])
-            .replace("ODDO BHF ", "")
-            .replace("Sustainable ", "")
-            in r["fund"]
-        ):
+        if fund in r["fund"]:
             start, end = (
                 int(r["pg"].split()[-1].strip()),
                 int(contents["pg"][idx + 1].split()[-1].strip()) - 1,
@@ -69,36 +76,29 @@ def parse_type1(pdf, read_file, website, pdf_url, isin):
     if not (start and end):
         end = pdf.getNumPages()
     pages = tuple(
-        (
-            i + 1
-            for i in range(start + 1, end)
-            if "Etat des investissements au"
-            in pdf.getPage(i).extractText().replace("\n", "")
+        get_store(read_file, pdf).find(
+            "Etat des investissements au", pages=range(start + 1, end)
         )
     )
     print(pages)
-    if (read_file) in done1:
-        table = done1[read_file]
-    else:
-        tables = tabula.read_pdf(
-            read_file,
-            pages=pages,
-            area=[0, 0, 828, 590],
-            columns=[354, 376, 475, 533],
-            guess=False,
-            silent=True,
-        )
-        for i in range(len(tables)):
-            tables[i].columns = [
-                "holding_name",
-                "currency",
-                "_2",
-                "market_value",
-                "net_assets",
-            ]
-            tables[i] = tables[i].drop(columns=["_2"])
-        table = pd.concat(tables, ignore_index=True)
-        done1[read_file] = table
+    tables = read_pdf(
+        read_file,
+        pages=pages,
+        area=[0, 0, 828, 590],
+        columns=[354, 376, 475, 533],
+        guess=False,
+        silent=True,
+    )
+    for i in range(len(tables)):
+        tables[i].columns = [
+            "holding_name",
+            "currency",
+            "_2",
+            "market_value",
+            "net_assets",
+        ]
+        tables[i] = tables[i].drop(columns=["_2"])
+    table = pd.concat(tables, ignore_index=True)
     table = table[~table["net_assets"].isna()]
     table["fund_name_report"] = " ".join(website.split()[:-1])
     table["fund_name_website"] = website
@@ -149,19 +149,12 @@ def parse_type2(pdf, read_file, website, pdf_url, isin):
     """
     text1 = website[: website.find("(") - 1].replace("Exklusiv: ", "")
     text2 = "Répartition du portefeuille-titres au"
-    pages = tuple(
-        (
-            i + 1
-            for i in range(pdf.getNumPages())
-            if text1 in pdf.getPage(i).extractText().replace("\n", "")
-            and text2 in pdf.getPage(i).extractText().replace("\n", "")
-        )
-    )
+    pages = tuple(get_store(read_file, pdf).find(text1, text2))
     print(pages)
     if (pages, read_file) in done2:
         table = done2[(pages, read_file)]
     else:
-        tables = tabula.read_pdf(
+        tables = read_pdf(
             read_file,
             pages=pages,
             area=[0, 0, 828, 590],
@@ -223,20 +216,17 @@ def parse_type3(pdf, read_file, website, pdf_url, isin):
         table = done3[read_file]
         print()
     else:
+        store = get_miner_store(read_file)
         for i in range(pdf.getNumPages(), 0, -1):
-            if "Désignation des valeurs" in extract_text(
-                read_file, page_numbers=[i]
-            ).replace("\n", ""):
+            if "Désignation des valeurs" in store.flat(i):
                 k = i
-                while "Désignation des valeurs" in extract_text(
-                    read_file, page_numbers=[k]
-                ).replace("\n", ""):
+                while "Désignation des valeurs" in store.flat(k):
                     pages.append(k + 1)
                     k -= 1
                 break
         pages = tuple(sorted(pages))
         print(pages)
-        tables = tabula.read_pdf(
+        tables = read_pdf(
             read_file,
             pages=pages,
             area=[0, 0, 828, 590],
@@ -302,10 +292,15 @@ def parse_type4(pdf, read_file, website, pdf_url, isin):
         table = done4[read_file]
         print()
     else:
-        if read_file in file_contents:
+        contents = outline_contents(
+            read_file, lambda x: "État du patrimoine" in x
+        )
+        if contents is not None:
+            contents["pg"] = contents["pg"].apply(str)
+        elif read_file in file_contents:
             contents = file_contents[read_file]
         else:
-            contents = tabula.read_pdf(
+            contents = read_pdf(
                 read_file,
                 pages=[2, 3],
                 area=[0, 0, 828, 590],
@@ -329,7 +324,7 @@ def parse_type4(pdf, read_file, website, pdf_url, isin):
         pages = list(range(start, end))
         print(pages)
 
-        tables = tabula.read_pdf(
+        tables = read_pdf(
             read_file,
             pages=pages,
             area=[0, 0, 828, 590],
@@ -380,23 +375,14 @@ def main():
     links_set.discard("annual_report_does_not_exists")
     os.chdir(os.path.join(currdir, os.path.normpath(pdf_out_path)))
 
-    if len(pdf_links_df.columns) == 3:
+    rows = None
+    if "-pipeline" in sys.argv and len(pdf_links_df.columns) == 3:
+        rows = download_rows(pdf_links_df, save="pdf_names.csv")
+    elif len(pdf_links_df.columns) == 3:
         links_set = set(pdf_links_df["pdf_url"])
         links_set.discard("nan")
         links_set.discard("annual_report_does_not_exists")
-        links_to_pdf_map = {}
-        num = 1
-        print("Downloading " + str(len(links_set)) + " files...")
-        for link in links_set:
-            if link in ["nan", "annual_report_does_not_exists"]:
-                continue
-            response = requests.get(link)
-            links_to_pdf_map[link] = "oddo" + str(num) + ".pdf"
-            with open("oddo" + str(num) + ".pdf", "wb") as f:
-                print("oddo" + str(num) + ".pdf")
-                f.write(response.content)
-            num += 1
-        del num
+        links_to_pdf_map = download_all(links_set)
         links_to_pdf_map[np.nan] = np.nan
         links_to_pdf_map["annual_report_does_not_exists"] = np.nan
         pdf_links_df["files"] = pdf_links_df["pdf_url"].apply(
@@ -409,7 +395,7 @@ def main():
     _type = None
     tables = []
     done = {}
-    for idx, row in pdf_links_df.iterrows():
+    for idx, row in rows or parsable(pdf_links_df).iterrows():
         website = row["name"]
         read_file = row["files"]
         if str(read_file) == "nan":
@@ -420,11 +406,11 @@ def main():
             pdf = done[read_file]
         else:
             try:
-                pdf = PdfFileReader(read_file)
+                pdf = get_store(read_file).pdf
                 done[read_file] = pdf
             except:
                 continue
-        page0 = pdf.getPage(0).extractText().replace("\n","")
+        page0 = get_store(read_file, pdf).flat(0)
         if "SICAV ODDO BHF" in page0:
             _type = 1
         elif "Rapport annuel révisé" in page0:
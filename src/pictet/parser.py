@@ -6,11 +6,16 @@ containing parsed results.
 import os
 import sys
 import warnings
-from pdfminer.high_level import extract_text
-import tabula
 import pandas as pd
 import numpy as np
-import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.pages import get_miner_store
+from common.tables import read_pdf
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import parsable
+from common.cache import parser_version, result_cache
 
 warnings.filterwarnings("ignore")
 
@@ -18,10 +23,11 @@ with open("./src/pictet/currencies.txt") as f:
     currencies = f.readline().split()
 currencies.append("UNITÉ")
 currencies.append("CNH")
+# funds parsed by this version of the parser are kept between runs
+VERSION = parser_version(__file__)
 
 
 file_contents = {}
-done = {}
 
 
 def parse(read_file, website, isin, pdf_url):
@@ -36,13 +42,10 @@ def parse(read_file, website, isin, pdf_url):
     if read_file in file_contents:
         contents = file_contents[read_file]
     else:
-        cont_pgs = [
-            i + 1
-            for i in range(16)
-            if "Table des matières"
-            in extract_text(read_file, page_numbers=[i]).replace("\n", "")
-        ]
-        contents = tabula.read_pdf(
+        cont_pgs = get_miner_store(read_file).find(
+            "Table des matières", pages=range(16)
+        )
+        contents = read_pdf(
             read_file,
             pages=cont_pgs,
             area=[0, 0, 828, 590],
@@ -67,50 +70,46 @@ def parse(read_file, website, isin, pdf_url):
         return []
     pages = tuple(range(start, end + 1))
     print(pages)
-    if (read_file, pages) in done:
-        table = done[(read_file, pages)]
-    else:
-        tables = tabula.read_pdf(
-            read_file,
-            pages=pages,
-            area=[0, 0, 828, 590],
-            columns=[280, 303, 414, 505],
-            silent=True,
-            guess=False,
-        )
-        for i in range(len(tables)):
-            tables[i].columns = [
-                "holding_name",
-                "currency",
-                "_1",
-                "market_value",
-                "net_assets",
-            ]
-            tables[i].drop(columns=["_1"], inplace=True)
-        table = pd.concat(tables, ignore_index=True)
-        table["holding_name"] = table["holding_name"].apply(
-            lambda x: str(x).strip()
-        )
-        to_keep = [
-            "Avoirs en banque",
-            "Dépôts bancaires",
-            "Autres actifs nets",
-        ]
-        table = table[
-            ~table["net_assets"].isna()
-            & (
-                table["currency"].isin(currencies)
-                | table["holding_name"].isin(to_keep)
-            )
+    tables = read_pdf(
+        read_file,
+        pages=pages,
+        area=[0, 0, 828, 590],
+        columns=[280, 303, 414, 505],
+        silent=True,
+        guess=False,
+    )
+    for i in range(len(tables)):
+        tables[i].columns = [
+            "holding_name",
+            "currency",
+            "_1",
+            "market_value",
+            "net_assets",
         ]
-        table["market_value"] = table["market_value"].apply(
-            lambda x: float(x.replace(",", ""))
+        tables[i].drop(columns=["_1"], inplace=True)
+    table = pd.concat(tables, ignore_index=True)
+    table["holding_name"] = table["holding_name"].apply(
+        lambda x: str(x).strip()
+    )
+    to_keep = [
+        "Avoirs en banque",
+        "Dépôts bancaires",
+        "Autres actifs nets",
+    ]
+    table = table[
+        ~table["net_assets"].isna()
+        & (
+            table["currency"].isin(currencies)
+            | table["holding_name"].isin(to_keep)
         )
-        table["net_assets"] = table["net_assets"].apply(lambda x: float(x))
-        table["pdf_url"] = pdf_url
-        table["fund_name_report"] = website.split("-")[1].strip()
-        table.reset_index(drop=True, inplace=True)
-        done[(read_file, pages)] = table
+    ]
+    table["market_value"] = table["market_value"].apply(
+        lambda x: float(x.replace(",", ""))
+    )
+    table["net_assets"] = table["net_assets"].apply(lambda x: float(x))
+    table["pdf_url"] = pdf_url
+    table["fund_name_report"] = website.split("-")[1].strip()
+    table.reset_index(drop=True, inplace=True)
     table["fund_name_website"] = website
     table["isin"] = isin
     return table.reset_index(drop=True)
@@ -132,23 +131,14 @@ def main():
     links_set = set(pdf_links_df["pdf_url"])
     links_set.discard("annual_report_does_not_exists")
     os.chdir(os.path.join(currdir, os.path.normpath(pdf_out_path)))
-    if len(pdf_links_df.columns) == 3:
+    rows = None
+    if "-pipeline" in sys.argv and len(pdf_links_df.columns) == 3:
+        rows = download_rows(pdf_links_df, save="pdf_names.csv")
+    elif len(pdf_links_df.columns) == 3:
         links_set = set(pdf_links_df["pdf_url"])
         links_set.discard("nan")
         links_set.discard("annual_report_does_not_exists")
-        links_to_pdf_map = {}
-        num = 1
-        print("Downloading " + str(len(links_set)) + " files...")
-        for link in links_set:
-            if link in ["nan", "annual_report_does_not_exists"]:
-                continue
-            response = requests.get(link)
-            links_to_pdf_map[link] = "pictet" + str(num) + ".pdf"
-            with open("pictet" + str(num) + ".pdf", "wb") as f:
-                print("pictet" + str(num) + ".pdf")
-                f.write(response.content)
-            num += 1
-        del num
+        links_to_pdf_map = download_all(links_set)
         links_to_pdf_map[np.nan] = np.nan
         links_to_pdf_map["annual_report_does_not_exists"] = np.nan
         pdf_links_df["files"] = pdf_links_df["pdf_url"].apply(
@@ -157,13 +147,21 @@ def main():
         pdf_links_df.to_csv("pdf_names.csv", mode="w", index=False)
     tables = []
     not_found = []
-    for idx, row in pdf_links_df.iterrows():
+    for idx, row in rows or parsable(pdf_links_df).iterrows():
         website = row["name"]
         pdf_url = row["pdf_url"]
         isin = row["isin"]
         read_file = row["files"]
         print("parsing", read_file, " ", website, end=" ")
-        table = parse(read_file, website, isin, pdf_url)
+        results = result_cache(read_file, VERSION)
+        table = results.get(read_file, (website, isin))
+        if table is None:
+            table = parse(read_file, website, isin, pdf_url)
+            if len(table) > 0:
+                results.set(read_file, (website, isin), table)
+        else:
+            print("cache")
+            table["pdf_url"] = pdf_url
         if len(table) == 0:
             not_found.append((read_file, website))
         else:
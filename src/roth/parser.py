@@ -8,17 +8,19 @@ import sys
 import os
 import warnings
 import PyPDF2
-from PyPDF2 import PdfFileReader
-import tabula
 import pandas as pd
 import numpy as np
-from selenium import webdriver
-import shutil
-from webdriver_manager.chrome import ChromeDriverManager
 from pdfminer.pdfparser import PDFParser
 from pdfminer.pdfdocument import PDFDocument
 from pdfminer.pdfinterp import resolve1
-import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import common.download
+from common.pages import get_store
+from common.pipeline import download_rows
+from common.schedule import parsable
+from common.outline import outline_contents
+from common.tables import read_pdf
 
 warnings.filterwarnings("ignore")
 
@@ -93,7 +95,7 @@ def clean1(table, report, website, pdf_url, isin):
 
 def parse_contents(read_file, pages_=[1, 2, 3, 4]):
     """Parse contents page of the file."""
-    contents = tabula.read_pdf(
+    contents = read_pdf(
         read_file,
         pages=pages_,
         area=[0, 0, 828, 590],
@@ -105,6 +107,27 @@ def parse_contents(read_file, pages_=[1, 2, 3, 4]):
     for i in range(len(contents)):
         contents[i].columns = ["fund", "pg"]
     contents = pd.concat(contents, ignore_index=True)
+    return clean_contents(contents)
+
+
+def parse_outline(read_file, *titles):
+    """Parse the outline of the file, None unless it lists all titles.
+
+    The printed page p is searched from index p (page p + 1).
+    """
+    contents = outline_contents(read_file, offset=1)
+    if contents is None:
+        return None
+    contents = clean_contents(contents)
+    for title in titles:
+        title = title.lower()
+        if not any(title in x.replace("  ", " ") for x in contents["fund"]):
+            return None
+    return contents
+
+
+def clean_contents(contents):
+    """Clean the titles and page numbers of a contents table."""
     contents = contents.dropna()
 
     def clean(x):
@@ -155,7 +178,7 @@ def find_pages1(read_file, website, contents, pdf, report):
     text = "ValeurnominaleDnominationValeurd'acqui"
 
     def func1(i, pdf):
-        return pdf.getPage(i).extractText().replace("\n", "")
+        return get_store(read_file, pdf).flat(i)
 
     if "visionfund" in website.lower():
         pages = find_visionfund_pgs(func1, pdf, report, end)
@@ -174,6 +197,7 @@ def parse_type1(pdf, read_file, website, pdf_url, isin):
     website -- fund name website
     pdf_url -- PDF link
     """
+    report = re.sub("EdR Fund|VisionFund -", "", website).strip()
     if read_file in file_contents:
         contents = file_contents[read_file]
     else:
@@ -181,19 +205,20 @@ def parse_type1(pdf, read_file, website, pdf_url, isin):
             i + 1
             for i in [2, 3, 4]
             if "TABLE DES MATIERES"
-            in pdf.getPage(i).extractText().replace("\n", "")
+            in get_store(read_file, pdf).flat(i)
         ]
         if not cont_pg:
             return parse_type2(pdf, read_file, website, pdf_url, isin)
 
-        contents = parse_contents(read_file, cont_pg)
-        file_contents[read_file] = contents
-    report = re.sub("EdR Fund|VisionFund -", "", website).strip()
+        contents = parse_outline(read_file, report)
+        if contents is None:
+            contents = parse_contents(read_file, cont_pg)
+            file_contents[read_file] = contents
     pages = find_pages1(read_file, website, contents, pdf, report)
     if not pages:
         return []
     print(pages)
-    tables = tabula.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=pages,
         area=[0, 0, 828, 590],
@@ -251,7 +276,7 @@ def find_pages2(read_file, website, contents, pdf, report):
             text = "ValuepersecurityMarketvalue"
 
             def func1(i, pdf):
-                return pdf.getPage(i).extractText().replace("\n", "")
+                return get_store(read_file, pdf).flat(i)
 
             pages = [i + 1 for i in range(start, end) if text in func1(i, pdf)]
             break
@@ -263,7 +288,7 @@ def find_pages2(read_file, website, contents, pdf, report):
         text = "ValuepersecurityMarketvalue"
 
         def func1(i, pdf):
-            return pdf.getPage(i).extractText().replace("\n", "")
+            return get_store(read_file, pdf).flat(i)
 
         pages = [
             i + 1
@@ -288,6 +313,7 @@ def parse_type2(pdf, read_file, website, pdf_url, isin):
     pdf_url -- PDF link
     """
     _website = website.replace("  ", " ")
+    report = re.sub("EdR Fund|EdR Prifund |Alpha ", "", _website).strip()
     if read_file in file_contents:
         contents = file_contents[read_file]
     else:
@@ -295,21 +321,22 @@ def parse_type2(pdf, read_file, website, pdf_url, isin):
             i + 1
             for i in [2, 3, 4]
             if "TABLE OF CONTENTS"
-            in pdf.getPage(i).extractText().replace("\n", "")
+            in get_store(read_file, pdf).flat(i)
         ]
         if not cont_pg:
             print("no contents")
             return []
-        contents = parse_contents(read_file, cont_pg)
-        contents = contents.reset_index(drop=True)
-        file_contents[read_file] = contents
-    report = re.sub("EdR Fund|EdR Prifund |Alpha ", "", _website).strip()
+        contents = parse_outline(read_file, report)
+        if contents is None:
+            contents = parse_contents(read_file, cont_pg)
+            contents = contents.reset_index(drop=True)
+            file_contents[read_file] = contents
     pages = find_pages2(read_file, website, contents, pdf, report)
     if not pages:
         return []
     print(pages)
     if "Prifund" in website:
-        tables = tabula.read_pdf(
+        tables = read_pdf(
             read_file,
             pages=pages,
             area=[0, 0, 828, 590],
@@ -329,7 +356,7 @@ def parse_type2(pdf, read_file, website, pdf_url, isin):
             ]
             tables[i] = tables[i].drop(columns=["_1", "_2"])
     else:
-        tables = tabula.read_pdf(
+        tables = read_pdf(
             read_file,
             pages=pages,
             area=[0, 0, 828, 590],
@@ -402,12 +429,18 @@ def parse_type3(pdf, read_file, website, pdf_url, isin, recurse_flag):
     recurse_flag -- bool (False in first call,
     True in second call)
     """
+    report = website.split("-")[-1].strip()
     if read_file in file_contents:
         contents = file_contents[read_file]
     else:
-        contents = post_process_contents(parse_contents(read_file))
-        file_contents[read_file] = contents
-    report = website.split("-")[-1].strip()
+        contents = parse_outline(
+            read_file, report, "COMPTES ANNUELS CONSOLIDES AU"
+        )
+        if contents is not None:
+            contents = post_process_contents(contents)
+        else:
+            contents = post_process_contents(parse_contents(read_file))
+            file_contents[read_file] = contents
     start, end = 0, 0
     for idx, r in contents.iterrows():
         if report.lower() in r["fund"].lower():
@@ -427,12 +460,12 @@ def parse_type3(pdf, read_file, website, pdf_url, isin, recurse_flag):
     website = website.replace("Europe", "Euro") if recurse_flag else website
 
     def func1(i, pdf):
-        return pdf.getPage(i).extractText().replace("\n", "")
+        return get_store(read_file, pdf).flat(i)
 
     pages = [i + 1 for i in range(start, end) if text in func1(i, pdf)]
     pages = tuple(pages)
     print(pages)
-    tables = tabula.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=pages,
         area=[0, 0, 828, 590],
@@ -467,14 +500,14 @@ def parse_type4(pdf, read_file, website, pdf_url, isin):
     text = "Désignation des valeurs"
 
     def func1(i, pdf):
-        return pdf.getPage(i).extractText().replace("\n", "")
+        return get_store(read_file, pdf).flat(i)
 
     pages = [
         i + 1 for i in range(15, pdf.getNumPages()) if text in func1(i, pdf)
     ]
     pages = tuple(pages)
     print(pages)
-    tables = tabula.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=pages,
         area=[0, 0, 828, 590],
@@ -504,63 +537,17 @@ def parse_type4(pdf, read_file, website, pdf_url, isin):
     return clean3(table, report, website, pdf_url, isin)
 
 
-def wait(path):
-    """Wait untill there are no partially downloaded files."""
-    while True:
-        time.sleep(1)
-        if not any(
-            ".pdf.crdownload" in x
-            for x in [path + "\\" + f for f in os.listdir(path)]
-        ):
-            break
-
-
-def download_all(path, pdf_links_df):
+def download_all(pdf_links_df):
     """Download all files in input CSV.
 
     Keyword Arguments:
-    path -- current working directory
     pdf_links_df -- input CSV
     """
-    links = set(pdf_links_df["pdf_url"])
-    links.discard("annual_report_does_not_exists")
-    links_to_pdf_map = {}
-    options = webdriver.ChromeOptions()
-    options.add_experimental_option(
-        "prefs",
-        {
-            "download.default_directory": path,
-            "download.prompt_for_download": False,
-            "download.directory_upgrade": True,
-            "plugins.always_open_pdf_externally": True,
-        },
-    )
-    options.add_argument("--headless")
-    driver = webdriver.Chrome(
-        ChromeDriverManager().install(), chrome_options=options
-    )
-    num = 1
-    print("Downloading " + str(len(links)) + " files...")
-    links = sorted(list(links))
-    for link in links:
-        if link in ["annual_report_does_not_exists"]:
-            continue
-        driver.get(link)
-        wait(path)
-        print(str(num), "file downloaded")
-        num += 1
-    wait(path)
-    files = sorted(
-        [path + "/" + f for f in os.listdir(path)], key=os.path.getctime
+    links_to_pdf_map = common.download.download_all(
+        pdf_links_df["pdf_url"], browser=True
     )
-    files = [x for x in files if ".pdf" in x]
-    for i in range(len(links)):
-        _ = shutil.move(files[i], "roth" + str(i + 1) + ".pdf")
-        links_to_pdf_map[links[i]] = "roth" + str(i + 1) + ".pdf"
-    links_to_pdf_map[np.nan] = np.nan
-    links_to_pdf_map["annual_report_does_not_exists"] = np.nan
     pdf_links_df["files"] = pdf_links_df["pdf_url"].apply(
-        lambda x: links_to_pdf_map[x]
+        lambda x: links_to_pdf_map.get(x, np.nan)
     )
     pdf_links_df.sort_values("files").reset_index(drop=True).to_csv(
         "pdf_names.csv", index=False
@@ -582,13 +569,16 @@ def main():
         os.path.join(currdir, os.path.normpath(in_path))
     )
     os.chdir(os.path.join(currdir, os.path.normpath(pdf_out_path)))
-    if "files" not in pdf_links_df.columns:
-        path = os.getcwd()
-        pdf_links_df = download_all(path, pdf_links_df)
+    rows = None
+    if "-pipeline" in sys.argv and "files" not in pdf_links_df.columns:
+        rows = download_rows(pdf_links_df, save="pdf_names.csv", browser=True)
+    elif "files" not in pdf_links_df.columns:
+        pdf_links_df = download_all(pdf_links_df)
 
     tables = []
-    for idx, row in (
-        pdf_links_df.sort_values("name").reset_index(drop=True).iterrows()
+    for idx, row in rows or (
+        parsable(pdf_links_df.sort_values("name").reset_index(drop=True))
+        .iterrows()
     ):
         website = row["name"]
         read_file = row["files"]
@@ -596,9 +586,7 @@ def main():
         isin = row["isin"]
         if str(read_file) == "nan":
             continue
-        pdf = PdfFileReader(read_file)
-        pdf._override_encryption = True
-        pdf._flatten()
+        pdf = get_store(read_file).pdf
         text = "parsing "
         if (
             "edr fund" in website.lower()
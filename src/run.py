@@ -0,0 +1,235 @@
+"""Run the parsers of several providers at once on a pool of processes.
+
+Takes the input files of the providers from a folder (input_files by
+default, <provider>.csv, <provider>_input.csv or <provider>_.csv), and for
+each provider:
+- downloads its reports into <pdf folder>/<provider> through the shared
+  report registry, and writes the file names next to them as the parser
+  does (pdf_names.csv), adding them to its input;
+- maps the rows of reports of the same content, downloaded or named
+  twice, to one file (see common/documents.py);
+- splits its input into chunks of whole documents, every row of a report
+  in the same chunk, and runs src/<provider>/parser.py on every chunk in
+  its own process, the chunks of all providers sharing WORKERS processes
+  at a time, largest first;
+- concatenates the outputs of its chunks, in the order of the input, into
+  <output folder>/<provider>_results.csv, the CSV the parser writes.
+The parsers find the names of the reports in their input and do not
+download anything. The output of the processes is kept in
+<output folder>/logs.
+
+Arguments:
+    -providers all, or the providers to run separated by commas
+    -workers number of processes at a time (number of CPUs by default)
+    -i input folder, -o output folder, -p PDF folder
+Any other argument (e.g. -w) is passed on to the parsers.
+
+Run from the root of the repository:
+    python src/run.py -providers all -workers 4 -i input_files -o res -p pdf
+
+Module functions:
+    providers(): --> list of str
+    input_file(folder, provider): --> str or None
+    chunks(df, count, column="files"): --> list of pd.DataFrame
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from common.documents import dedupe_files
+from common.download import download_all
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(SRC)
+# processes at a time
+WORKERS = os.cpu_count() or 1
+# column of the report names, and file they are written to, when they
+# are not "files" and pdf_names.csv
+FILES_COLUMN = {"dpam": "file_names"}
+NAMES_FILE = {
+    "aviva": "aviva_pdf_names.csv",
+    "capitalatwork": "capitalatwork_pdf_names.csv",
+}
+
+
+def providers():
+    """Return the providers which have a parser, in alphabetical order."""
+    return sorted(
+        x
+        for x in os.listdir(SRC)
+        if os.path.isfile(os.path.join(SRC, x, "parser.py"))
+    )
+
+
+def input_file(folder, provider):
+    """Return the input file of provider in folder, None if it has none."""
+    for name in (provider, provider + "_input", provider + "_"):
+        path = os.path.join(folder, name + ".csv")
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def chunks(df, count, column="files"):
+    """Split df into at most count chunks of whole documents.
+
+    The rows of the same report file go to the same chunk; chunks are runs
+    of documents in the order of their first row, of about the same number
+    of rows.
+
+    Keyword Arguments:
+    df -- input pd.DataFrame
+    count -- number of chunks wanted
+    column -- column of the file names of the reports
+    """
+    groups = {}
+    for index, read_file in df[column].astype(str).items():
+        groups.setdefault(read_file, []).append(index)
+    groups = list(groups.values())
+    count = max(1, min(count, len(groups)))
+    size = len(df) / count
+    result, rows = [[]], 0
+    for group in groups:
+        if rows >= size * len(result) and len(result) < count:
+            result.append([])
+        result[-1].extend(group)
+        rows += len(group)
+    return [df.loc[x] for x in result if x]
+
+
+def download(provider, df, pdf_folder):
+    """Download the reports of df and add their names to it."""
+    column = FILES_COLUMN.get(provider, "files")
+    if column in df.columns:
+        return df
+    os.makedirs(pdf_folder, exist_ok=True)
+    links_to_pdf_map = download_all(df["pdf_url"], pdf_folder)
+    df[column] = df["pdf_url"].apply(lambda x: links_to_pdf_map.get(x, np.nan))
+    df.to_csv(
+        os.path.join(pdf_folder, NAMES_FILE.get(provider, "pdf_names.csv")),
+        index=False,
+    )
+    return df
+
+
+def run_chunk(provider, in_path, out_path, pdf_folder, log_path, args):
+    """Run the parser of provider on a chunk; return its exit status."""
+    command = [
+        sys.executable,
+        os.path.join(SRC, provider, "parser.py"),
+        "-i",
+        in_path,
+        "-o",
+        out_path,
+        "-p",
+        pdf_folder,
+    ] + args
+    with open(log_path, "w", encoding="utf-8") as log:
+        return subprocess.call(
+            command, cwd=ROOT, stdout=log, stderr=subprocess.STDOUT
+        )
+
+
+def main():
+    """Parse arguments, run the providers and print a summary."""
+    args = sys.argv[1:]
+    options = {
+        "-providers": "all",
+        "-workers": str(WORKERS),
+        "-i": "input_files",
+        "-o": "res",
+        "-p": "pdf",
+    }
+    for name in options:
+        if name in args:
+            options[name] = args.pop(args.index(name) + 1)
+            args.remove(name)
+    workers = int(options["-workers"])
+    in_folder, out_folder, pdf_root = (
+        os.path.abspath(options[x]) for x in ("-i", "-o", "-p")
+    )
+    names = providers()
+    if options["-providers"] != "all":
+        names = options["-providers"].split(",")
+    log_folder = os.path.join(out_folder, "logs")
+    os.makedirs(log_folder, exist_ok=True)
+    tmp = tempfile.mkdtemp()
+    start = time.perf_counter()
+    jobs, outputs = [], {}
+    for provider in names:
+        in_path = input_file(in_folder, provider)
+        if in_path is None:
+            print("%s: no input file in %s, skipped" % (provider, in_folder))
+            continue
+        pdf_folder = os.path.join(pdf_root, provider)
+        df = download(provider, pd.read_csv(in_path), pdf_folder)
+        column = FILES_COLUMN.get(provider, "files")
+        df[column] = dedupe_files(df[column], pdf_folder)
+        outputs[provider] = []
+        for i, chunk in enumerate(chunks(df, workers, column)):
+            name = "%s.%d" % (provider, i)
+            chunk_in = os.path.join(tmp, name + ".csv")
+            chunk_out = os.path.join(tmp, name + "_results.csv")
+            chunk.to_csv(chunk_in, index=False)
+            outputs[provider].append(chunk_out)
+            jobs.append(
+                (
+                    len(chunk),
+                    provider,
+                    chunk_in,
+                    chunk_out,
+                    pdf_folder,
+                    os.path.join(log_folder, name + ".log"),
+                )
+            )
+    print(
+        "Parsing %d chunks of %d providers on %d processes..."
+        % (len(jobs), len(outputs), workers)
+    )
+    # largest chunks first, so that the last ones to finish are short
+    jobs.sort(key=lambda x: -x[0])
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        status = dict(
+            zip(
+                [x[3] for x in jobs],
+                pool.map(lambda x: run_chunk(*x[1:], args), jobs),
+            )
+        )
+    for provider, paths in outputs.items():
+        failed = [x for x in paths if status[x] or not os.path.isfile(x)]
+        results = [pd.read_csv(x) for x in paths if x not in failed]
+        out_path = os.path.join(out_folder, provider + "_results.csv")
+        if results:
+            result = pd.concat(results, ignore_index=True)
+            result.to_csv(out_path, index=False, encoding="utf-8")
+        print(
+            "%s: %d rows from %d of %d chunks%s"
+            % (
+                provider,
+                sum(len(x) for x in results),
+                len(results),
+                len(paths),
+                (
+                    ", failed: "
+                    + ", ".join(
+                        os.path.basename(x)[: -len("_results.csv")] + ".log"
+                        for x in failed
+                    )
+                    if failed
+                    else ""
+                ),
+            )
+        )
+    for name in os.listdir(tmp):
+        os.remove(os.path.join(tmp, name))
+    os.rmdir(tmp)
+    print("Time elapsed: %.1f s" % (time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
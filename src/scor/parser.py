@@ -7,11 +7,15 @@ import re
 import sys
 import os
 import warnings
-from PyPDF2 import PdfFileReader
-import tabula
 import pandas as pd
 import numpy as np
-import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.pages import get_store
+from common.tables import read_pdf
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import parsable
 
 warnings.filterwarnings("ignore")
 
@@ -28,15 +32,11 @@ def parse_type1(pdf, read_file, website, pdf_url):
     website-- fund_name_website
     pdf_url-- PDF file link
     """
-    pages = [
-        i + 1
-        for i in range(pdf.getNumPages())
-        if "NameQuantity/NominalMarket"
-        in pdf.getPage(i).extractText().replace("\n", "")
-        and website.upper() in pdf.getPage(i).extractText().replace("\n", "")
-    ]
+    pages = get_store(read_file, pdf).find(
+        "NameQuantity/NominalMarket", website.upper()
+    )
     print(pages)
-    tables = tabula.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=pages,
         area=[0, 0, 828, 590],
@@ -71,25 +71,21 @@ def parse_type2(pdf, read_file, website, pdf_url):
     website-- fund_name_website
     pdf_url-- PDF file link
     """
+    store = get_store(read_file, pdf)
+    header = (
+        "Designation of securities Currency Qty, number or nominal Market value"
+    )
     pages = []
-    for i in range(pdf.getNumPages() - 1, 0, -1):
+    for i in range(len(store) - 1, 0, -1):
         k = i
-        if "Designation of securities Currency Qty, number or nominal Market value" in pdf.getPage(
-            k
-        ).extractText().replace(
-            "\n", ""
-        ):
-            while "Designation of securities Currency Qty, number or nominal Market value" in pdf.getPage(
-                k
-            ).extractText().replace(
-                "\n", ""
-            ):
+        if header in store.flat(k):
+            while header in store.flat(k):
                 pages.append(k + 1)
                 k -= 1
             break
     pages = sorted(pages)
     print(pages)
-    tables = tabula.read_pdf(
+    tables = read_pdf(
         read_file,
         pages=pages,
         area=[0, 0, 828, 590],
@@ -108,7 +104,7 @@ def parse_type2(pdf, read_file, website, pdf_url):
         tables[i].drop(columns=["_1"], inplace=True)
     table = pd.concat(tables, ignore_index=True)
     table = table[~table["net_assets"].isna()]
-    text = PdfFileReader(read_file).getPage(0).extractText().replace("\n", "")
+    text = store.flat(0)
     table["fund_name_report"] = (
         re.search(r"Annual report (.*) \d", text).group(1).strip()
     )
@@ -133,23 +129,14 @@ def main():
     links_set = set(pdf_links_df["pdf_url"])
     links_set.discard("annual_report_does_not_exists")
     os.chdir(os.path.join(currdir, os.path.normpath(pdf_out_path)))
-    if len(pdf_links_df.columns) == 2:
+    rows = None
+    if "-pipeline" in sys.argv and len(pdf_links_df.columns) == 2:
+        rows = download_rows(pdf_links_df, save="pdf_names.csv")
+    elif len(pdf_links_df.columns) == 2:
         links_set = set(pdf_links_df["pdf_url"])
         links_set.discard("nan")
         links_set.discard("annual_report_does_not_exists")
-        links_to_pdf_map = {}
-        num = 1
-        print("Downloading " + str(len(links_set)) + " files...")
-        for link in links_set:
-            if link in ["nan", "annual_report_does_not_exists"]:
-                continue
-            response = requests.get(link)
-            links_to_pdf_map[link] = "scor" + str(num) + ".pdf"
-            with open("scor" + str(num) + ".pdf", "wb") as f:
-                print("scor" + str(num) + ".pdf")
-                f.write(response.content)
-            num += 1
-        del num
+        links_to_pdf_map = download_all(links_set)
         links_to_pdf_map[np.nan] = np.nan
         links_to_pdf_map["annual_report_does_not_exists"] = np.nan
         pdf_links_df["files"] = pdf_links_df["pdf_url"].apply(
@@ -158,14 +145,12 @@ def main():
         pdf_links_df.to_csv("pdf_names.csv", mode="w", index=False)
 
     tables = []
-    for idx, row in pdf_links_df.iterrows():
+    for idx, row in rows or parsable(pdf_links_df).iterrows():
         website = row["name"]
         read_file = row["files"]
         pdf_url = row["pdf_url"]
-        pdf = PdfFileReader(read_file)
-        pdf._override_encryption = True
-        pdf._flatten()
-        if "SCOR FUNDS" in pdf.getPage(0).extractText().replace("\n", ""):
+        pdf = get_store(read_file).pdf
+        if "SCOR FUNDS" in get_store(read_file).flat(0):
             print("parsing ", read_file, website)
             tables.append(parse_type1(pdf, read_file, website, pdf_url))
         else:
@@ -7,10 +7,14 @@ import re
 import sys
 import os
 import warnings
-import tabula
 import pandas as pd
 import numpy as np
-import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.tables import read_pdf
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import parsable
 
 warnings.filterwarnings("ignore")
 
@@ -34,25 +38,14 @@ def main():
     links_set = set(pdf_links_df["pdf_url"])
     links_set.discard("annual_report_does_not_exists")
     os.chdir(os.path.join(currdir, os.path.normpath(pdf_out_path)))
-    if len(pdf_links_df.columns) == 3:
+    rows = None
+    if "-pipeline" in sys.argv and len(pdf_links_df.columns) == 3:
+        rows = download_rows(pdf_links_df, save="pdf_names.csv")
+    elif len(pdf_links_df.columns) == 3:
         links_set = set(pdf_links_df["pdf_url"])
         links_set.discard("nan")
         links_set.discard("annual_report_does_not_exists")
-        links_to_pdf_map = {}
-        num = 1
-        print("Downloading " + str(len(links_set)) + " files...")
-        for link in links_set:
-            if link in ["nan", "annual_report_does_not_exists"]:
-                continue
-            response = requests.get(link)
-            links_to_pdf_map[link] = "tobam" + str(num) + ".pdf"
-            with open("tobam" + str(num) + ".pdf", "wb") as f:
-                print("tobam" + str(num) + ".pdf")
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk:
-                        f.write(chunk)
-            num += 1
-        del num
+        links_to_pdf_map = download_all(links_set)
         links_to_pdf_map[np.nan] = np.nan
         links_to_pdf_map["annual_report_does_not_exists"] = np.nan
         pdf_links_df["files"] = pdf_links_df["pdf_url"].apply(
@@ -62,7 +55,7 @@ def main():
 
     fund_to_tables = {}
     file_contents = {}
-    for index, row in pdf_links_df.iterrows():
+    for index, row in rows or parsable(pdf_links_df).iterrows():
         fund_name_website = row["name"]
         pdf_url = row["pdf_url"]
         isin = row["isin"]
@@ -76,7 +69,7 @@ def main():
         if read_file in file_contents:
             contents = file_contents[read_file]
         else:
-            contents = tabula.read_pdf(
+            contents = read_pdf(
                 read_file,
                 pages=(2),
                 area=(280, 50, 835, 590),
@@ -99,7 +92,7 @@ def main():
                 fund_name_report = " ".join(contents[i].split()[:-1]).strip()
                 break
         if start != 0 and end != 0:
-            tables = tabula.read_pdf(
+            tables = read_pdf(
                 read_file,
                 pages=list(range(start, end + 1)),
                 area=(75, 25, 790, 590),
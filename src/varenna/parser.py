@@ -7,11 +7,15 @@ import re
 import sys
 import os
 import warnings
-import tabula
-from PyPDF2 import PdfFileReader
 import pandas as pd
 import numpy as np
-import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.pages import get_store
+from common.tables import read_pdf
+from common.download import download_all
+from common.pipeline import download_rows
+from common.schedule import parsable
 
 warnings.filterwarnings("ignore")
 
@@ -35,25 +39,14 @@ def main():
     links_set = set(pdf_links_df["pdf_url"])
     links_set.discard("annual_report_does_not_exists")
     os.chdir(os.path.join(currdir, os.path.normpath(pdf_out_path)))
-    if "files" not in pdf_links_df.columns:
+    rows = None
+    if "-pipeline" in sys.argv and "files" not in pdf_links_df.columns:
+        rows = download_rows(pdf_links_df, save="pdf_names.csv")
+    elif "files" not in pdf_links_df.columns:
         links_set = set(pdf_links_df["pdf_url"])
         links_set.discard("nan")
         links_set.discard("annual_report_does_not_exists")
-        links_to_pdf_map = {}
-        num = 1
-        print("Downloading " + str(len(links_set)) + " files...")
-        for link in links_set:
-            if link in ["nan", "annual_report_does_not_exists"]:
-                continue
-            response = requests.get(link)
-            links_to_pdf_map[link] = "varenna" + str(num) + ".pdf"
-            with open("varenna" + str(num) + ".pdf", "wb") as f:
-                print("varenna" + str(num) + ".pdf")
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk:
-                        f.write(chunk)
-            num += 1
-        del num, response
+        links_to_pdf_map = download_all(links_set)
         links_to_pdf_map[np.nan] = np.nan
         links_to_pdf_map["annual_report_does_not_exists"] = np.nan
         pdf_links_df["files"] = pdf_links_df["pdf_url"].apply(
@@ -61,18 +54,18 @@ def main():
         )
         pdf_links_df.to_csv("pdf_names.csv", mode="w", index=False)
     fund_to_tables = {}
-    for index, row in pdf_links_df.iterrows():
+    for index, row in rows or parsable(pdf_links_df).iterrows():
         read_file = row["files"]
         fund_website = row["name"]
-        pdf = PdfFileReader(read_file)
-        total_pages = pdf.getNumPages()
+        store = get_store(read_file)
+        total_pages = len(store)
         text = "INVENTAIRE DÉTAILLÉ DES INSTRUMENTS FINANCIERS"
         pages = [
             i + 1
             for i in range(total_pages - 1, total_pages - 16, -1)
-            if text in pdf.getPage(i).extractText()
+            if text in store[i]
         ]
-        tables = tabula.read_pdf(
+        tables = read_pdf(
             read_file,
             pages=pages,
             stream=True,